@@ -0,0 +1,355 @@
+# ann_index.py - Index approximatif (IVF) pour les très grandes galeries
+import os
+import threading
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+from gallery import FaceGallery, QuantizedGallery
+from shared_gallery import MappedGallery
+
+# Taille des blocs pour les affectations (borne la mémoire temporaire)
+_CHUNK = 65536
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Indice du centroïde le plus proche (produit scalaire) pour chaque ligne"""
+    result = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), _CHUNK):
+        block = data[start:start + _CHUNK]
+        result[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return result
+
+
+def spherical_kmeans(data: np.ndarray, nlist: int, iterations: int = 10,
+                     seed: int = 0) -> np.ndarray:
+    """K-means sur la sphère unité (adapté à la similarité cosinus)"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        sums = np.stack([
+            np.bincount(assign, weights=data[:, j], minlength=nlist)
+            for j in range(data.shape[1])
+        ], axis=1).astype(np.float32)
+        counts = np.bincount(assign, minlength=nlist)
+
+        # Listes vides : réinitialiser sur un point au hasard
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+class IVFGallery(FaceGallery):
+    """
+    Galerie à fichier inversé (IVF) en NumPy pur
+    Les descripteurs sont répartis en `nlist` listes autour de centroïdes ;
+    une requête ne parcourt que les `nprobe` listes les plus proches.
+    Tant que la galerie est trop petite pour être entraînée, la recherche
+    reste exacte (force brute de FaceGallery). Quand les ajouts franchissent
+    `min_train_size`, le k-means tourne en arrière-plan hors du verrou
+    (force brute jusqu'à la fin) ; l'index est sauvegardé après l'entraînement
+    puis toutes les `save_every` modifications.
+    """
+
+    def __init__(self, dim: Optional[int] = None, nlist: Optional[int] = None,
+                 nprobe: int = 8, min_train_size: int = 4096,
+                 index_path: Optional[str] = None, save_every: int = 1000):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.index_path = index_path
+        self.save_every = save_every
+        self._centroids: Optional[np.ndarray] = None
+        self._assign: List[int] = []
+        self._members: List[List[int]] = []
+        self._cache: List[Optional[np.ndarray]] = []
+
+        # Entraînement en arrière-plan : `_epoch` change à chaque load()
+        # (un résultat calculé sur l'ancienne galerie est alors jeté)
+        self._epoch = 0
+        self._trainer: Optional[threading.Thread] = None
+        self._changes = 0
+        # Sauvegarde périodique : un seul thread, au plus une sauvegarde en attente
+        self._saver: Optional[threading.Thread] = None
+        self._save_pending = False
+        # Ordre des verrous : _save_lock puis _lock
+        self._save_lock = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _reset_lists(self, assign: np.ndarray):
+        nlist = len(self._centroids)
+        self._assign = assign.tolist()
+        self._members = [[] for _ in range(nlist)]
+        for row, c in enumerate(self._assign):
+            self._members[c].append(row)
+        self._cache = [None] * nlist
+
+    def _training_sample(self, nlist: Optional[int], sample_size: int):
+        """(copie d'un échantillon de la galerie, nombre de listes) ; sous le verrou"""
+        size = len(self._names)
+        data = self._matrix[:size]
+        nlist = nlist or self.nlist or max(16, int(4 * np.sqrt(size)))
+        nlist = min(nlist, size)
+        if size > sample_size:
+            rng = np.random.default_rng(0)
+            return data[rng.choice(size, sample_size, replace=False)], nlist
+        return data.copy(), nlist
+
+    def _install(self, centroids: np.ndarray):
+        """Adopte des centroïdes et y affecte toutes les lignes actuelles ; sous le verrou"""
+        self._centroids = centroids
+        self._reset_lists(_nearest(self._matrix[:len(self._names)], centroids))
+
+    def train(self, nlist: Optional[int] = None, sample_size: int = 100000):
+        """Entraîne les centroïdes sur (un échantillon de) la galerie (bloquant)"""
+        with self._lock:
+            size = len(self._names)
+            if size == 0:
+                return
+            sample, nlist = self._training_sample(nlist, sample_size)
+            self._install(spherical_kmeans(sample, nlist))
+        print(f"🧭 Index IVF entraîné ({nlist} listes, {size} descripteurs)")
+
+    def train_async(self, nlist: Optional[int] = None, sample_size: int = 100000) -> threading.Thread:
+        """
+        Entraîne en arrière-plan : seul l'échantillon est copié sous le verrou,
+        ajouts et recherches (exactes) continuent pendant le k-means
+        """
+        with self._lock:
+            if self._trainer is not None and self._trainer.is_alive():
+                return self._trainer
+            sample, nlist = self._training_sample(nlist, sample_size)
+            self._trainer = threading.Thread(
+                target=self._train_background, args=(sample, nlist, self._epoch),
+                name="ivf-train", daemon=True
+            )
+            self._trainer.start()
+            return self._trainer
+
+    def _train_background(self, sample: np.ndarray, nlist: int, epoch: int):
+        centroids = spherical_kmeans(sample, nlist)
+        with self._lock:
+            if epoch != self._epoch or self.trained:
+                return
+            # Lignes ajoutées pendant l'entraînement comprises
+            self._install(centroids)
+            size = len(self._names)
+        print(f"🧭 Index IVF entraîné en arrière-plan ({nlist} listes, {size} descripteurs)")
+        self.save()
+
+    def wait_trained(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin d'un entraînement en arrière-plan ; retourne `trained`"""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join(timeout)
+        return self.trained
+
+    def load(self, rows) -> int:
+        trained_now = False
+        with self._lock:
+            count = super().load(rows)
+            self._epoch += 1
+            self._centroids = None
+            self._assign, self._members, self._cache = [], [], []
+            if count >= self.min_train_size:
+                if not self._restore():
+                    self.train()
+                    trained_now = True
+        if trained_now:
+            self.save()
+        return count
+
+    def _changed(self):
+        """Sous le verrou : sauvegarde en arrière-plan toutes les `save_every` modifications"""
+        self._changes += 1
+        if self.save_every and self.index_path and self._changes >= self.save_every:
+            self._changes = 0
+            if self._saver is None:
+                self._saver = threading.Thread(target=self._save_loop, name="ivf-save", daemon=True)
+                self._saver.start()
+            else:
+                self._save_pending = True
+
+    def _save_loop(self):
+        """Thread de sauvegarde : une nouvelle passe si des modifications sont arrivées pendant l'écriture"""
+        try:
+            while True:
+                self.save()
+                with self._lock:
+                    if not self._save_pending:
+                        self._saver = None
+                        return
+                    self._save_pending = False
+        except Exception as e:
+            print(f"⚠️ Sauvegarde de l'index IVF: {e}")
+            with self._lock:
+                self._saver = None
+
+    def _attach(self, row: int):
+        c = self._assign[row]
+        self._members[c].append(row)
+        self._cache[c] = None
+
+    def _detach(self, row: int):
+        c = self._assign[row]
+        self._members[c].remove(row)
+        self._cache[c] = None
+
+    def add(self, name: str, features) -> None:
+        with self._lock:
+            existing = self._rows.get(name)
+            super().add(name, features)
+            if not self.trained:
+                if len(self._names) >= self.min_train_size:
+                    self.train_async()
+                return
+            row = self._rows[name]
+            c = int(_nearest(self._matrix[row:row + 1], self._centroids)[0])
+            if existing is None:
+                self._assign.append(c)
+            else:
+                self._detach(row)
+                self._assign[row] = c
+            self._attach(row)
+            self._changed()
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            row = self._rows.get(name)
+            if row is None:
+                return False
+            if self.trained:
+                last = len(self._names) - 1
+                self._detach(row)
+                if row != last:
+                    # La dernière ligne prend la place de la ligne supprimée
+                    c = self._assign[last]
+                    members = self._members[c]
+                    members[members.index(last)] = row
+                    self._cache[c] = None
+                    self._assign[row] = c
+                self._assign.pop()
+                self._changed()
+            return super().remove(name)
+
+    def _list_rows(self, c: int) -> np.ndarray:
+        rows = self._cache[c]
+        if rows is None:
+            rows = np.array(self._members[c], dtype=np.int64)
+            self._cache[c] = rows
+        return rows
+
+    def search_batch(self, queries, k: int = 1):
+        with self._lock:
+            if not self.trained:
+                return super().search_batch(queries, k)
+
+            queries = np.asarray(queries, dtype=np.float32)
+            if queries.ndim != 2 or queries.shape[1] != self.dim:
+                raise ValueError(f"Requêtes de forme invalide: {queries.shape}")
+
+            nprobe = min(self.nprobe, len(self._centroids))
+            coarse = queries @ self._centroids.T
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+            results = []
+            for query, lists in zip(queries, probes):
+                candidates = np.concatenate([self._list_rows(c) for c in lists])
+                if len(candidates) == 0:
+                    results.append([])
+                    continue
+                scores = self._matrix[candidates] @ query
+                top_k = min(k, len(candidates))
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+                top = top[np.argsort(-scores[top])]
+                results.append([
+                    (self._names[candidates[i]], float(scores[i])) for i in top
+                ])
+            return results
+
+    def save(self):
+        """
+        Persiste les centroïdes et les affectations (écriture atomique)
+        Seule la copie est faite sous le verrou : ajouts et recherches continuent pendant l'écriture
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self.index_path or not self.trained:
+                    return
+                centroids = self._centroids
+                names = list(self._names)
+                assign = list(self._assign)
+                self._changes = 0
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=centroids,
+                    names=np.array(names, dtype=str),
+                    assign=np.array(assign, dtype=np.int32),
+                )
+            os.replace(tmp_path, self.index_path)
+
+    def _restore(self) -> bool:
+        """Recharge l'index sauvegardé ; les noms inconnus sont réaffectés"""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return False
+        try:
+            with np.load(self.index_path, allow_pickle=False) as saved:
+                centroids = saved["centroids"].astype(np.float32)
+                known = dict(zip(saved["names"].tolist(), saved["assign"].tolist()))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Index IVF illisible, ré-entraînement: {e}")
+            return False
+        if centroids.shape[1] != self.dim:
+            return False
+
+        self._centroids = centroids
+        size = len(self._names)
+        assign = np.array([known.get(name, -1) for name in self._names], dtype=np.int32)
+        missing = np.flatnonzero(assign < 0)
+        if len(missing):
+            assign[missing] = _nearest(self._matrix[:size][missing], centroids)
+        self._reset_lists(assign)
+        print(f"🧭 Index IVF rechargé ({len(centroids)} listes, {len(missing)} réaffectés)")
+        return True
+
+
+def create_gallery(kind: str = "exact", index_path: Optional[str] = None,
+                   mapped_path: Optional[str] = None,
+                   exact: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None) -> FaceGallery:
+    """
+    Fabrique de galerie : "exact" (force brute), "ivf" (approximatif),
+    "mmap" (fichier mappé partagé entre processus) ou "int8" / "float16"
+    (quantifiée en mémoire, meilleurs candidats re-classés via `exact`)
+    """
+    if kind == "exact":
+        return FaceGallery()
+    if kind in ("int8", "float16"):
+        return QuantizedGallery(
+            kind, exact=exact,
+            rerank=int(os.environ.get("FACE_QUANT_RERANK", "8")),
+            cache_size=int(os.environ.get("FACE_QUANT_CACHE", "4096")),
+        )
+    if kind == "ivf":
+        return IVFGallery(
+            nprobe=int(os.environ.get("FACE_IVF_NPROBE", "8")),
+            index_path=index_path,
+            save_every=int(os.environ.get("FACE_IVF_SAVE_EVERY", "1000")),
+        )
+    if kind == "mmap":
+        if mapped_path is None:
+            raise ValueError("La galerie mmap nécessite un chemin de fichier")
+        return MappedGallery(
+            mapped_path,
+            compact_threshold=int(os.environ.get("FACE_GALLERY_COMPACT", "10000")),
+        )
+    raise ValueError(f"Type d'index inconnu: {kind}")
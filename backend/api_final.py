@@ -1,25 +1,145 @@
 # api_final.py - API finale ultra simple
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, File, UploadFile, Form, HTTPException, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import io
 import os
-import shutil
 import uuid
+import zipfile
 from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
 
 # Notre système simple
-from face_system import UltraSimpleFaceSystem
+from face_system import DETECTION_PRESETS, Box, UltraSimpleFaceSystem, inside
+from executor import ExecutorSaturated, RecognitionExecutor
+from lazy import Lazy
+from live_session import LiveSession
+from bulk_enroll import ImportJob
+from metrics import REGISTRY, TimingMiddleware, stage
+
+# Rien n'est chargé à l'import : système (détecteur, base, galerie) et pool de calcul
+# sont créés au démarrage (lifespan, en tâche de fond) ou à la première requête
+face_system_instance: Lazy[UltraSimpleFaceSystem] = Lazy(UltraSimpleFaceSystem, "face_system")
+
+# Pool de calcul (FACE_EXECUTOR=thread|process, FACE_WORKERS, FACE_MAX_QUEUE)
+executor_instance: Lazy[RecognitionExecutor] = Lazy(
+    lambda: RecognitionExecutor.from_env(face_system_instance.get()), "executor"
+)
+
+# FACE_INIT_ON_STARTUP=0 : rien avant la première requête (tests, rechargement à chaud)
+INIT_ON_STARTUP = os.environ.get("FACE_INIT_ON_STARTUP", "1") == "1"
+# FACE_WARMUP=1 : une détection à blanc par worker avant de se déclarer prêt
+WARMUP = os.environ.get("FACE_WARMUP", "0") == "1"
+
+# Durées de démarrage (secondes), exposées par /ready et /metrics
+startup: Dict[str, Optional[float]] = {
+    'import_s': None, 'face_system_s': None, 'executor_s': None,
+    'warmup_s': None, 'ready_s': None,
+}
+_startup_task: Optional[asyncio.Future] = None
+_lifespan_started: Optional[float] = None
+
+
+def _initialize():
+    """Système, pool de calcul puis (FACE_WARMUP=1) passe de chauffe ; thread de fond"""
+    system = face_system_instance.get()
+    startup['face_system_s'] = face_system_instance.seconds
+    executor = executor_instance.get()
+    executor.start()
+    startup['executor_s'] = executor_instance.seconds
+    
+    if WARMUP:
+        start = time.perf_counter()
+        _, blank = cv2.imencode(".jpg", np.full((240, 320, 3), 127, np.uint8))
+        executor.warm_up(blank.tobytes())
+        # Galerie mappée : pages lues une fois avant la première vraie recherche
+        if len(system.gallery):
+            system.gallery.search_batch(np.zeros((1, system.gallery.dim), np.float32), k=1)
+        startup['warmup_s'] = time.perf_counter() - start
+    
+    if _lifespan_started is not None:
+        startup['ready_s'] = time.perf_counter() - _lifespan_started
+    print(f"✅ Prêt en {startup['ready_s'] or 0:.2f} s (import {startup['import_s'] or 0:.2f} s)")
+
 
-# Initialisation
-app = FastAPI(title="DROGING Face Recognition")
-face_system = UltraSimpleFaceSystem()
+def _start_initialization():
+    global _startup_task
+    if _startup_task is None:
+        _startup_task = asyncio.ensure_future(asyncio.to_thread(_initialize))
 
-# Répertoire de base
-BASE_DIR = Path(__file__).parent.absolute()
+
+def _is_ready() -> bool:
+    return (_startup_task is not None and _startup_task.done()
+            and _startup_task.exception() is None)
+
+
+async def _system() -> UltraSimpleFaceSystem:
+    return await face_system_instance.aget()
+
+
+async def _executor() -> RecognitionExecutor:
+    return await executor_instance.aget()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _startup_task, _lifespan_started
+    _lifespan_started = time.perf_counter()
+    _startup_task = None
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    REGISTERED_FACES_DIR.mkdir(parents=True, exist_ok=True)
+    if INIT_ON_STARTUP:
+        # Le serveur accepte les connexions aussitôt ; /ready passe à 200 une fois chargé
+        _start_initialization()
+    yield
+    # Arrêt : interrompre les imports, terminer les calculs puis écrire les logs en attente
+    for job in import_jobs.values():
+        job.stop()
+    if _startup_task is not None and not _startup_task.done():
+        await asyncio.wait([_startup_task])
+    executor = executor_instance.reset()
+    if executor is not None:
+        executor.shutdown()
+    face_system = face_system_instance.reset()
+    if face_system is not None:
+        face_system.close()
+
+
+app = FastAPI(title="DROGING Face Recognition", lifespan=lifespan)
+
+# Répertoire de base (FACE_DATA_DIR, comme UltraSimpleFaceSystem)
+BASE_DIR = Path(os.environ.get("FACE_DATA_DIR") or Path(__file__).parent).absolute()
 UPLOADS_DIR = BASE_DIR / "uploads"
 REGISTERED_FACES_DIR = BASE_DIR / "registered_faces"
 
+# Conserver l'image originale des inscriptions (écrite après la réponse)
+SAVE_UPLOADS = os.environ.get("FACE_SAVE_UPLOADS", "1") == "1"
+
+# Nombre maximal d'images par appel à /recognize/batch
+MAX_BATCH_IMAGES = int(os.environ.get("FACE_MAX_BATCH", "64"))
+# Taille décompressée maximale (Mo) des images d'une archive zip
+MAX_ZIP_BYTES = int(os.environ.get("FACE_MAX_ZIP_MB", "100")) * 1024 * 1024
+# Imports en masse lancés par /import (par identifiant)
+import_jobs: Dict[str, ImportJob] = {}
+# Processus d'extraction au plus par import (un pool "spawn" par requête)
+MAX_IMPORT_WORKERS = os.cpu_count() or 1
+# Seul dossier du serveur lisible par /import (sources relatives résolues depuis ce dossier)
+IMPORT_ROOT = os.path.realpath(os.environ.get("FACE_IMPORT_ROOT") or BASE_DIR / "imports")
+# Images traitées en parallèle au plus par connexion /ws/recognize
+WS_MAX_IN_FLIGHT = int(os.environ.get("FACE_WS_MAX_IN_FLIGHT", "4"))
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,14 +148,123 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Dossiers nécessaires
-UPLOADS_DIR.mkdir(exist_ok=True)
-REGISTERED_FACES_DIR.mkdir(exist_ok=True)
+# Durée par route (/metrics) ; FACE_TIMING_HEADERS=1 ajoute le détail
+# des étapes de chaque requête dans l'en-tête Server-Timing
+app.add_middleware(TimingMiddleware, headers=os.environ.get("FACE_TIMING_HEADERS", "0") == "1")
+
+def _register_metrics():
+    """Valeurs lues à chaque collecte de /metrics (absentes tant que rien n'est chargé)"""
+    system = face_system_instance.peek
+    pool = executor_instance.peek
+    
+    def cache_lookups():
+        if system() is None or system().cache is None:
+            return {}
+        stats = system().cache.stats()
+        return {("hit",): stats['hits'], ("miss",): stats['misses']}
+    
+    def executor_requests():
+        if pool() is None:
+            return {}
+        stats = pool().stats()
+        return {("running",): stats['in_flight'], ("queued",): stats['queued']}
+    
+    REGISTRY.gauge_func("face_gallery_size", "Personnes dans la galerie en mémoire",
+                        lambda: len(system().gallery) if system() else None)
+    REGISTRY.gauge_func("face_gallery_sync_behind", "Modifications du journal pas encore appliquées",
+                        lambda: system().sync.stats()['behind'] if system() else None)
+    REGISTRY.gauge_func("face_gallery_sync_age_seconds", "Temps depuis la dernière relecture du journal",
+                        lambda: system().sync.stats()['last_sync_age_s'] if system() else None)
+    REGISTRY.counter_func("face_cache_lookups_total", "Recherches dans le cache de détection",
+                          cache_lookups, ("result",))
+    REGISTRY.gauge_func("face_executor_requests", "Requêtes dans le pool de calcul",
+                        executor_requests, ("state",))
+    REGISTRY.counter_func("face_executor_rejected_total", "Requêtes refusées (pool saturé)",
+                          lambda: pool().stats()['rejected'] if pool() else None)
+    REGISTRY.gauge_func("face_log_queue_pending", "Logs en attente d'écriture",
+                        lambda: system().log_writer.stats()['pending'] if system() else None)
+    REGISTRY.counter_func("face_log_dropped_total", "Logs abandonnés (file pleine)",
+                          lambda: system().log_writer.stats()['dropped'] if system() else None)
+    REGISTRY.gauge_func("face_startup_seconds", "Durées du démarrage par phase",
+                        lambda: {(phase[:-2],): value for phase, value in startup.items()},
+                        ("phase",))
+    REGISTRY.gauge_func("face_ready", "1 une fois le système chargé (et chauffé)",
+                        lambda: int(_is_ready()))
+
+
+_register_metrics()
+
+
+async def _read_upload(file: UploadFile) -> bytes:
+    with stage("upload_read"):
+        return await file.read()
+
+
+def _saturated() -> HTTPException:
+    return HTTPException(503, "Serveur saturé, réessayez plus tard", headers={"Retry-After": "1"})
+
+
+def _check_preset(preset: Optional[str]) -> Optional[str]:
+    if preset is not None and preset not in DETECTION_PRESETS:
+        raise HTTPException(400, f"Préréglage inconnu: {preset} ({', '.join(DETECTION_PRESETS)})")
+    return preset
+
+
+def _parse_roi(roi: Optional[str]) -> Optional[Box]:
+    """Zone d'intérêt "x,y,w,h" (coordonnées de l'image envoyée)"""
+    if not roi:
+        return None
+    try:
+        x, y, w, h = (int(v) for v in roi.split(","))
+    except ValueError:
+        raise HTTPException(400, "roi doit être de la forme x,y,w,h")
+    if w <= 0 or h <= 0:
+        raise HTTPException(400, "roi doit avoir une largeur et une hauteur positives")
+    return x, y, w, h
+
+
+def _is_zip(file: UploadFile) -> bool:
+    return (file.content_type in ("application/zip", "application/x-zip-compressed")
+            or (file.filename or "").lower().endswith(".zip"))
+
+
+def _read_zip(data: bytes, max_images: int) -> List[tuple]:
+    """
+    Images d'une archive zip (nom, octets) dans l'ordre de l'archive
+    Nombre d'images et taille décompressée déclarée vérifiés avant toute lecture
+    (zipfile ne produit jamais plus que la taille déclarée). Bloquant : à appeler dans un thread.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise HTTPException(400, "Archive zip invalide")
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        if len(members) > max_images:
+            raise HTTPException(413, f"Maximum {MAX_BATCH_IMAGES} images par lot")
+        if sum(info.file_size for info in members) > MAX_ZIP_BYTES:
+            raise HTTPException(413, f"Archive trop volumineuse (maximum {MAX_ZIP_BYTES // 2**20} Mo décompressés)")
+        try:
+            return [(info.filename, archive.read(info)) for info in members]
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError) as e:
+            raise HTTPException(400, f"Archive zip illisible: {e}")
+
+
+def _save_upload(filepath: str, data: bytes):
+    """Écrit une image reçue sur disque (tâche de fond)"""
+    try:
+        with open(filepath, "wb") as f:
+            f.write(data)
+    except OSError as e:
+        print(f"⚠️ Impossible de sauvegarder {filepath}: {e}")
 
 
 @app.get("/")
 def home():
-    stats = face_system.get_stats()
+    stats = face_system_instance.get().get_stats()
     return {
         "project": "DROGING Face Recognition",
         "status": "online",
@@ -43,15 +272,24 @@ def home():
         "stats": stats,
         "endpoints": [
             {"method": "POST", "path": "/register", "desc": "Enregistrer une personne"},
+            {"method": "POST", "path": "/person/{name}/images", "desc": "Ajouter des images à une personne"},
+            {"method": "POST", "path": "/import", "desc": "Import en masse (dossier ou CSV)"},
             {"method": "POST", "path": "/recognize", "desc": "Reconnaître une personne"},
-            {"method": "GET", "path": "/persons", "desc": "Liste des personnes"},
+            {"method": "POST", "path": "/recognize/multi", "desc": "Reconnaître tous les visages d'une image"},
+            {"method": "POST", "path": "/recognize/batch", "desc": "Reconnaître plusieurs images"},
+            {"method": "WS", "path": "/ws/recognize", "desc": "Reconnaissance continue (webcam)"},
+            {"method": "GET", "path": "/persons", "desc": "Liste des personnes (paginée : limit, cursor)"},
+            {"method": "PUT", "path": "/persons/{name}/threshold", "desc": "Seuil de confiance propre (%)"},
             {"method": "GET", "path": "/stats", "desc": "Statistiques"},
+            {"method": "GET", "path": "/metrics", "desc": "Mesures Prometheus"},
+            {"method": "GET", "path": "/ready", "desc": "Prêt à servir (modèles et galerie chargés)"},
             {"method": "GET", "path": "/docs", "desc": "Documentation Swagger"}
         ]
     }
 
 @app.post("/register")
 async def register(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     file: UploadFile = File(...)
 ):
@@ -59,91 +297,311 @@ async def register(
     if not file.content_type.startswith('image/'):
         raise HTTPException(400, "Le fichier doit être une image")
     
-    # Sauvegarder
+    # Décodage en mémoire, l'original n'est écrit qu'en tâche de fond
+    data = await _read_upload(file)
     ext = os.path.splitext(file.filename)[1] or '.jpg'
-    filename = f"{name}_{uuid.uuid4()}{ext}"
-    filepath = str(UPLOADS_DIR / filename)
+    filename = f"{name}_{uuid.uuid4()}{ext}" if SAVE_UPLOADS else None
+    filepath = str(UPLOADS_DIR / filename) if filename else None
     
     try:
-        with open(filepath, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        
-        success, message = face_system.register_person(name, filepath)
-        
-        if success:
-            return {
-                "success": True,
-                "name": name,
-                "message": message,
-                "file": filename
-            }
-        else:
-            os.remove(filepath)
-            raise HTTPException(400, message)
+        executor = await _executor()
+        success, message = await executor.register(name, data, image_path=filepath)
+    except ExecutorSaturated:
+        raise _saturated()
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
         raise HTTPException(500, str(e))
+    
+    if not success:
+        raise HTTPException(400, message)
+    
+    if filepath:
+        background_tasks.add_task(_save_upload, filepath, data)
+    
+    return {
+        "success": True,
+        "name": name,
+        "message": message,
+        "file": filename
+    }
+
+@app.post("/person/{name}/images")
+async def add_person_images(
+    name: str,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...)
+):
+    """Ajoute une ou plusieurs images à une personne existante"""
+    face_system = await _system()
+    executor = await _executor()
+    if name not in face_system.gallery:
+        raise HTTPException(404, f"La personne '{name}' n'existe pas")
+    if len(files) > MAX_BATCH_IMAGES:
+        raise HTTPException(413, f"Maximum {MAX_BATCH_IMAGES} images par lot")
+    
+    results = []
+    for file in files:
+        if not file.content_type.startswith('image/'):
+            results.append({"file": file.filename, "success": False,
+                            "message": "Le fichier doit être une image"})
+            continue
+        
+        data = await _read_upload(file)
+        ext = os.path.splitext(file.filename)[1] or '.jpg'
+        filename = f"{name}_{uuid.uuid4()}{ext}" if SAVE_UPLOADS else None
+        filepath = str(UPLOADS_DIR / filename) if filename else None
+        
+        try:
+            success, message = await executor.add_template(name, data, image_path=filepath)
+        except ExecutorSaturated:
+            raise _saturated()
+        except Exception as e:
+            raise HTTPException(500, str(e))
+        
+        if success and filepath:
+            background_tasks.add_task(_save_upload, filepath, data)
+        results.append({"file": file.filename, "success": success, "message": message})
+    
+    if not any(r["success"] for r in results):
+        raise HTTPException(400, results[0]["message"])
+    
+    return {
+        "success": True,
+        "name": name,
+        "added": sum(r["success"] for r in results),
+        "results": results
+    }
+
+@app.post("/import", status_code=202)
+def start_import(
+    source: str = Form(...),
+    job_id: str = Form(None),
+    workers: int = Form(None, ge=1, le=MAX_IMPORT_WORKERS),
+    retry_failed: bool = Form(False)
+):
+    """
+    Lance un import en masse depuis un dossier ou un manifeste CSV du serveur
+    (sous FACE_IMPORT_ROOT) ; relancer avec le même `job_id` reprend un import interrompu
+    """
+    source = os.path.realpath(os.path.join(IMPORT_ROOT, source))
+    if not inside(source, IMPORT_ROOT):
+        raise HTTPException(403, "Source hors du dossier d'import (FACE_IMPORT_ROOT)")
+    if not os.path.exists(source):
+        raise HTTPException(400, f"Source introuvable: {source}")
+    if job_id in import_jobs and import_jobs[job_id].running:
+        raise HTTPException(409, f"L'import '{job_id}' est déjà en cours")
+    
+    job = ImportJob(face_system_instance.get(), source, job_id, within=IMPORT_ROOT,
+                    workers=workers, retry_failed=retry_failed)
+    import_jobs[job.job_id] = job
+    job.start()
+    return {"job_id": job.job_id, "status": job.status}
+
+@app.get("/import/{job_id}")
+def import_status(job_id: str):
+    """Avancement (puis rapport final) d'un import"""
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Import inconnu: {job_id}")
+    return job.info()
 
 @app.post("/recognize")
-async def recognize(file: UploadFile = File(...)):
-    """Reconnaît une personne"""
+async def recognize(
+    file: UploadFile = File(...),
+    preset: str = Form(None),
+    roi: str = Form(None)
+):
+    """Reconnaît une personne (preset : fast / balanced / accurate, roi : x,y,w,h)"""
     if not file.content_type.startswith('image/'):
         raise HTTPException(400, "Le fichier doit être une image")
+    preset = _check_preset(preset)
+    box = _parse_roi(roi)
     
-    temp_file = str(UPLOADS_DIR / f"temp_{uuid.uuid4()}.jpg")
+    try:
+        # Aucun fichier temporaire : décodage direct du buffer reçu
+        data = await _read_upload(file)
+        executor = await _executor()
+        name, confidence = await executor.recognize(data, preset, box)
+    except ExecutorSaturated:
+        raise _saturated()
+    except Exception as e:
+        raise HTTPException(500, str(e))
+    
+    if name:
+        return {
+            "recognized": True,
+            "name": name,
+            "confidence": round(confidence, 2),
+            "message": f"Bienvenue {name}!"
+        }
+    else:
+        return {
+            "recognized": False,
+            "confidence": round(confidence, 2),
+            "message": "Personne non reconnue"
+        }
+
+@app.post("/recognize/multi")
+async def recognize_multi(
+    file: UploadFile = File(...),
+    max_faces: int = Form(None),
+    preset: str = Form(None),
+    roi: str = Form(None)
+):
+    """Reconnaît tous les visages présents dans une image"""
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(400, "Le fichier doit être une image")
+    preset = _check_preset(preset)
+    box = _parse_roi(roi)
     
     try:
-        with open(temp_file, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        
-        name, confidence = face_system.recognize_person(temp_file)
-        
-        os.remove(temp_file)
-        
-        if name:
-            return {
-                "recognized": True,
-                "name": name,
-                "confidence": round(confidence, 2),
-                "message": f"Bienvenue {name}!"
-            }
+        data = await _read_upload(file)
+        executor = await _executor()
+        matches = await executor.recognize_all(data, max_faces, preset, box)
+    except ExecutorSaturated:
+        raise _saturated()
+    except Exception as e:
+        raise HTTPException(500, str(e))
+    
+    faces = [
+        {
+            "recognized": match['name'] is not None,
+            "name": match['name'],
+            "confidence": round(match['confidence'], 2),
+            "bbox": match['bbox']
+        }
+        for match in matches
+    ]
+    return {"count": len(faces), "faces": faces}
+
+@app.post("/recognize/batch")
+async def recognize_batch(files: List[UploadFile] = File(...), preset: str = Form(None)):
+    """Reconnaît plusieurs images (fichiers multiples ou archive zip)"""
+    preset = _check_preset(preset)
+    images = []
+    for file in files:
+        if _is_zip(file):
+            data = await _read_upload(file)
+            images.extend(await asyncio.to_thread(_read_zip, data, MAX_BATCH_IMAGES - len(images)))
+        elif file.content_type.startswith('image/'):
+            images.append((file.filename, await _read_upload(file)))
         else:
-            return {
-                "recognized": False,
-                "confidence": round(confidence, 2),
-                "message": "Personne non reconnue"
-            }
+            raise HTTPException(400, f"Fichier non supporté: {file.filename}")
+    
+    if not images:
+        raise HTTPException(400, "Aucune image reçue")
+    if len(images) > MAX_BATCH_IMAGES:
+        raise HTTPException(413, f"Maximum {MAX_BATCH_IMAGES} images par lot")
+    
+    try:
+        executor = await _executor()
+        matches = await executor.recognize_many([data for _, data in images], preset)
+    except ExecutorSaturated:
+        raise _saturated()
     except Exception as e:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
         raise HTTPException(500, str(e))
+    
+    results = [
+        {
+            "index": i,
+            "file": filename,
+            "recognized": name is not None,
+            "name": name,
+            "confidence": round(confidence, 2)
+        }
+        for i, ((filename, _), (name, confidence)) in enumerate(zip(images, matches))
+    ]
+    return {"count": len(results), "results": results}
+
+@app.websocket("/ws/recognize")
+async def ws_recognize(websocket: WebSocket, max_in_flight: int = 1,
+                       preset: str = "fast", track_roi: bool = False):
+    """
+    Reconnaissance continue : le client envoie des images JPEG (messages binaires),
+    le serveur répond en JSON pour chaque image traitée
+    track_roi : détecter d'abord autour des visages suivis à l'image précédente
+    """
+    if preset not in DETECTION_PRESETS:
+        preset = "fast"
+    session = LiveSession(
+        websocket, await _executor(),
+        max_in_flight=min(max(1, max_in_flight), WS_MAX_IN_FLIGHT),
+        preset=preset, track_roi=track_roi
+    )
+    await session.run()
 
 @app.get("/persons")
-def get_persons():
-    """Liste toutes les personnes enregistrées"""
-    persons = face_system.list_persons()
-    return {"count": len(persons), "persons": persons}
+def get_persons(limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
+    """
+    Liste les personnes enregistrées, page par page (ordre alphabétique)
+    `cursor` : valeur de next_cursor de la page précédente
+    """
+    face_system = face_system_instance.get()
+    persons = face_system.list_persons(limit=limit + 1, after=cursor)
+    next_cursor = persons[limit - 1]['name'] if len(persons) > limit else None
+    return {
+        "count": face_system.count_persons(),
+        "persons": persons[:limit],
+        "next_cursor": next_cursor
+    }
+
+@app.put("/persons/{name}/threshold")
+def set_person_threshold(name: str, threshold: Optional[float] = Form(None, ge=0, le=100)):
+    """
+    Seuil de confiance (en %) propre à une personne, conservé en base
+    Sans `threshold`, la personne revient au seuil commun
+    """
+    success, message = face_system_instance.get().set_threshold(name, threshold)
+    if not success:
+        raise HTTPException(status_code=404, detail=message)
+    return {"success": True, "name": name, "threshold": threshold, "message": message}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Mesures au format texte Prometheus (durées par étape, compteurs)"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/stats")
 def get_stats():
     """Retourne les statistiques"""
-    return face_system.get_stats()
+    stats = face_system_instance.get().get_stats()
+    stats['executor'] = executor_instance.get().stats()
+    return stats
 
 @app.delete("/person/{name}")
-async def delete_person(name: str):
-    """Supprime une personne"""
-    success, message = face_system.delete_person(name)
+def delete_person(name: str):
+    """Supprime une personne (endpoint synchrone : vidage des logs et transaction hors de la boucle)"""
+    success, message = face_system_instance.get().delete_person(name)
     if success:
         return {"success": True, "message": message}
     else:
         raise HTTPException(status_code=404, detail=message)
 
+@app.get("/ready")
+async def ready():
+    """
+    Prêt à servir : système, galerie et pool chargés (et chauffés si FACE_WARMUP=1)
+    Avec FACE_INIT_ON_STARTUP=0, le premier appel lance le chargement
+    """
+    _start_initialization()
+    body = {"ready": _is_ready(), "startup": startup, "warmup": WARMUP}
+    if _startup_task is not None and _startup_task.done() and _startup_task.exception() is not None:
+        body["error"] = str(_startup_task.exception())
+    if not body["ready"]:
+        return JSONResponse(body, status_code=503)
+    return body
+
+@app.get("/health")
+def health():
+    """Vivant (répond même pendant le chargement)"""
+    return {"status": "ok"}
+
 @app.get("/test")
 def test():
     """Endpoint de test"""
     return {"message": "API fonctionnelle", "test": "ok"}
 
+startup['import_s'] = time.perf_counter() - _IMPORT_STARTED
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🚀 DROGING FACE RECOGNITION - API FINALE")
@@ -153,4 +611,4 @@ if __name__ == "__main__":
     print("📚 Docs: http://localhost:8000/docs")
     print("=" * 60)
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,2 @@
+# benchmarks - Scripts de mesure de performance (à lancer depuis backend/)
+# Exemple : python -m benchmarks.bench_gallery
@@ -0,0 +1,70 @@
+# bench_ann.py - Rappel vs latence de l'index IVF face à la recherche exacte
+# Usage : python -m benchmarks.bench_ann [--size 200000] [--nprobe 1 4 8 16 32]
+import argparse
+import time
+import numpy as np
+
+from ann_index import IVFGallery
+from gallery import FaceGallery
+
+DIM = 52
+
+
+def clustered_features(count: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Descripteurs normalisés regroupés autour de centres (comme de vrais visages)"""
+    centers = rng.random((clusters, DIM)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    data = centers[labels] + rng.normal(0, 0.08, (count, DIM)).astype(np.float32)
+    data = np.abs(data)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def timed_search(gallery: FaceGallery, queries: np.ndarray, k: int):
+    """(résultats, latence moyenne en ms par requête)"""
+    start = time.perf_counter()
+    results = [gallery.search(q, k=k) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def recall(exact, approx, k: int) -> float:
+    hits = 0
+    for truth, found in zip(exact, approx):
+        hits += len({n for n, _ in truth[:k]} & {n for n, _ in found[:k]})
+    return hits / (len(exact) * k)
+
+
+def run(size: int, queries: int, nprobes, k: int):
+    rng = np.random.default_rng(0)
+    data = clustered_features(size + queries, clusters=max(16, size // 500), rng=rng)
+    names = [f"person_{i}" for i in range(size)]
+    probes = data[size:]
+
+    exact = FaceGallery()
+    exact.load(zip(names, data[:size]))
+    truth, exact_ms = timed_search(exact, probes, k)
+
+    ivf = IVFGallery(min_train_size=0)
+    start = time.perf_counter()
+    ivf.load(zip(names, data[:size]))
+    build_s = time.perf_counter() - start
+
+    print(f"galerie={size} requêtes={queries} k={k} listes={len(ivf._centroids)} "
+          f"(construction {build_s:.1f} s)")
+    print(f"{'méthode':>12} | {'latence (ms)':>12} | {'rappel@1':>8} | {f'rappel@{k}':>9}")
+    print("-" * 52)
+    print(f"{'exacte':>12} | {exact_ms:>12.3f} | {1.0:>8.3f} | {1.0:>9.3f}")
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        found, ivf_ms = timed_search(ivf, probes, k)
+        print(f"{f'ivf/{nprobe}':>12} | {ivf_ms:>12.3f} | "
+              f"{recall(truth, found, 1):>8.3f} | {recall(truth, found, k):>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rappel/latence IVF")
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.size, args.queries, args.nprobe, args.k)
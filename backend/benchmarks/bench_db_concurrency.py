@@ -0,0 +1,104 @@
+# bench_db_concurrency.py - connect/close par appel vs connexions persistantes WAL
+# Usage : python -m benchmarks.bench_db_concurrency [--threads 8] [--ops 300]
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from connection_manager import ConnectionManager
+
+SCHEMA = """
+CREATE TABLE persons (id INTEGER PRIMARY KEY, name TEXT UNIQUE, features BLOB);
+CREATE TABLE logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action TEXT, person_name TEXT, confidence REAL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def create_db(path: str, persons: int = 1000):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO persons (name, features) VALUES (?, ?)",
+        [(f"person_{i}", bytes(208)) for i in range(persons)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_request(path: str, i: int):
+    """Une reconnaissance historique : une connexion pour lire, une pour le log"""
+    conn = sqlite3.connect(path)
+    conn.execute("SELECT name FROM persons WHERE name = ?", (f"person_{i % 1000}",)).fetchone()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO logs (action, person_name, confidence) VALUES (?, ?, ?)",
+        ("RECOGNIZE", f"person_{i % 1000}", 90.0)
+    )
+    conn.commit()
+    conn.close()
+
+
+def pooled_request(manager: ConnectionManager, i: int):
+    """Même travail via la connexion persistante du thread"""
+    with manager.connection() as conn:
+        conn.execute("SELECT name FROM persons WHERE name = ?", (f"person_{i % 1000}",)).fetchone()
+    with manager.transaction() as conn:
+        conn.execute(
+            "INSERT INTO logs (action, person_name, confidence) VALUES (?, ?, ?)",
+            ("RECOGNIZE", f"person_{i % 1000}", 90.0)
+        )
+
+
+def hammer(request, threads: int, ops: int):
+    """Lance `threads` threads de `ops` requêtes ; retourne (req/s, erreurs)"""
+    errors = []
+
+    def worker(offset: int):
+        for i in range(ops):
+            try:
+                request(offset * ops + i)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed, len(errors)
+
+
+def run(threads: int, ops: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+        create_db(legacy_path)
+        create_db(pooled_path)
+
+        legacy_rps, legacy_errors = hammer(lambda i: legacy_request(legacy_path, i), threads, ops)
+
+        manager = ConnectionManager(pooled_path)
+        pooled_rps, pooled_errors = hammer(lambda i: pooled_request(manager, i), threads, ops)
+        manager.close_all()
+
+    print(f"threads={threads} requêtes/thread={ops}")
+    print(f"  connect/close : {legacy_rps:>8.0f} req/s  ({legacy_errors} erreurs 'locked')")
+    print(f"  pool WAL      : {pooled_rps:>8.0f} req/s  ({pooled_errors} erreurs 'locked')")
+    print(f"  gain          : {pooled_rps / legacy_rps:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de concurrence SQLite")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300)
+    args = parser.parse_args()
+    run(args.threads, args.ops)
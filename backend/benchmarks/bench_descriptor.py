@@ -0,0 +1,85 @@
+# bench_descriptor.py - Temps et allocations par visage : extracteur vs ancienne extraction
+# Usage : python -m benchmarks.bench_descriptor [--faces 2000] [--size 640]
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+from descriptor import DescriptorExtractor
+
+
+def legacy_extract(img: np.ndarray, bbox) -> list:
+    """Ancienne extraction (listes Python, Sobel en float64), pour comparaison"""
+    x, y, w, h = bbox
+    face_resized = cv2.resize(img[y:y+h, x:x+w], (100, 100))
+    hists = [cv2.calcHist([face_resized], [c], None, [16], [0, 256]) for c in range(3)]
+    gray_face = cv2.cvtColor(face_resized, cv2.COLOR_BGR2GRAY)
+    sobelx = cv2.Sobel(gray_face, cv2.CV_64F, 1, 0, ksize=3)
+    sobely = cv2.Sobel(gray_face, cv2.CV_64F, 0, 1, ksize=3)
+    features = []
+    for hist in hists:
+        features.extend(hist.flatten().tolist())
+    features.extend([np.mean(sobelx), np.std(sobelx)])
+    features.extend([np.mean(sobely), np.std(sobely)])
+    features = np.array(features)
+    if np.linalg.norm(features) > 0:
+        features = features / np.linalg.norm(features)
+    return features.tolist()
+
+
+def measure(func, img, boxes):
+    """(µs par visage, octets alloués par visage, pic d'allocation en octets)"""
+    for bbox in boxes[:10]:
+        func(img, bbox)
+    start = time.perf_counter()
+    for bbox in boxes:
+        func(img, bbox)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    allocated = 0
+    for bbox in boxes:
+        result = func(img, bbox)
+        allocated += tracemalloc.get_traced_memory()[0] - before
+        del result
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return elapsed / len(boxes) * 1e6, allocated / len(boxes), peak
+
+
+def run(faces: int, size: int):
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    sides = rng.integers(40, size // 2, faces)
+    boxes = [(int(rng.integers(0, size - s)), int(rng.integers(0, size - s)), int(s), int(s)) for s in sides]
+
+    extractor = DescriptorExtractor()
+    out = np.empty(extractor.dim, dtype=np.float32)
+    diff = max(np.abs(extractor.extract(img, b) - np.float32(legacy_extract(img, b))).max() for b in boxes[:100])
+
+    print(f"{faces} visages, image {size}x{size}, écart max avec l'ancienne extraction = {diff:.2e}")
+    print(f"{'méthode':>16} | {'µs/visage':>10} | {'octets retenus/visage':>21} | {'pic (o)':>9}")
+    print("-" * 66)
+    for label, func in (
+        ("ancienne", legacy_extract),
+        ("extract", extractor.extract),
+        ("extract_into", lambda i, b: extractor.extract_into(i, b, out)),
+    ):
+        us, allocated, peak = measure(func, img, boxes)
+        print(f"{label:>16} | {us:>10.1f} | {allocated:>21.0f} | {peak:>9}")
+
+    start = time.perf_counter()
+    extractor.extract_batch(img, boxes)
+    batch_us = (time.perf_counter() - start) / len(boxes) * 1e6
+    print(f"{'extract_batch':>16} | {batch_us:>10.1f} |")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark de l'extraction de descripteurs")
+    parser.add_argument("--faces", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=640)
+    args = parser.parse_args()
+    run(args.faces, args.size)
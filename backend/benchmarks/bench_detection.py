@@ -0,0 +1,65 @@
+# bench_detection.py - Temps et concordance de détection par préréglage
+# Usage : python -m benchmarks.bench_detection [--images uploads] [--repeat 5]
+import argparse
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+
+from face_system import DETECTION_PRESETS, UltraSimpleFaceSystem
+from video_stream import iou
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+REFERENCE = 'accurate'
+
+
+def largest(boxes):
+    return max(boxes, key=lambda b: b[2] * b[3]) if boxes else None
+
+
+def agrees(reference, boxes) -> bool:
+    """Même présence de visage et plus grand visage superposé (IoU > 0.5)"""
+    ref, box = largest(reference), largest(boxes)
+    if ref is None or box is None:
+        return ref is None and box is None
+    return iou(ref, box) > 0.5
+
+
+def run(images_dir: str, repeat: int):
+    paths = [p for p in sorted(Path(images_dir).iterdir()) if p.suffix.lower() in IMAGE_EXTENSIONS]
+    grays = []
+    for path in paths:
+        img = cv2.imread(str(path))
+        if img is not None:
+            grays.append((path.name, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)))
+    if not grays:
+        print(f"⚠️ Aucune image dans {images_dir}")
+        return
+
+    system = UltraSimpleFaceSystem()
+    reference = {name: system.detect_boxes(gray, REFERENCE) for name, gray in grays}
+
+    print(f"{len(grays)} images, {repeat} passes, référence = {REFERENCE}")
+    print(f"{'préréglage':>10} | {'moy (ms)':>9} | {'p95 (ms)':>9} | {'visages':>7} | {'concordance':>11}")
+    print("-" * 60)
+    for preset in DETECTION_PRESETS:
+        samples, faces, agreed = [], 0, 0
+        for name, gray in grays:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                boxes = system.detect_boxes(gray, preset)
+                samples.append(time.perf_counter() - start)
+            faces += len(boxes)
+            agreed += agrees(reference[name], boxes)
+        times = np.array(samples) * 1000
+        print(f"{preset:>10} | {times.mean():>9.2f} | {np.percentile(times, 95):>9.2f} | "
+              f"{faces:>7} | {agreed / len(grays):>10.0%}")
+    system.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des préréglages de détection")
+    parser.add_argument("--images", default="uploads")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.images, args.repeat)
@@ -0,0 +1,75 @@
+# bench_detectors.py - Débit, latence et nombre de visages par détecteur
+# Usage : python -m benchmarks.bench_detectors [--images uploads] [--detectors haar lbp yunet hog]
+import argparse
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+
+from detectors import DETECTORS, create_detector
+from face_system import DETECTION_PRESETS
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def downscale(img: np.ndarray, max_side) -> np.ndarray:
+    """Même réduction que UltraSimpleFaceSystem.detect_boxes"""
+    height, width = img.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return img
+    scale = max_side / max(height, width)
+    return cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def run(images_dir: str, names, preset: str, repeat: int):
+    params = DETECTION_PRESETS[preset]
+    images = []
+    for path in sorted(Path(images_dir).iterdir()):
+        if path.suffix.lower() in IMAGE_EXTENSIONS:
+            img = cv2.imread(str(path))
+            if img is not None:
+                images.append(downscale(img, params['max_side']))
+    if not images:
+        print(f"⚠️ Aucune image dans {images_dir}")
+        return
+
+    print(f"{len(images)} images, {repeat} passes, préréglage = {preset}")
+    print(f"{'détecteur':>9} | {'img/s':>8} | {'moy (ms)':>9} | {'p95 (ms)':>9} | "
+          f"{'visages':>7} | {'sans visage':>11}")
+    print("-" * 68)
+    for name in names:
+        try:
+            detector = create_detector(name)
+        except (RuntimeError, FileNotFoundError, ValueError) as e:
+            print(f"{name:>9} | indisponible : {e}")
+            continue
+
+        # Une détection à blanc (initialisation du modèle)
+        detector.detect(images[0])
+        samples, faces, empty = [], 0, 0
+        for img in images:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                boxes = detector.detect(
+                    img,
+                    scale_factor=params['scale_factor'],
+                    min_neighbors=params['min_neighbors'],
+                    min_size=params['min_size']
+                )
+                samples.append(time.perf_counter() - start)
+            faces += len(boxes)
+            empty += not boxes
+        times = np.array(samples) * 1000
+        print(f"{name:>9} | {1000 / times.mean():>8.1f} | {times.mean():>9.2f} | "
+              f"{np.percentile(times, 95):>9.2f} | {faces:>7} | {empty:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des détecteurs de visages")
+    parser.add_argument("--images", default="uploads")
+    parser.add_argument("--detectors", nargs="+", default=list(DETECTORS), choices=list(DETECTORS))
+    parser.add_argument("--preset", default="balanced", choices=list(DETECTION_PRESETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.images, args.detectors, args.preset, args.repeat)
@@ -0,0 +1,74 @@
+# bench_gallery.py - Boucle Python historique vs galerie vectorisée
+# Usage : python -m benchmarks.bench_gallery [--sizes 1000 10000 100000]
+import argparse
+import json
+import time
+import numpy as np
+
+from gallery import FaceGallery
+
+DIM = 52  # 3 x 16 bins d'histogramme + 4 statistiques Sobel
+
+
+def random_features(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Descripteurs aléatoires normalisés (comme detect_face)"""
+    features = rng.random((count, DIM)).astype(np.float32)
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def legacy_search(persons, target):
+    """Reproduction de l'ancienne boucle de recognize_person"""
+    target_features = np.array(target)
+    best_match = None
+    best_similarity = 0
+    for name, features_json in persons:
+        known_features = np.array(json.loads(features_json))
+        similarity = np.dot(target_features, known_features)
+        if similarity > best_similarity:
+            best_similarity = similarity
+            best_match = name
+    return best_match, best_similarity
+
+
+def timed(func, repeat: int) -> float:
+    """Temps moyen par appel en millisecondes"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes, queries: int):
+    rng = np.random.default_rng(0)
+    print(f"{'identités':>10} | {'boucle (ms)':>12} | {'galerie (ms)':>12} | {'gain':>8}")
+    print("-" * 52)
+
+    for size in sizes:
+        features = random_features(size, rng)
+        names = [f"person_{i}" for i in range(size)]
+        persons = [(n, json.dumps(f.tolist())) for n, f in zip(names, features)]
+
+        gallery = FaceGallery()
+        gallery.load(zip(names, features))
+
+        probes = random_features(queries, rng)
+        legacy_repeat = max(1, queries // max(1, size // 1000))
+
+        legacy_ms = timed(lambda: legacy_search(persons, probes[0].tolist()), legacy_repeat)
+        gallery_ms = timed(lambda: gallery.search(probes[0], k=1), queries)
+
+        # Vérifier que les deux chemins donnent le même résultat
+        for probe in probes[:5]:
+            expected, _ = legacy_search(persons, probe.tolist())
+            assert gallery.search(probe, k=1)[0][0] == expected
+
+        print(f"{size:>10} | {legacy_ms:>12.2f} | {gallery_ms:>12.3f} | "
+              f"{legacy_ms / gallery_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la galerie vectorisée")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    run(args.sizes, args.queries)
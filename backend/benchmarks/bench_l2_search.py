@@ -0,0 +1,64 @@
+# bench_l2_search.py - Ancienne comparaison de FaceRecognitionService vs galerie l2 (normes en cache)
+# Usage : python -m benchmarks.bench_l2_search [--sizes 1000 10000 100000] [--batch 32]
+import argparse
+import time
+import numpy as np
+
+from gallery import FaceGallery
+
+DIM = 128  # empreintes dlib
+
+
+def legacy_search(known_faces, encoding):
+    """Reproduction de l'ancien recognize_face : centroïdes recopiés + face_distance à chaque appel"""
+    known_arrays = [np.array(face) for face in known_faces]
+    distances = np.linalg.norm(np.array(known_arrays) - np.array(encoding), axis=1)
+    best = int(np.argmin(distances))
+    return best, distances[best]
+
+
+def timed(func, repeat: int) -> float:
+    """Temps moyen par appel en millisecondes"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes, batch: int, queries: int):
+    rng = np.random.default_rng(0)
+    print(f"{'utilisateurs':>12} | {'ancien (ms)':>11} | {'search (ms)':>11} | "
+          f"{'lot / visage (ms)':>17} | {'gain lot':>8}")
+    print("-" * 72)
+
+    for size in sizes:
+        centers = rng.normal(0, 0.1, (size, DIM)).astype(np.float32)
+        known_faces = list(centers)
+        names = [f"user_{i}" for i in range(size)]
+        probes = rng.normal(0, 0.1, (max(queries, batch), DIM)).astype(np.float32)
+
+        gallery = FaceGallery(metric="l2")
+        gallery.load(zip(names, centers))
+
+        legacy_repeat = max(1, queries // max(1, size // 1000))
+        legacy_ms = timed(lambda: legacy_search(known_faces, probes[0]), legacy_repeat)
+        search_ms = timed(lambda: gallery.search_topk(probes[0], k=3), queries)
+        batch_ms = timed(lambda: gallery.search_topk(probes[:batch], k=3), max(1, queries // batch)) / batch
+
+        # Mêmes correspondances et distances que l'ancien calcul
+        top, distances = gallery.search_topk(probes[:5], k=1)
+        for probe, name, distance in zip(probes[:5], top, distances[:, 0]):
+            best, expected = legacy_search(known_faces, probe)
+            assert name[0] == names[best] and abs(distance - expected) < 1e-4
+
+        print(f"{size:>12} | {legacy_ms:>11.2f} | {search_ms:>11.3f} | "
+              f"{batch_ms:>17.3f} | {legacy_ms / batch_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recherche l2 vectorisée de FaceRecognitionService")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch", type=int, default=32, help="Empreintes comparées par appel (lot)")
+    parser.add_argument("--queries", type=int, default=64)
+    args = parser.parse_args()
+    run(args.sizes, args.batch, args.queries)
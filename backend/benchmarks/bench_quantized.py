@@ -0,0 +1,113 @@
+# bench_quantized.py - Galerie float32 vs quantifiée (int8 / float16) : mémoire, vitesse, exactitude
+# Usage : python -m benchmarks.bench_quantized [--sizes 10000 100000 1000000] [--queries 200]
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+
+from feature_store import FEATURE_DTYPE, decode_features, encode_features
+from gallery import FaceGallery, QuantizedGallery
+
+DIM = 52  # 3 x 16 bins d'histogramme + 4 statistiques Sobel
+
+
+def random_features(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Descripteurs aléatoires positifs normalisés (comme detect_face : tous assez proches)"""
+    features = rng.random((count, DIM)).astype(np.float32)
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def probes(features: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """Nouvelles prises de vue bruitées de personnes de la galerie"""
+    rows = features[rng.integers(0, len(features), count)]
+    rows = rows + rng.normal(0, noise, rows.shape).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def database(directory: str, names, features) -> sqlite3.Connection:
+    """Source exacte du re-classement : table persons en float32 (comme face_system)"""
+    conn = sqlite3.connect(os.path.join(directory, f"bench_{len(names)}.db"), check_same_thread=False)
+    conn.execute("CREATE TABLE persons (name TEXT UNIQUE, features BLOB, features_dtype TEXT)")
+    conn.executemany("INSERT INTO persons VALUES (?, ?, ?)",
+                     ((name, encode_features(row), FEATURE_DTYPE) for name, row in zip(names, features)))
+    conn.commit()
+    return conn
+
+
+def exact_lookup(conn: sqlite3.Connection):
+    def lookup(names):
+        rows = conn.execute(
+            f"SELECT name, features, features_dtype FROM persons WHERE name IN ({','.join('?' * len(names))})",
+            names
+        ).fetchall()
+        return {name: decode_features(features, dtype) for name, features, dtype in rows}
+    return lookup
+
+
+def gallery_bytes(gallery: FaceGallery) -> int:
+    if isinstance(gallery, QuantizedGallery):
+        return gallery.stats()['bytes']
+    return gallery.matrix.nbytes
+
+
+def evaluate(gallery: FaceGallery, queries: np.ndarray, reference, k: int) -> dict:
+    """Temps par requête et écart à la recherche exacte"""
+    start = time.perf_counter()
+    results = [gallery.search(query, k=k) for query in queries]
+    search_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    top1 = np.mean([got[0][0] == ref[0][0] for got, ref in zip(results, reference)])
+    recall = np.mean([len({n for n, _ in got} & {n for n, _ in ref}) / len(ref)
+                      for got, ref in zip(results, reference)])
+    delta = max(abs(got[0][1] - ref[0][1]) for got, ref in zip(results, reference))
+    return {'ms': search_ms, 'top1': top1, 'recall': recall, 'delta': delta}
+
+
+def run(sizes, queries: int, k: int, rerank: int, noise: float):
+    rng = np.random.default_rng(0)
+    print(f"{'personnes':>10} | {'galerie':<23} | {'mémoire (Mo)':>12} | {'gain':>5} | "
+          f"{'recherche (ms)':>14} | {'top-1 = exact':>13} | {'rappel@k':>8} | {'écart max':>9}")
+    print("-" * 115)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            features = random_features(size, rng)
+            names = [f"personne_{i}" for i in range(size)]
+            conn = database(directory, names, features)
+            queries_matrix = probes(features, queries, noise, rng)
+
+            exact = FaceGallery()
+            exact.load(zip(names, features))
+            reference = [exact.search(query, k=k) for query in queries_matrix]
+
+            galleries = [("float32", exact)]
+            for precision in ("float16", "int8"):
+                quantized = QuantizedGallery(precision, exact=exact_lookup(conn), rerank=rerank)
+                quantized.load(zip(names, features))
+                galleries.append((f"{precision} + re-classement", quantized))
+            # Sans re-classement : écart dû à la seule quantification
+            approx = QuantizedGallery("int8", rerank=1)
+            approx.load(zip(names, features))
+            galleries.append(("int8 seul", approx))
+
+            base = gallery_bytes(exact)
+            for label, gallery in galleries:
+                size_bytes = gallery_bytes(gallery)
+                stats = evaluate(gallery, queries_matrix, reference, k)
+                print(f"{size:>10} | {label:<23} | {size_bytes / 2**20:>12.1f} | "
+                      f"{base / size_bytes:>4.1f}x | {stats['ms']:>14.3f} | {stats['top1']:>13.1%} | "
+                      f"{stats['recall']:>8.1%} | {stats['delta']:>9.2e}")
+            conn.close()
+            print("-" * 115)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Galerie quantifiée avec re-classement exact")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="Résultats comparés par requête")
+    parser.add_argument("--rerank", type=int, default=8, help="Candidats re-classés = rerank * k")
+    parser.add_argument("--noise", type=float, default=0.02, help="Bruit des prises de vue")
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.k, args.rerank, args.noise)
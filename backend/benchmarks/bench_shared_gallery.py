@@ -0,0 +1,84 @@
+# bench_shared_gallery.py - Démarrage d'un worker : UltraSimpleFaceSystem() exact vs instantané mappé
+# Usage : python -m benchmarks.bench_shared_gallery [--sizes 10000 100000 1000000] [--multi 0.1]
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from feature_store import FEATURE_DTYPE, encode_features
+
+DIM = 52
+
+
+def build(directory: str, size: int, multi: float, rng: np.random.Generator):
+    """Base de `size` personnes ; une fraction `multi` a trois empreintes (médoïdes)"""
+    from face_system import UltraSimpleFaceSystem
+
+    os.environ["FACE_INDEX"] = "exact"
+    system = UltraSimpleFaceSystem()
+    features = rng.random((size, DIM)).astype(np.float32)
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    with system.db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO persons (name, features, features_dtype) VALUES (?, ?, ?)",
+            ((f"personne_{i}", encode_features(row), FEATURE_DTYPE) for i, row in enumerate(features))
+        )
+        conn.execute("""
+            INSERT INTO templates (person_id, features, features_dtype, is_medoid)
+            SELECT id, features, features_dtype, 1 FROM persons
+        """)
+        extra = rng.choice(size, int(size * multi), replace=False) + 1
+        conn.executemany(
+            "INSERT INTO templates (person_id, features, features_dtype, is_medoid) VALUES (?, ?, ?, 1)",
+            ((int(person_id), encode_features(rng.random(DIM)), FEATURE_DTYPE)
+             for person_id in np.repeat(extra, 2))
+        )
+    system.close()
+    return features
+
+
+def start(kind: str, query: np.ndarray):
+    """Durée de construction du système puis de sa première recherche (ms)"""
+    from face_system import UltraSimpleFaceSystem
+
+    os.environ["FACE_INDEX"] = kind
+    begin = time.perf_counter()
+    system = UltraSimpleFaceSystem()
+    startup_ms = (time.perf_counter() - begin) * 1000
+    begin = time.perf_counter()
+    system.gallery.search(query, k=5)
+    search_ms = (time.perf_counter() - begin) * 1000
+    system.close()
+    return startup_ms, search_ms
+
+
+def run(sizes, multi: float):
+    rng = np.random.default_rng(0)
+    os.environ["FACE_GALLERY_POLL_MS"] = "0"
+    os.environ["FACE_CACHE_SIZE"] = "0"
+    rows = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["FACE_DATA_DIR"] = directory
+            features = build(directory, size, multi, rng)
+            exact_ms, _ = start("exact", features[0])
+            # Premier worker : construit l'instantané ; les suivants l'attachent
+            build_ms, _ = start("mmap", features[0])
+            attach_ms, first_ms = start("mmap", features[1])
+            rows.append((size, exact_ms, build_ms, attach_ms, first_ms))
+
+    print(f"\n{'personnes':>10} | {'exact (ms)':>10} | {'mmap 1er (ms)':>13} | "
+          f"{'mmap attaché (ms)':>17} | {'1re recherche (ms)':>18}")
+    print("-" * 82)
+    for size, exact_ms, build_ms, attach_ms, first_ms in rows:
+        print(f"{size:>10} | {exact_ms:>10.1f} | {build_ms:>13.1f} | {attach_ms:>17.1f} | {first_ms:>18.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temps de démarrage avec la galerie partagée")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--multi", type=float, default=0.1,
+                        help="Fraction des personnes à plusieurs empreintes")
+    args = parser.parse_args()
+    run(args.sizes, args.multi)
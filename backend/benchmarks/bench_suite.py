@@ -0,0 +1,391 @@
+# bench_suite.py - Banc de performance reproductible (hors ligne) + test de charge HTTP
+# Usage : python -m benchmarks.bench_suite run [--gallery 1000] [--identities 20]
+#             [--resolutions 320x240 640x480 1280x720] [--probes 3] [--cold-starts 3] [--http-requests 200]
+#             [--concurrency 4] [--output resultats.json] [--baseline reference.json]
+#         python -m benchmarks.bench_suite compare resultats.json reference.json [--tolerance 0.15]
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Sens d'amélioration des mesures comparées (les autres sont informatives)
+LOWER_IS_BETTER = ("_ms",)
+HIGHER_IS_BETTER = ("throughput_per_s", "accuracy", "_rate")
+
+
+# --- Données synthétiques ----------------------------------------------------
+
+def random_identity(rng: np.random.Generator) -> dict:
+    """Paramètres d'un visage dessiné (détecté par les cascades Haar)"""
+    return {
+        'skin': tuple(int(v) for v in rng.integers(120, 240, 3)),
+        'eyes': (float(rng.uniform(0.14, 0.2)), float(rng.uniform(0.07, 0.13))),
+        'brow': tuple(int(v) for v in rng.integers(10, 80, 3)),
+        'mouth': (float(rng.uniform(0.1, 0.18)), tuple(int(v) for v in rng.integers(40, 180, 3))),
+        'aspect': float(rng.uniform(0.72, 0.82)),
+    }
+
+
+def draw_face(identity: dict, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Visage de `size` pixels de haut (légères variations à chaque tirage)"""
+    img = np.full((size * 2, size * 2, 3), rng.integers(40, 220, 3), np.uint8)
+    c = size + int(rng.integers(-size // 20, size // 20 + 1))
+    half_w, half_h = int(size * 0.55 * identity['aspect']), int(size * 0.55)
+    cv2.ellipse(img, (c, c), (half_w, half_h), 0, 0, 360, identity['skin'], -1)
+    eye_dx, eye_dy = identity['eyes']
+    for side in (-1, 1):
+        eye = (c + side * int(size * eye_dx), c - int(size * eye_dy))
+        cv2.ellipse(img, eye, (int(size * 0.08), int(size * 0.04)), 0, 0, 360, (40, 40, 40), -1)
+        cv2.line(img, (eye[0] - int(size * 0.1), eye[1] - int(size * 0.1)),
+                 (eye[0] + int(size * 0.1), eye[1] - int(size * 0.12)), identity['brow'], max(2, size // 50))
+    cv2.line(img, (c, c - int(size * 0.05)), (c, c + int(size * 0.12)),
+             tuple(v * 3 // 4 for v in identity['skin']), max(2, size // 60))
+    mouth_w, mouth_color = identity['mouth']
+    cv2.ellipse(img, (c, c + int(size * 0.27)), (int(size * mouth_w), int(size * 0.05)), 0, 0, 360, mouth_color, -1)
+    noise = rng.normal(0, 4, img.shape)
+    return cv2.GaussianBlur(np.clip(img + noise, 0, 255).astype(np.uint8), (5, 5), 0)
+
+
+def make_image(identity: dict, resolution: Tuple[int, int], rng: np.random.Generator) -> bytes:
+    """Image JPEG `resolution` (largeur, hauteur) contenant le visage"""
+    width, height = resolution
+    canvas = np.full((height, width, 3), rng.integers(30, 230, 3), np.uint8)
+    face = draw_face(identity, max(40, height * 2 // 5), rng)
+    side = min(face.shape[0], height, width)
+    face = cv2.resize(face, (side, side)) if side != face.shape[0] else face
+    y = int(rng.integers(0, height - side + 1))
+    x = int(rng.integers(0, width - side + 1))
+    canvas[y:y + side, x:x + side] = face
+    ok, encoded = cv2.imencode(".jpg", canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+# --- Mesures ------------------------------------------------------------------
+
+def summarize(samples: List[float], wall: Optional[float] = None) -> dict:
+    """Percentiles en millisecondes ; débit = n / temps total (ou mur si concurrent)"""
+    values = np.array(samples) * 1000
+    total = wall if wall is not None else float(np.sum(samples))
+    return {
+        'n': len(samples),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'throughput_per_s': round(len(samples) / total, 2) if total > 0 else 0.0,
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def populate(system, count: int, rng: np.random.Generator):
+    """Galerie de `count` personnes fictives (descripteurs aléatoires normalisés)"""
+    crop = np.zeros((8, 8, 3), np.uint8)
+    dim = system.extractor.dim
+    for start in range(0, count, 1000):
+        features = rng.random((min(1000, count - start), dim)).astype(np.float32)
+        features /= np.linalg.norm(features, axis=1, keepdims=True)
+        system.enroll_batch([
+            (f"figurant_{start + i}", [({'features': row, 'bbox': (0, 0, 8, 8), 'face_image': crop}, None)])
+            for i, row in enumerate(features)
+        ])
+
+
+def bench_system(system, identities: List[dict], resolutions, probes: int,
+                 rng: np.random.Generator) -> Dict[str, dict]:
+    results = {}
+
+    # Inscription : une image par identité à la résolution intermédiaire
+    enroll_resolution = resolutions[len(resolutions) // 2]
+    samples, failures = [], 0
+    for i, identity in enumerate(identities):
+        (success, _), elapsed = timed(system.register_person, f"identite_{i}",
+                                      make_image(identity, enroll_resolution, rng))
+        samples.append(elapsed)
+        failures += not success
+    results['register_person'] = {**summarize(samples), 'failures': failures}
+
+    for resolution in resolutions:
+        label = f"{resolution[0]}x{resolution[1]}"
+        images = [(i, make_image(identity, resolution, rng))
+                  for _ in range(probes) for i, identity in enumerate(identities)]
+
+        samples, faces = [], 0
+        for _, data in images:
+            face_data, elapsed = timed(system.detect_face, data, None, None, False, False)
+            samples.append(elapsed)
+            faces += face_data is not None
+        results[f'detect_face/{label}'] = {**summarize(samples), 'detection_rate': round(faces / len(images), 3)}
+
+        samples, correct = [], 0
+        for i, data in images:
+            (name, _), elapsed = timed(system.recognize_person, data)
+            samples.append(elapsed)
+            correct += name == f"identite_{i}"
+        results[f'recognize_person/{label}'] = {**summarize(samples), 'accuracy': round(correct / len(images), 3)}
+    return results
+
+
+# --- Test de charge HTTP --------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _multipart(data: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"probe.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def load_test(images: List[bytes], requests: int, concurrency: int) -> dict:
+    """api_final.app servie par uvicorn en local ; `concurrency` clients keep-alive sur /recognize"""
+    import uvicorn
+    import api_final
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api_final.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    bodies = [_multipart(data) for data in images]
+    local = threading.local()
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+
+    def call(index: int) -> Tuple[int, float]:
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        body, content_type = bodies[index % len(bodies)]
+        start = time.perf_counter()
+        conn.request("POST", "/recognize", body, {"Content-Type": content_type})
+        response = conn.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+        return response.status, elapsed
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, range(concurrency)))  # chauffe (connexions, modèles)
+            statuses.clear()
+            start = time.perf_counter()
+            responses = list(pool.map(call, range(requests)))
+            wall = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    # Latences et débit des réponses réussies ; les refus (503) sont comptés à part
+    samples = [elapsed for status, elapsed in responses if status == 200]
+    errors = len(responses) - len(samples)
+    summary = summarize(samples, wall) if samples else {'n': 0}
+    return {**summary, 'concurrency': concurrency, 'errors': errors,
+            'success_rate': round(len(samples) / len(responses), 3),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())}}
+
+
+def _get_status(port: int, path: str) -> Optional[int]:
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", path)
+        status = conn.getresponse().status
+        conn.close()
+        return status
+    except OSError:
+        return None
+
+
+def cold_start(runs: int, timeout: float = 120) -> dict:
+    """
+    Démarrage à froid d'un serveur (nouveau processus) : délai avant la première
+    réponse (/health) puis avant d'être prêt (/ready), galerie et données du banc
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    listen, ready = [], []
+    for _ in range(runs):
+        port = _free_port()
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api_final:app", "--host", "127.0.0.1",
+             "--port", str(port), "--log-level", "warning"],
+            cwd=backend_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            listening = None
+            while time.perf_counter() - start < timeout:
+                if listening is None and _get_status(port, "/health") == 200:
+                    listening = time.perf_counter() - start
+                if listening is not None and _get_status(port, "/ready") == 200:
+                    listen.append(listening)
+                    ready.append(time.perf_counter() - start)
+                    break
+                time.sleep(0.01)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    if not ready:
+        return {'n': 0}
+    return {'n': len(ready),
+            'listen_ms': round(sorted(listen)[len(listen) // 2] * 1000, 2),
+            'ready_ms': round(sorted(ready)[len(ready) // 2] * 1000, 2)}
+
+
+# --- Comparaison ------------------------------------------------------------------
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> List[dict]:
+    """Écarts mesure par mesure ; `regression` si pire que la référence au-delà de la tolérance"""
+    rows = []
+    for name, metrics in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        for key, value in metrics.items():
+            base = reference.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+                continue
+            if key.endswith(LOWER_IS_BETTER):
+                worse = value > base * (1 + tolerance) and value - base >= min_delta_ms
+            elif key.endswith(HIGHER_IS_BETTER):
+                worse = value < base * (1 - tolerance)
+            else:
+                continue
+            change = (value - base) / base if base else 0.0
+            rows.append({'benchmark': name, 'metric': key, 'baseline': base, 'current': value,
+                         'change': round(change, 4), 'regression': worse})
+    return rows
+
+
+def print_comparison(rows: List[dict]) -> bool:
+    print(f"{'mesure':<40} | {'référence':>10} | {'actuel':>10} | {'écart':>8}")
+    print("-" * 78)
+    for row in rows:
+        flag = "  ❌" if row['regression'] else ""
+        print(f"{row['benchmark'] + ' ' + row['metric']:<40} | {row['baseline']:>10} | "
+              f"{row['current']:>10} | {row['change']:>+8.1%}{flag}")
+    regressions = [row for row in rows if row['regression']]
+    print(f"\n{'❌' if regressions else '✅'} {len(regressions)} régression(s) sur {len(rows)} mesures")
+    return not regressions
+
+
+# --- Commandes ------------------------------------------------------------------
+
+def run(args) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="face_bench_")
+    # Système isolé, sans cache de détection (chaque passe mesure le vrai coût)
+    os.environ["FACE_DATA_DIR"] = data_dir
+    os.environ["FACE_CACHE_SIZE"] = "0"
+    os.environ.setdefault("FACE_SAVE_UPLOADS", "0")
+    from face_system import UltraSimpleFaceSystem
+
+    rng = np.random.default_rng(args.seed)
+    resolutions = [parse_resolution(value) for value in args.resolutions]
+    identities = [random_identity(rng) for _ in range(args.identities)]
+
+    system = UltraSimpleFaceSystem()
+    _, populate_s = timed(populate, system, args.gallery, rng)
+    results = bench_system(system, identities, resolutions, args.probes, rng)
+    results['populate'] = {'persons': args.gallery, 'seconds': round(populate_s, 3)}
+    system.close()
+
+    if args.cold_starts > 0:
+        results['startup'] = cold_start(args.cold_starts)
+
+    if args.http_requests > 0:
+        images = [make_image(identity, resolutions[0], rng) for identity in identities]
+        results['http/recognize'] = load_test(images, args.http_requests, args.concurrency)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {key: value for key, value in vars(args).items() if key != 'command'},
+            'env': {key: value for key, value in os.environ.items() if key.startswith("FACE_")},
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de performance du backend de reconnaissance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Lancer les mesures")
+    run_parser.add_argument("--gallery", type=int, default=1000, help="Personnes fictives dans la galerie")
+    run_parser.add_argument("--identities", type=int, default=20, help="Identités dessinées (inscrites puis reconnues)")
+    run_parser.add_argument("--resolutions", nargs="+", default=["320x240", "640x480", "1280x720"])
+    run_parser.add_argument("--probes", type=int, default=3, help="Images de test par identité et résolution")
+    run_parser.add_argument("--cold-starts", type=int, default=3,
+                            help="Démarrages à froid du serveur mesurés (médiane)")
+    run_parser.add_argument("--http-requests", type=int, default=200, help="Requêtes du test de charge (0 = aucun)")
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default=None, help="Fichier JSON des résultats")
+    run_parser.add_argument("--baseline", default=None, help="Comparer aussitôt à cette référence")
+    run_parser.add_argument("--tolerance", type=float, default=0.15)
+    run_parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                            help="Écart de latence ignoré en dessous de ce seuil (bruit)")
+
+    compare_parser = commands.add_parser("compare", help="Comparer deux fichiers de résultats")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--tolerance", type=float, default=0.15)
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.current) as f:
+            current = json.load(f)
+        baseline_path = args.baseline
+    else:
+        current = run(args)
+        text = json.dumps(current, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+            print(f"💾 Résultats écrits dans {args.output}")
+        else:
+            print(text)
+        baseline_path = args.baseline
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if not print_comparison(compare(current, baseline, args.tolerance, args.min_delta_ms)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# bench_upload_path.py - Fichier temporaire + cv2.imread vs décodage en mémoire
+# Usage : python -m benchmarks.bench_upload_path [--images uploads] [--repeat 50]
+import argparse
+import os
+import tempfile
+import time
+import uuid
+import numpy as np
+from pathlib import Path
+
+from face_system import UltraSimpleFaceSystem
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def percentiles(samples):
+    """(p50, p99) en millisecondes"""
+    values = np.array(samples) * 1000
+    return float(np.percentile(values, 50)), float(np.percentile(values, 99))
+
+
+def legacy_path(system: UltraSimpleFaceSystem, data: bytes, tmp_dir: str):
+    """Ancien chemin : copie sur disque, relecture par cv2.imread, suppression"""
+    temp_file = os.path.join(tmp_dir, f"temp_{uuid.uuid4()}.jpg")
+    with open(temp_file, "wb") as f:
+        f.write(data)
+    system.detect_face(temp_file)
+    os.remove(temp_file)
+
+
+def memory_path(system: UltraSimpleFaceSystem, data: bytes, tmp_dir: str):
+    """Nouveau chemin : cv2.imdecode sur le buffer reçu"""
+    system.detect_face(data)
+
+
+def run(images_dir: str, repeat: int):
+    paths = [p for p in sorted(Path(images_dir).iterdir()) if p.suffix.lower() in IMAGE_EXTENSIONS]
+    if not paths:
+        print(f"⚠️ Aucune image dans {images_dir}")
+        return
+    payloads = [p.read_bytes() for p in paths]
+
+    system = UltraSimpleFaceSystem()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, path_func in (("fichier temp", legacy_path), ("en mémoire", memory_path)):
+            samples = []
+            for _ in range(repeat):
+                for data in payloads:
+                    start = time.perf_counter()
+                    path_func(system, data, tmp_dir)
+                    samples.append(time.perf_counter() - start)
+            p50, p99 = percentiles(samples)
+            print(f"{label:>14} : p50 {p50:7.2f} ms | p99 {p99:7.2f} ms ({len(samples)} appels)")
+    system.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du chemin de décodage des uploads")
+    parser.add_argument("--images", default="uploads")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.images, args.repeat)
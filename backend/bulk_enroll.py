@@ -0,0 +1,332 @@
+# bulk_enroll.py - Import en masse de photos (dossier ou manifeste CSV)
+# Usage : python bulk_enroll.py photos/ [--job site-a] [--workers 4] [--batch 64]
+#         python bulk_enroll.py manifeste.csv [--retry-failed]
+import argparse
+import csv
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from face_system import FaceAnalyzer, UltraSimpleFaceSystem, inside, load_image
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# Détection propre à chaque processus du pool (ni base ni galerie : l'insertion reste au parent)
+_worker_system: Optional[FaceAnalyzer] = None
+_worker_preset: Optional[str] = None
+
+
+def _init_worker(preset: Optional[str]):
+    global _worker_system, _worker_preset
+    _worker_system = FaceAnalyzer()
+    _worker_preset = preset
+
+
+def _extract(path: str, system: Optional[FaceAnalyzer] = None,
+             preset: Optional[str] = None) -> Tuple[Optional[dict], Optional[str]]:
+    """(visage détecté, None) ou (None, erreur) pour une image"""
+    system = system or _worker_system
+    preset = preset or _worker_preset
+    if not os.path.exists(path):
+        return None, "Fichier introuvable"
+    try:
+        img = load_image(path)
+        if img is None:
+            return None, "Image illisible"
+        face_data = system.detect_face(img, preset, with_images=True, use_cache=False)
+    except Exception as e:
+        return None, str(e)
+    if face_data is None:
+        return None, "Aucun visage détecté dans l'image"
+    # L'image complète ne repart pas vers le processus principal
+    face_data.pop('original_image', None)
+    return face_data, None
+
+
+def read_manifest(source: str, within: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Couples (nom, chemin d'image)
+    - CSV : colonnes nom, chemin (en-tête facultatif, chemins relatifs au fichier)
+    - dossier : une image par personne (nom = nom du fichier)
+      ou un sous-dossier par personne (nom = sous-dossier, plusieurs images)
+    Avec `within`, un chemin du manifeste hors de ce dossier lève ValueError.
+    """
+    root = Path(source)
+    entries = []
+    if root.is_file():
+        with open(root, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if len(row) < 2 or not row[0].strip():
+                    continue
+                name, path = row[0].strip(), row[1].strip()
+                if name.lower() in ('name', 'nom') and not os.path.splitext(path)[1]:
+                    continue
+                entries.append((name, str((root.parent / path).absolute())))
+    elif root.is_dir():
+        for path in sorted(root.iterdir()):
+            if path.is_dir():
+                entries.extend(
+                    (path.name, str(image.absolute()))
+                    for image in sorted(path.iterdir())
+                    if image.suffix.lower() in IMAGE_EXTENSIONS
+                )
+            elif path.suffix.lower() in IMAGE_EXTENSIONS:
+                entries.append((path.stem, str(path.absolute())))
+    else:
+        raise FileNotFoundError(f"Source introuvable: {source}")
+
+    # Chemins relatifs en « .. » ou liens symboliques sortant du dossier autorisé
+    if within is not None:
+        for _, path in entries:
+            if not inside(path, within):
+                raise ValueError(f"Chemin hors du dossier d'import: {path}")
+    return entries
+
+
+def default_job_id(source: str) -> str:
+    """Identifiant stable d'un import : relancer la même source reprend le même suivi"""
+    return hashlib.sha1(str(Path(source).absolute()).encode()).hexdigest()[:16]
+
+
+class BulkImporter:
+    """
+    Import en masse : extraction en parallèle (pool de processus), insertion
+    par lots de `batch_size` personnes dans une seule transaction, visages
+    découpés écrits par lot. Chaque fichier traité est noté dans `import_progress`
+    dans la même transaction : un import interrompu reprend là où il s'est arrêté.
+    Avec `retry_failed`, les images d'une personne déjà inscrite lui sont ajoutées ;
+    celles au-delà de `max_templates` sont notées 'skipped'.
+    """
+
+    def __init__(self, face_system: UltraSimpleFaceSystem, job_id: str,
+                 workers: Optional[int] = None, batch_size: int = 64,
+                 preset: Optional[str] = "accurate", retry_failed: bool = False):
+        self.face_system = face_system
+        self.job_id = job_id
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = max(1, batch_size)
+        self.preset = preset
+        self.retry_failed = retry_failed
+        self._stop = threading.Event()
+
+        # Avancement
+        self.total = 0
+        self.skipped = 0
+        self.processed = 0
+        self.enrolled = 0
+        self.templates = 0
+        self.over_limit = 0
+        self.failures: List[dict] = []
+        self.elapsed = 0.0
+        self._init_table()
+
+    def _init_table(self):
+        with self.face_system.db.transaction() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS import_progress (
+                job_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                message TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_id, path)
+            )
+            """)
+
+    def _done_paths(self) -> set:
+        """Fichiers déjà traités par cet import (les échecs sont repris avec retry_failed)"""
+        query = "SELECT path FROM import_progress WHERE job_id = ?"
+        if self.retry_failed:
+            query += " AND status != 'failed'"
+        with self.face_system.db.connection() as conn:
+            return {row[0] for row in conn.execute(query, (self.job_id,))}
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self, entries: Iterable[Tuple[str, str]]) -> dict:
+        start = time.perf_counter()
+        entries = list(entries)
+        self.total = len(entries)
+        done = self._done_paths()
+        pending = [(name, path) for name, path in entries if path not in done]
+        self.skipped = self.total - len(pending)
+
+        # Images d'une même personne consécutives (insérées ensemble)
+        by_person: Dict[str, List[str]] = {}
+        for name, path in pending:
+            by_person.setdefault(name, []).append(path)
+        paths = [path for person_paths in by_person.values() for path in person_paths]
+
+        pool = None
+        if self.workers > 0 and paths:
+            # "spawn" : les workers ne partagent ni connexions SQLite ni threads du parent
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self.preset,)
+            )
+            results = pool.map(_extract, paths, chunksize=4)
+        else:
+            results = (_extract(path, self.face_system, self.preset) for path in paths)
+
+        try:
+            batch = []
+            iterator = iter(results)
+            for name, person_paths in by_person.items():
+                if self._stop.is_set():
+                    break
+                faces, failed = [], []
+                for path in person_paths:
+                    face_data, error = next(iterator)
+                    self.processed += 1
+                    if face_data is None:
+                        failed.append((path, error))
+                    else:
+                        faces.append((face_data, path))
+                batch.append((name, faces, failed))
+                if len(batch) >= self.batch_size:
+                    self._commit(batch)
+                    batch = []
+            if batch:
+                self._commit(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=not self.stopped, cancel_futures=True)
+            self.elapsed += time.perf_counter() - start
+        return self.report()
+
+    def _commit(self, batch: List[tuple]):
+        """Un lot : personnes, empreintes et suivi dans la même transaction"""
+        limit = f"Maximum {self.face_system.max_templates} images par personne"
+
+        def record(conn, results):
+            rows = []
+            for (name, faces, failed), (_, success, message, dropped) in zip(batch, results):
+                kept = len(faces) - dropped
+                status = 'done' if success else 'failed'
+                rows.extend((self.job_id, path, name, status, None if success else message)
+                            for _, path in faces[:kept])
+                rows.extend((self.job_id, path, name, 'skipped', limit) for _, path in faces[kept:])
+                rows.extend((self.job_id, path, name, 'failed', error) for path, error in failed)
+            conn.executemany(
+                "INSERT OR REPLACE INTO import_progress (job_id, path, name, status, message) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+        results = self.face_system.enroll_batch(
+            [(name, faces) for name, faces, _ in batch], on_commit=record, extend=self.retry_failed
+        )
+        for (name, faces, failed), (_, success, message, dropped) in zip(batch, results):
+            kept = len(faces) - dropped
+            self.over_limit += dropped
+            self.failures.extend({'name': name, 'path': path, 'error': error} for path, error in failed)
+            if success:
+                self.enrolled += 1
+                self.templates += kept
+            else:
+                self.failures.extend({'name': name, 'path': path, 'error': message} for _, path in faces[:kept])
+
+    def report(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'total': self.total,
+            'skipped': self.skipped,
+            'processed': self.processed,
+            'enrolled': self.enrolled,
+            'templates': self.templates,
+            'over_limit': self.over_limit,
+            'failed': len(self.failures),
+            'failures': self.failures,
+            'elapsed_s': round(self.elapsed, 2),
+            'images_per_s': round(self.processed / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+
+class ImportJob:
+    """Import lancé depuis l'API dans un thread de fond"""
+
+    def __init__(self, face_system: UltraSimpleFaceSystem, source: str,
+                 job_id: Optional[str] = None, within: Optional[str] = None, **options):
+        self.source = source
+        self.within = within
+        self.job_id = job_id or uuid.uuid4().hex[:16]
+        self.importer = BulkImporter(face_system, self.job_id, **options)
+        self.status = 'pending'
+        self.error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name=f"import-{self.job_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        self.status = 'running'
+        try:
+            self.importer.run(read_manifest(self.source, self.within))
+            self.status = 'stopped' if self.importer.stopped else 'completed'
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+
+    def stop(self):
+        self.importer.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def info(self) -> dict:
+        return {'status': self.status, 'source': self.source, 'error': self.error,
+                **self.importer.report()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse de photos d'inscription")
+    parser.add_argument("source", help="Dossier d'images ou manifeste CSV (nom, chemin)")
+    parser.add_argument("--job", default=None, help="Identifiant de reprise (par défaut : dérivé de la source)")
+    parser.add_argument("--workers", type=int, default=None, help="Processus d'extraction (0 = aucun)")
+    parser.add_argument("--batch", type=int, default=64, help="Personnes par transaction")
+    parser.add_argument("--preset", choices=["fast", "balanced", "accurate"], default="accurate")
+    parser.add_argument("--retry-failed", action="store_true", help="Retraiter les fichiers en échec")
+    args = parser.parse_args()
+
+    system = UltraSimpleFaceSystem()
+    importer = BulkImporter(system, args.job or default_job_id(args.source),
+                            workers=args.workers, batch_size=args.batch,
+                            preset=args.preset, retry_failed=args.retry_failed)
+    try:
+        report = importer.run(read_manifest(args.source))
+    except KeyboardInterrupt:
+        importer.stop()
+        report = importer.report()
+        print("⏸️ Import interrompu : relancer la même commande pour reprendre")
+    finally:
+        system.close()
+
+    print("=" * 60)
+    print(f"📥 Import {report['job_id']} : {report['processed']} images traitées "
+          f"({report['skipped']} déjà faites) en {report['elapsed_s']} s, "
+          f"{report['images_per_s']} images/s")
+    print(f"✅ {report['enrolled']} personnes inscrites ou complétées ({report['templates']} empreintes)")
+    if report['over_limit']:
+        print(f"⏭️ {report['over_limit']} images ignorées (maximum d'empreintes par personne atteint)")
+    if report['failures']:
+        print(f"❌ {report['failed']} échecs :")
+        for failure in report['failures']:
+            print(f"   {failure['name']} - {failure['path']} : {failure['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# change_feed.py - Journal des modifications de galerie et synchronisation entre processus
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from connection_manager import ConnectionManager
+
+# Entrées conservées dans le journal ; un processus plus en retard recharge tout
+RETENTION = 100000
+
+
+def init_change_log(conn: sqlite3.Connection, table: str = "gallery_changes"):
+    """Crée le journal : une ligne par modification, version croissante"""
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        name TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """)
+
+
+def record_change(conn: sqlite3.Connection, op: str, name: str,
+                  table: str = "gallery_changes") -> int:
+    """
+    Note une modification ('upsert' ou 'delete') dans la transaction en cours
+    Retourne la nouvelle version
+    """
+    version = conn.execute(
+        f"INSERT INTO {table} (op, name, created_at) VALUES (?, ?, ?)",
+        (op, name, time.time())
+    ).lastrowid
+    conn.execute(f"DELETE FROM {table} WHERE version <= ?", (version - RETENTION,))
+    return version
+
+
+def latest_version(conn: sqlite3.Connection, table: str = "gallery_changes") -> int:
+    row = conn.execute(f"SELECT MAX(version) FROM {table}").fetchone()
+    return row[0] or 0
+
+
+class GallerySync:
+    """
+    Relit le journal toutes les `interval` secondes et applique les deltas
+    - `apply({nom: 'upsert' | 'delete'})` : dernière opération par nom depuis la version appliquée
+    - `reload() -> version` : rechargement complet si le journal a été purgé entre-temps
+    - `after_poll(version) -> version | None` (facultatif) : appelé après chaque relecture ;
+      s'il retourne une autre version (instantané partagé rattaché), les deltas
+      postérieurs sont rejoués aussitôt
+    Les opérations sont idempotentes : rejouer une modification déjà appliquée est sans effet.
+    """
+
+    def __init__(self, db: ConnectionManager, apply: Callable[[Dict[str, str]], None],
+                 reload: Callable[[], int], version: int,
+                 table: str = "gallery_changes", interval: float = 1.0,
+                 after_poll: Optional[Callable[[int], Optional[int]]] = None):
+        self.db = db
+        self.apply = apply
+        self.reload = reload
+        self.after_poll = after_poll
+        self.version = version
+        self.table = table
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Compteurs et retard
+        self.latest = version
+        self.applied = 0
+        self.full_reloads = 0
+        self.errors = 0
+        self.last_sync = time.time()
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        """Démarre la relecture périodique (idempotent, sans effet si interval <= 0)"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=f"sync-{self.table}", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Synchronisation de la galerie: {e}")
+
+    def poll(self) -> int:
+        """Applique les modifications en attente ; retourne leur nombre"""
+        with self._lock:
+            count = self._catch_up()
+            if self.after_poll is not None:
+                attached = self.after_poll(self.version)
+                if attached is not None and attached != self.version:
+                    self.version = attached
+                    count += self._catch_up()
+            return count
+
+    def _catch_up(self) -> int:
+        with self.db.connection() as conn:
+            oldest, latest = conn.execute(
+                f"SELECT MIN(version), MAX(version) FROM {self.table}"
+            ).fetchone()
+            changes = conn.execute(
+                f"SELECT version, op, name, created_at FROM {self.table} "
+                f"WHERE version > ? ORDER BY version",
+                (self.version,)
+            ).fetchall()
+        now = time.time()
+        self.latest = latest or self.version
+        if not changes:
+            self.last_sync = now
+            return 0
+
+        if oldest is not None and oldest > self.version + 1:
+            # Entrées manquantes (purgées) : rechargement complet
+            self.version = max(self.reload(), changes[-1][0])
+            self.full_reloads += 1
+        else:
+            operations = {}
+            for _, op, name, _ in changes:
+                operations[name] = op
+            self.apply(operations)
+            self.version = changes[-1][0]
+
+        self.applied += len(changes)
+        self.last_lag = now - changes[0][3]
+        self.max_lag = max(self.max_lag, self.last_lag)
+        self.last_sync = now
+        return len(changes)
+
+    def stats(self) -> dict:
+        return {
+            'version': self.version,
+            'latest_seen': self.latest,
+            'behind': self.latest - self.version,
+            'last_sync_age_s': round(time.time() - self.last_sync, 3),
+            'last_lag_ms': round(self.last_lag * 1000, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'applied': self.applied,
+            'full_reloads': self.full_reloads,
+            'errors': self.errors,
+        }
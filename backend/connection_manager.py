@@ -0,0 +1,98 @@
+# connection_manager.py - Connexions SQLite persistantes (une par thread, mode WAL)
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# Réglages appliqués à chaque nouvelle connexion
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # lecteurs et écrivain ne se bloquent plus
+    "PRAGMA synchronous=NORMAL",    # fsync au checkpoint seulement (sûr en WAL)
+    "PRAGMA cache_size=-16000",     # 16 Mo de cache de pages
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionManager:
+    """
+    Gestionnaire de connexions SQLite partagé
+    Chaque thread garde sa propre connexion ouverte : plus de connect/close
+    par requête, et le cache de requêtes préparées de sqlite3 reste chaud.
+    """
+
+    def __init__(self, db_path: str, row_factory: Optional[Callable] = None,
+                 cached_statements: int = 256):
+        self.db_path = db_path
+        self.row_factory = row_factory
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=5.0,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        return conn
+
+    def _prune(self):
+        """Ferme les connexions des threads terminés"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def get(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée au besoin)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._prune()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Connexion pour lecture (jamais fermée à la sortie)"""
+        yield self.get()
+
+    @contextmanager
+    def transaction(self):
+        """Connexion pour écriture : commit en sortie, rollback sur erreur"""
+        conn = self.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close_all(self):
+        """Ferme toutes les connexions ouvertes (arrêt du service)"""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(db_path: str, row_factory: Optional[Callable] = None) -> ConnectionManager:
+    """Retourne le gestionnaire partagé associé à un fichier de base"""
+    with _managers_lock:
+        manager = _managers.get(db_path)
+        if manager is None:
+            manager = ConnectionManager(db_path, row_factory=row_factory)
+            _managers[db_path] = manager
+        return manager
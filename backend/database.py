@@ -1,32 +1,69 @@
 # database.py - Gestion de la base de données
+import os
 import sqlite3
-import json
+import threading
 from contextlib import contextmanager
+from pathlib import Path
 
-DATABASE_PATH = "backend/face_recognition.db"
+from change_feed import init_change_log, latest_version, record_change
+from connection_manager import get_manager
+from feature_store import FEATURE_DTYPE, encode_features, migrate_to_blob
+
+# Chemins absolus : indépendants du répertoire de lancement
+BASE_DIR = Path(__file__).parent.absolute()
+DATABASE_PATH = os.environ.get("FACE_SERVICE_DB") or str(BASE_DIR / "face_recognition.db")
+SCHEMA_PATH = BASE_DIR / "schema.sql"
+
+# Journal des modifications d'empreintes (synchronisation des FaceRecognitionService)
+CHANGES_TABLE = "encoding_changes"
+
+# Schéma appliqué au premier accès (et non à l'import du module)
+_init_lock = threading.Lock()
+_initialized = False
+
+def _manager():
+    # sqlite3.Row pour accéder aux colonnes par nom
+    return get_manager(DATABASE_PATH, row_factory=sqlite3.Row)
 
 @contextmanager
 def get_db_connection():
-    """Contexte pour gestion automatique de la connexion DB"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Pour accéder aux colonnes par nom
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """Contexte pour gestion automatique de la connexion DB (persistante par thread)"""
+    if not _initialized:
+        init_database()
+    with _manager().connection() as conn:
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
 
 def init_database():
-    """Initialise la base de données avec le schéma"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Lire le schéma SQL
-        with open("schema.sql", "r") as f:
-            schema = f.read()
-        
-        # Exécuter le schéma
-        cursor.executescript(schema)
-        conn.commit()
+    """Initialise la base de données avec le schéma (une seule fois par processus)"""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        with _manager().connection() as conn:
+            cursor = conn.cursor()
+            
+            # Lire le schéma SQL
+            with open(SCHEMA_PATH, "r") as f:
+                schema = f.read()
+            
+            # Exécuter le schéma
+            cursor.executescript(schema)
+            conn.commit()
+            
+            # Bases créées avant le seuil par utilisateur
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(users)")}
+            if 'threshold' not in columns:
+                cursor.execute("ALTER TABLE users ADD COLUMN threshold REAL")
+            
+            # Migration des empreintes JSON vers le format binaire
+            migrate_to_blob(conn, "face_encodings", "encoding", "encoding_dtype")
+            init_change_log(conn, CHANGES_TABLE)
+            conn.commit()
+        _initialized = True
         print("✅ Base de données initialisée")
 
 # Fonctions utilitaires
@@ -46,21 +83,62 @@ def add_face_encoding(user_id: int, encoding: list, image_path: str = None):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "INSERT INTO face_encodings (user_id, encoding, image_path) VALUES (?, ?, ?)",
-            (user_id, json.dumps(encoding), image_path)
+            "INSERT INTO face_encodings (user_id, encoding, encoding_dtype, image_path) VALUES (?, ?, ?, ?)",
+            (user_id, encode_features(encoding), FEATURE_DTYPE, image_path)
         )
+        row = cursor.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row:
+            record_change(conn, 'upsert', row['username'], CHANGES_TABLE)
+        conn.commit()
+
+def delete_user(user_id: int) -> bool:
+    """Supprime un utilisateur et ses empreintes"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        row = cursor.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+        if not row:
+            return False
+        cursor.execute("DELETE FROM face_encodings WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        record_change(conn, 'delete', row['username'], CHANGES_TABLE)
         conn.commit()
+        return True
+
+def set_user_threshold(username: str, threshold) -> bool:
+    """Distance maximale propre à un utilisateur (None : seuil commun)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET threshold = ? WHERE username = ?", (threshold, username))
+        if cursor.rowcount == 0:
+            return False
+        record_change(conn, 'upsert', username, CHANGES_TABLE)
+        conn.commit()
+        return True
 
 def get_all_encodings():
     """Récupère toutes les empreintes"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT fe.*, u.username 
+            SELECT fe.*, u.username, u.threshold
             FROM face_encodings fe
             JOIN users u ON fe.user_id = u.id
         """)
         return [dict(row) for row in cursor.fetchall()]
 
-# Initialiser la DB au démarrage
-init_database()
\ No newline at end of file
+def get_user_encodings(usernames: list) -> list:
+    """Empreintes de quelques utilisateurs (application d'un delta)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT fe.*, u.username, u.threshold
+            FROM face_encodings fe
+            JOIN users u ON fe.user_id = u.id
+            WHERE u.username IN ({','.join('?' * len(usernames))})
+        """, list(usernames))
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_encodings_version() -> int:
+    """Dernière version du journal des empreintes"""
+    with get_db_connection() as conn:
+        return latest_version(conn, CHANGES_TABLE)
@@ -0,0 +1,179 @@
+# descriptor_cache.py - Cache LRU des détections par empreinte du contenu
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from connection_manager import get_manager
+
+Box = Tuple[int, int, int, int]
+
+# Entrée : (expiration, boîtes, descripteurs float32 en lecture seule, une ligne par boîte)
+Entry = Tuple[float, List[Box], np.ndarray]
+
+
+class DescriptorCache:
+    """
+    Résultats de detect_faces (boîtes + descripteurs) indexés par un hachage des octets reçus
+    - LRU borné à `max_entries` entrées, chacune valable `ttl_seconds`
+    - niveau disque optionnel (SQLite) relu après un redémarrage
+    Les images elles-mêmes ne sont jamais mises en cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 disk_path: Optional[str] = None, prune_every: int = 256):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.prune_every = prune_every
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.disk_hits = 0
+        self._puts = 0
+
+        self.disk = get_manager(disk_path) if disk_path else None
+        if self.disk is not None:
+            self._init_disk()
+
+    def _init_disk(self):
+        with self.disk.transaction() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS descriptor_cache (
+                key TEXT PRIMARY KEY,
+                bboxes TEXT NOT NULL,
+                features BLOB NOT NULL,
+                dim INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_descriptor_cache_created "
+                         "ON descriptor_cache(created_at)")
+        self._prune_disk()
+
+    @staticmethod
+    def make_key(data, *params) -> str:
+        """Empreinte BLAKE2 du contenu + paramètres qui changent le résultat"""
+        digest = hashlib.blake2b(data, digest_size=16)
+        digest.update(repr(params).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        """Faces en cache ({'features', 'bbox'}) ou None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._faces(entry)
+                del self._entries[key]
+                self.expired += 1
+
+        entry = self._load(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._insert(key, entry)
+        return self._faces(entry)
+
+    def put(self, key: str, faces: Sequence[dict]):
+        """Met en cache le résultat d'une détection (sans images)"""
+        bboxes = [tuple(int(v) for v in face['bbox']) for face in faces]
+        features = np.array([face['features'] for face in faces], dtype=np.float32)
+        features.setflags(write=False)
+        entry = (time.time() + self.ttl, bboxes, features)
+        with self._lock:
+            self._insert(key, entry)
+            self._puts += 1
+            prune = self._puts % self.prune_every == 0
+        if self.disk is not None:
+            self._store(key, entry)
+            if prune:
+                self._prune_disk()
+
+    def _insert(self, key: str, entry: Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _faces(entry: Entry) -> List[dict]:
+        _, bboxes, features = entry
+        return [{'features': row, 'bbox': bbox} for bbox, row in zip(bboxes, features)]
+
+    def _load(self, key: str, now: float) -> Optional[Entry]:
+        if self.disk is None:
+            return None
+        with self.disk.connection() as conn:
+            row = conn.execute(
+                "SELECT bboxes, features, dim, created_at FROM descriptor_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None or row[3] + self.ttl <= now:
+            return None
+        bboxes = [tuple(bbox) for bbox in json.loads(row[0])]
+        features = np.frombuffer(row[1], dtype=np.float32).reshape(len(bboxes), row[2])
+        return row[3] + self.ttl, bboxes, features
+
+    def _store(self, key: str, entry: Entry):
+        expires_at, bboxes, features = entry
+        dim = features.shape[1] if features.ndim == 2 else 0
+        with self.disk.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO descriptor_cache (key, bboxes, features, dim, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(bboxes), features.tobytes(), dim, expires_at - self.ttl)
+            )
+
+    def _prune_disk(self):
+        """Supprime les entrées expirées et les plus anciennes au-delà de 10 x max_entries"""
+        with self.disk.transaction() as conn:
+            conn.execute("DELETE FROM descriptor_cache WHERE created_at <= ?",
+                         (time.time() - self.ttl,))
+            conn.execute("""
+            DELETE FROM descriptor_cache WHERE key IN (
+                SELECT key FROM descriptor_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """, (self.max_entries * 10,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            with self.disk.transaction() as conn:
+                conn.execute("DELETE FROM descriptor_cache")
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'disk': self.disk is not None,
+                'disk_hits': self.disk_hits,
+            }
@@ -0,0 +1,184 @@
+# detectors.py - Détecteurs de visages interchangeables (Haar, LBP, YuNet, dlib HOG)
+import os
+import threading
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+Box = Tuple[int, int, int, int]
+
+# Dossier des modèles locaux (LBP, YuNet...)
+MODELS_DIR = Path(__file__).parent.absolute() / "models"
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _to_bgr(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+
+
+def _find_model(filename: str, env_var: str) -> str:
+    """Chemin d'un modèle : variable d'environnement, dossier models/, puis données OpenCV"""
+    candidates = [os.environ.get(env_var), str(MODELS_DIR / filename)]
+    if hasattr(cv2, "data"):
+        candidates.append(os.path.join(cv2.data.haarcascades, filename))
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    raise FileNotFoundError(
+        f"Modèle introuvable: {filename} (définir {env_var} ou le placer dans {MODELS_DIR})"
+    )
+
+
+class FaceDetector:
+    """
+    Interface commune : detect(image BGR ou niveaux de gris) -> boîtes (x, y, w, h)
+    `scale_factor` et `min_neighbors` ne concernent que les cascades.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _instance(self):
+        """Modèle propre au thread courant (les détecteurs OpenCV ne sont pas thread-safe)"""
+        model = getattr(self._local, "model", None)
+        if model is None:
+            model = self._load()
+            self._local.model = model
+        return model
+
+    def _load(self):
+        raise NotImplementedError
+
+    def detect(self, image: np.ndarray, scale_factor: float = 1.1,
+               min_neighbors: int = 5, min_size: int = 30) -> List[Box]:
+        raise NotImplementedError
+
+
+class CascadeDetector(FaceDetector):
+    """Cascade OpenCV (Haar ou LBP)"""
+
+    def __init__(self, cascade_path: str):
+        super().__init__()
+        self.cascade_path = cascade_path
+        # Vérifier le fichier dès la création plutôt qu'à la première requête
+        if self._instance().empty():
+            raise ValueError(f"Cascade illisible: {cascade_path}")
+
+    def _load(self):
+        return cv2.CascadeClassifier(self.cascade_path)
+
+    def detect(self, image, scale_factor=1.1, min_neighbors=5, min_size=30):
+        faces = self._instance().detectMultiScale(
+            _to_gray(image),
+            scaleFactor=scale_factor,
+            minNeighbors=min_neighbors,
+            minSize=(min_size, min_size)
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class HaarDetector(CascadeDetector):
+    name = "haar"
+
+    def __init__(self, cascade_file: str = "haarcascade_frontalface_default.xml"):
+        super().__init__(cv2.data.haarcascades + cascade_file)
+
+
+class LBPDetector(CascadeDetector):
+    """Cascade LBP : nettement plus rapide que Haar sur CPU"""
+
+    name = "lbp"
+
+    def __init__(self, cascade_path: Optional[str] = None):
+        super().__init__(cascade_path or _find_model("lbpcascade_frontalface_improved.xml", "FACE_LBP_CASCADE"))
+
+
+class YuNetDetector(FaceDetector):
+    """Réseau YuNet (OpenCV DNN) depuis un fichier ONNX local"""
+
+    name = "yunet"
+
+    def __init__(self, model_path: Optional[str] = None, score_threshold: float = 0.8,
+                 nms_threshold: float = 0.3, top_k: int = 5000):
+        super().__init__()
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("OpenCV >= 4.5.4 requis pour YuNet")
+        self.model_path = model_path or _find_model("face_detection_yunet_2023mar.onnx", "FACE_YUNET_MODEL")
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.top_k = top_k
+        self._instance()
+
+    def _load(self):
+        return cv2.FaceDetectorYN.create(
+            self.model_path, "", (320, 320),
+            self.score_threshold, self.nms_threshold, self.top_k
+        )
+
+    def detect(self, image, scale_factor=1.1, min_neighbors=5, min_size=30):
+        image = _to_bgr(image)
+        model = self._instance()
+        model.setInputSize((image.shape[1], image.shape[0]))
+        _, faces = model.detect(image)
+        if faces is None:
+            return []
+        boxes = []
+        height, width = image.shape[:2]
+        for face in faces:
+            x, y, w, h = (int(round(v)) for v in face[:4])
+            x, y = max(0, x), max(0, y)
+            w, h = min(w, width - x), min(h, height - y)
+            if w >= min_size and h >= min_size:
+                boxes.append((x, y, w, h))
+        return boxes
+
+
+class DlibHOGDetector(FaceDetector):
+    """HOG de dlib (celui de face_recognition.face_locations, même suréchantillonnage)"""
+
+    name = "hog"
+
+    def __init__(self, upsample: int = 1):
+        super().__init__()
+        try:
+            import dlib  # noqa: F401
+        except ImportError:
+            raise RuntimeError("dlib n'est pas installé (pip install dlib)")
+        self.upsample = upsample
+        self._instance()
+
+    def _load(self):
+        import dlib
+        return dlib.get_frontal_face_detector()
+
+    def detect(self, image, scale_factor=1.1, min_neighbors=5, min_size=30):
+        rects = self._instance()(_to_gray(image), self.upsample)
+        height, width = image.shape[:2]
+        boxes = []
+        for rect in rects:
+            x, y = max(0, rect.left()), max(0, rect.top())
+            w, h = min(rect.right(), width) - x, min(rect.bottom(), height) - y
+            if w >= min_size and h >= min_size:
+                boxes.append((x, y, w, h))
+        return boxes
+
+
+DETECTORS: Dict[str, Callable[[], FaceDetector]] = {
+    'haar': HaarDetector,
+    'lbp': LBPDetector,
+    'yunet': YuNetDetector,
+    'hog': DlibHOGDetector,
+}
+
+
+def create_detector(name: str = "haar") -> FaceDetector:
+    """Crée un détecteur par son nom (haar, lbp, yunet, hog)"""
+    if name not in DETECTORS:
+        raise ValueError(f"Détecteur inconnu: {name} ({', '.join(DETECTORS)})")
+    return DETECTORS[name]()
@@ -0,0 +1,226 @@
+# executor.py - Exécution de la reconnaissance hors de la boucle d'événements
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from face_system import Box, FaceAnalyzer, UltraSimpleFaceSystem
+from metrics import record_all, timed_call
+
+# Détection propre à chaque processus du pool (mode "process")
+_worker_system: Optional[FaceAnalyzer] = None
+
+
+def _init_worker():
+    """
+    Initialiseur des processus : détecteur et extracteur seulement
+    (ni base, ni galerie, ni suivi du journal : la comparaison reste dans le processus principal)
+    """
+    global _worker_system
+    _worker_system = FaceAnalyzer()
+
+
+def _compact(face_data: Optional[dict]) -> Optional[dict]:
+    """Retire l'image complète d'un résultat de détection (le visage découpé reste)"""
+    if face_data is not None:
+        face_data.pop('original_image', None)
+    return face_data
+
+
+def _worker_detect(data: bytes, preset: Optional[str] = None,
+                   roi: Optional[Box] = None, with_images: bool = False):
+    """Détection + extraction dans un worker : (visage, durées par étape)"""
+    return timed_call(lambda: _compact(_worker_system.detect_face(data, preset, roi, with_images)))
+
+
+def _worker_detect_all(data: bytes, max_faces: Optional[int] = None,
+                       preset: Optional[str] = None, roi: Optional[Box] = None,
+                       use_cache: bool = True):
+    """Détection de tous les visages dans un worker : (visages, durées par étape)"""
+    return timed_call(_worker_system.detect_faces, data, max_faces, preset, roi, False, use_cache)
+
+
+def _in_context(pool: Optional[Executor], func, *args):
+    """
+    run_in_executor dans une copie du contexte courant : les mesures faites
+    dans le thread s'ajoutent au détail de la requête (metrics.Trace)
+    """
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(pool, contextvars.copy_context().run, func, *args)
+
+
+async def _from_worker(future):
+    """Résultat d'un worker (processus) ; ses durées par étape sont rejouées ici"""
+    result, stages = await future
+    record_all(stages)
+    return result
+
+
+class ExecutorSaturated(Exception):
+    """Levée quand la file d'attente du pool est pleine"""
+
+
+class RecognitionExecutor:
+    """
+    Pool de calcul pour la reconnaissance
+    - "thread"  : OpenCV relâche le GIL, les appels tournent en parallèle
+    - "process" : détection dans des processus séparés (un FaceAnalyzer par worker),
+                  la comparaison à la galerie reste dans le processus principal,
+                  hors de la boucle d'événements
+    Au-delà de `workers + max_queue` requêtes en cours, ExecutorSaturated est levée.
+    """
+
+    def __init__(self, face_system: UltraSimpleFaceSystem, backend: str = "thread",
+                 workers: Optional[int] = None, max_queue: Optional[int] = None):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Backend inconnu: {backend}")
+        self.face_system = face_system
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, face_system: UltraSimpleFaceSystem) -> "RecognitionExecutor":
+        """Configuration par variables d'environnement"""
+        workers = os.environ.get("FACE_WORKERS")
+        max_queue = os.environ.get("FACE_MAX_QUEUE")
+        return cls(
+            face_system,
+            backend=os.environ.get("FACE_EXECUTOR", "thread"),
+            workers=int(workers) if workers else None,
+            max_queue=int(max_queue) if max_queue else None,
+        )
+
+    def start(self):
+        if self._pool is not None:
+            return
+        if self.backend == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="recognition")
+
+    def warm_up(self, data: bytes):
+        """
+        Une détection par worker (bloquant) : processus lancés, modèles
+        chargés et caches OpenCV remplis avant la première vraie requête
+        """
+        self.start()
+        func = self._detect_func()
+        futures = [self._pool.submit(func, data) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated("Serveur saturé, réessayez plus tard")
+            self.pending += 1
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def _submit(self, func, *args):
+        if self.backend == "process":
+            loop = asyncio.get_running_loop()
+            return _from_worker(loop.run_in_executor(self._pool, func, *args))
+        return _in_context(self._pool, func, *args)
+
+    async def _run(self, func, *args):
+        self.start()
+        self._acquire()
+        try:
+            return await self._submit(func, *args)
+        finally:
+            self._release()
+
+    def _detect_func(self):
+        if self.backend == "process":
+            return _worker_detect
+        return lambda *args: _compact(self.face_system.detect_face(*args))
+
+    async def detect(self, data: bytes, preset: Optional[str] = None,
+                     roi: Optional[Box] = None, with_images: bool = False) -> Optional[dict]:
+        return await self._run(self._detect_func(), data, preset, roi, with_images)
+
+    async def detect_many(self, images: List[bytes], preset: Optional[str] = None) -> List[Optional[dict]]:
+        """Détection en parallèle sur tout le pool (un lot compte comme une requête)"""
+        self.start()
+        self._acquire()
+        try:
+            func = self._detect_func()
+            return list(await asyncio.gather(
+                *[self._submit(func, data, preset, None, False) for data in images]
+            ))
+        finally:
+            self._release()
+
+    async def recognize(self, data: bytes, preset: Optional[str] = None,
+                        roi: Optional[Box] = None) -> Tuple[Optional[str], float]:
+        if self.backend == "process":
+            face_data = await self.detect(data, preset, roi)
+            return await _in_context(None, self.face_system.match_face, face_data)
+        return await self._run(self.face_system.recognize_person, data, preset, roi)
+
+    async def recognize_many(self, images: List[bytes],
+                             preset: Optional[str] = None) -> List[Tuple[Optional[str], float]]:
+        """Détection parallèle puis une seule comparaison matricielle à la galerie"""
+        faces = await self.detect_many(images, preset)
+        return await _in_context(None, self.face_system.match_faces, faces)
+
+    async def detect_all(self, data: bytes, max_faces: Optional[int] = None,
+                         preset: Optional[str] = None, roi: Optional[Box] = None,
+                         use_cache: bool = True) -> List[dict]:
+        """Tous les visages d'une image (descripteur + bbox par boîte)"""
+        if self.backend == "process":
+            return await self._run(_worker_detect_all, data, max_faces, preset, roi, use_cache)
+        return await self._run(self.face_system.detect_faces, data, max_faces, preset, roi,
+                               False, use_cache)
+
+    async def recognize_all(self, data: bytes, max_faces: Optional[int] = None,
+                            preset: Optional[str] = None, roi: Optional[Box] = None) -> List[dict]:
+        """Tous les visages d'une image : nom, confiance et bbox par boîte"""
+        if self.backend == "process":
+            faces = await self.detect_all(data, max_faces, preset, roi)
+            return await _in_context(None, self.face_system.match_all, faces)
+        return await self._run(self.face_system.recognize_faces, data, max_faces, preset, roi)
+
+    async def register(self, name: str, data: bytes, image_path: Optional[str] = None,
+                       preset: Optional[str] = "accurate") -> Tuple[bool, str]:
+        """Détection dans le pool (précise par défaut), puis inscription en base"""
+        face_data = await self.detect(data, preset, with_images=True)
+        return await _in_context(None, self.face_system.enroll_face, name, face_data, image_path)
+
+    async def add_template(self, name: str, data: bytes, image_path: Optional[str] = None,
+                           preset: Optional[str] = "accurate") -> Tuple[bool, str]:
+        """Détection dans le pool, puis ajout d'une empreinte à une personne existante"""
+        face_data = await self.detect(data, preset, with_images=True)
+        return await _in_context(None, self.face_system.add_template, name, face_data, image_path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'workers': self.workers,
+                'in_flight': min(self.pending, self.workers),
+                'queued': max(0, self.pending - self.workers),
+                'max_queue': self.max_queue,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
@@ -1,42 +1,151 @@
 # face_services.py - Logique de reconnaissance faciale
-import face_recognition
 import numpy as np
 import cv2
 import os
-from typing import List, Optional, Tuple
-import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from change_feed import GallerySync
+from detectors import FaceDetector, create_detector
+from feature_store import decode_features
+from gallery import FaceGallery
+from lazy import Lazy
+from templates import aggregate
+
+# Plusieurs empreintes par utilisateur : comparaison au centroïde d'abord,
+# puis aux médoïdes des meilleurs candidats si la distance est à moins de TEMPLATE_MARGIN du seuil
+TEMPLATE_MARGIN = 0.1
+TEMPLATE_CANDIDATES = 3
+TEMPLATE_MEDOIDS = 3
+
+# Distance euclidienne maximale pour reconnaître quelqu'un (valeur usuelle de face_recognition)
+DEFAULT_THRESHOLD = 0.6
+
+def distance_confidence(distance: float) -> float:
+    """Confiance (0-100%) déduite d'une distance euclidienne"""
+    return max(0.0, 100 - float(distance) * 100)
+
+def _face_recognition():
+    """Import différé : face_recognition charge les modèles dlib dès son import"""
+    import face_recognition
+    return face_recognition
 
 class FaceRecognitionService:
-    def __init__(self):
-        self.known_faces = []
-        self.known_names = []
-        self.load_known_faces()
+    def __init__(self, detector: Optional[str] = None):
+        # Détecteur : FACE_SERVICE_DETECTOR=hog (défaut, comme face_locations), haar, lbp ou yunet
+        self.detector: FaceDetector = create_detector(
+            detector or os.environ.get("FACE_SERVICE_DETECTOR", "hog")
+        )
+        # Centroïdes (un par utilisateur) : matrice float32 préallouée, normes au carré en cache
+        self.gallery = FaceGallery(metric="l2")
+        self.known_templates = {}
+        # Protège les empreintes pendant l'application d'un delta
+        self._lock = threading.RLock()
+        version = self.load_known_faces()
+        
+        # Inscriptions faites par les autres processus : deltas relus dans le journal
+        from database import CHANGES_TABLE, DATABASE_PATH
+        from connection_manager import get_manager
+        self.sync = GallerySync(
+            get_manager(DATABASE_PATH), apply=self._apply_changes,
+            reload=self.load_known_faces, version=version, table=CHANGES_TABLE,
+            interval=int(os.environ.get("FACE_GALLERY_POLL_MS", "1000")) / 1000
+        )
+        self.sync.start()
+    
+    @property
+    def known_names(self) -> List[str]:
+        return self.gallery.names
+    
+    @property
+    def known_faces(self) -> np.ndarray:
+        return self.gallery.matrix
     
-    def load_known_faces(self):
-        """Charge les visages connus depuis la base"""
-        from database import get_all_encodings
+    @staticmethod
+    def _thresholds(encodings: List[dict]) -> Dict[str, float]:
+        """Seuils propres enregistrés en base (colonne users.threshold)"""
+        return {enc['username']: enc['threshold'] for enc in encodings
+                if enc.get('threshold') is not None}
+    
+    @staticmethod
+    def _group(encodings: List[dict]) -> Dict[str, list]:
+        grouped = {}
+        for enc in encodings:
+            grouped.setdefault(enc['username'], []).append(
+                decode_features(enc['encoding'], enc['encoding_dtype'])
+            )
+        return grouped
+    
+    def load_known_faces(self) -> int:
+        """
+        Charge les visages connus depuis la base
+        Retourne la version du journal lue avant le chargement
+        """
+        from database import get_all_encodings, get_encodings_version
         
+        version = get_encodings_version()
         encodings = get_all_encodings()
-        self.known_faces = []
-        self.known_names = []
         
-        for enc in encodings:
-            self.known_faces.append(json.loads(enc['encoding']))
-            self.known_names.append(enc['username'])
+        # Une entrée par utilisateur (centroïde), médoïdes gardés pour l'expansion
+        centers = []
+        templates = {}
+        for username, vectors in self._group(encodings).items():
+            center, medoids = aggregate(np.stack(vectors), TEMPLATE_MEDOIDS, metric="l2")
+            centers.append((username, center))
+            if len(vectors) > 1:
+                templates[username] = np.stack(vectors)[medoids]
+        with self._lock:
+            self.gallery.load(centers)
+            self.gallery.thresholds = self._thresholds(encodings)
+            self.known_templates = templates
         
-        print(f"📊 {len(self.known_faces)} visages chargés en mémoire")
+        print(f"📊 {len(encodings)} visages chargés en mémoire ({len(self.gallery)} utilisateurs)")
+        return version
+    
+    def _set_user(self, username: str, vectors: list):
+        """Ajoute ou remplace l'entrée d'un utilisateur"""
+        center, medoids = aggregate(np.stack(vectors), TEMPLATE_MEDOIDS, metric="l2")
+        self.gallery.add(username, center)
+        if len(vectors) > 1:
+            self.known_templates[username] = np.stack(vectors)[medoids]
+        else:
+            self.known_templates.pop(username, None)
+    
+    def _remove_user(self, username: str):
+        """Retire un utilisateur"""
+        self.gallery.remove(username)
+        self.known_templates.pop(username, None)
+    
+    def _apply_changes(self, operations: Dict[str, str]):
+        """Applique les modifications du journal : seuls les utilisateurs concernés sont relus"""
+        from database import get_user_encodings
+        
+        encodings = get_user_encodings(list(operations))
+        grouped = self._group(encodings)
+        thresholds = self._thresholds(encodings)
+        with self._lock:
+            for username in operations:
+                if username in grouped:
+                    self._set_user(username, grouped[username])
+                else:
+                    self._remove_user(username)
+                self.gallery.set_threshold(username, thresholds.get(username))
     
     def extract_encoding(self, image_path: str) -> Optional[List[float]]:
         """
         Extrait l'empreinte faciale d'une image
         Retourne une liste de 128 nombres ou None
         """
+        face_recognition = _face_recognition()
         try:
             # Charger l'image
             image = face_recognition.load_image_file(image_path)
             
-            # Détecter les visages
-            face_locations = face_recognition.face_locations(image)
+            # Détecter les visages (image RGB -> BGR pour les détecteurs OpenCV)
+            boxes = self.detector.detect(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+            boxes = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+            # Format face_recognition : (haut, droite, bas, gauche)
+            face_locations = [(y, x + w, y + h, x) for x, y, w, h in boxes]
             
             if not face_locations:
                 print("⚠️ Aucun visage détecté")
@@ -55,7 +164,30 @@ class FaceRecognitionService:
             print(f"❌ Erreur lors de l'extraction: {e}")
             return None
     
-    def recognize_face(self, image_path: str, threshold: float = 0.6) -> Tuple[Optional[str], float]:
+    def set_threshold(self, username: str, threshold: Optional[float]) -> bool:
+        """
+        Distance maximale propre à un utilisateur (None : seuil commun)
+        Enregistrée en base et propagée aux autres processus par le journal
+        """
+        from database import set_user_threshold
+        
+        if not set_user_threshold(username, threshold):
+            return False
+        self.gallery.set_threshold(username, threshold)
+        return True
+    
+    def search(self, encodings, k: int = 1,
+               threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[List[str]], np.ndarray, np.ndarray]:
+        """
+        Compare plusieurs empreintes (une par ligne) aux centroïdes en un seul produit matriciel
+        Retourne (noms, distances, acceptés) de forme (empreintes, k), distances croissantes ;
+        accepté = sous le seuil de l'utilisateur (set_threshold), `threshold` sinon
+        """
+        names, distances = self.gallery.search_topk(encodings, k)
+        return names, distances, self.gallery.accepts(names, distances, threshold)
+    
+    def recognize_face(self, image_path: str,
+                       threshold: float = DEFAULT_THRESHOLD) -> Tuple[Optional[str], float]:
         """
         Reconnaît un visage dans une image
         Retourne (nom, confiance) ou (None, 0.0)
@@ -65,31 +197,36 @@ class FaceRecognitionService:
         if encoding is None:
             return None, 0.0
         
+        query = np.asarray(encoding, dtype=np.float32)
+        names, distances, _ = self.search(query, k=TEMPLATE_CANDIDATES, threshold=threshold)
+        
         # Si pas de visages connus
-        if not self.known_faces:
+        if not names[0]:
             return None, 0.0
         
-        # Convertir en numpy array
-        encoding_array = np.array(encoding)
-        known_arrays = [np.array(face) for face in self.known_faces]
-        
-        # Calculer les distances
-        distances = face_recognition.face_distance(known_arrays, encoding_array)
+        best_name, best_distance = names[0][0], float(distances[0, 0])
         
-        # Trouver la meilleure correspondance
-        best_match_index = np.argmin(distances)
-        best_distance = distances[best_match_index]
-        
-        # Calculer la confiance (0-100%)
-        confidence = max(0, 100 - (best_distance * 100))
+        # Près du seuil : comparer aux empreintes individuelles des meilleurs candidats
+        with self._lock:
+            known_templates = {name: self.known_templates.get(name) for name in names[0]}
+        if abs(best_distance - self.gallery.threshold(best_name, threshold)) <= TEMPLATE_MARGIN:
+            for name in names[0]:
+                templates = known_templates[name]
+                if templates is None:
+                    continue
+                distance = float(np.min(np.linalg.norm(templates - query, axis=1)))
+                if distance < best_distance:
+                    best_name, best_distance = name, distance
         
         # Vérifier le seuil
-        if best_distance < threshold:
-            return self.known_names[best_match_index], confidence
+        confidence = distance_confidence(best_distance)
+        if best_distance < self.gallery.threshold(best_name, threshold):
+            return best_name, confidence
         else:
             return None, confidence
     
-    def verify_face(self, image_path1: str, image_path2: str, threshold: float = 0.6) -> Tuple[bool, float]:
+    def verify_face(self, image_path1: str, image_path2: str,
+                    threshold: float = DEFAULT_THRESHOLD) -> Tuple[bool, float]:
         """Vérifie si deux images sont la même personne"""
         encoding1 = self.extract_encoding(image_path1)
         encoding2 = self.extract_encoding(image_path2)
@@ -98,18 +235,27 @@ class FaceRecognitionService:
             return False, 0.0
         
         # Calculer la distance
-        distance = face_recognition.face_distance(
+        distance = _face_recognition().face_distance(
             [np.array(encoding1)], 
             np.array(encoding2)
         )[0]
         
         # Calculer la confiance
-        confidence = max(0, 100 - (distance * 100))
+        confidence = distance_confidence(distance)
         
         return distance < threshold, confidence
 
-# Instance globale
-face_service = FaceRecognitionService()
+# Instance globale, créée au premier accès (modèles dlib et empreintes chargés à ce moment)
+_face_service = Lazy(FaceRecognitionService, "face_service")
+
+def get_face_service() -> FaceRecognitionService:
+    return _face_service.get()
+
+def __getattr__(name: str):
+    # Compatibilité : `from face_service import face_service` crée l'instance à la demande
+    if name == "face_service":
+        return get_face_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Fonctions utilitaires rapides
 def quick_test():
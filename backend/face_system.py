@@ -2,171 +2,585 @@
 import cv2
 import numpy as np
 import os
-import sqlite3
-import json
-from typing import List, Optional, Tuple
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from pathlib import Path
 
-class UltraSimpleFaceSystem:
+from ann_index import create_gallery
+from change_feed import GallerySync, init_change_log, latest_version, record_change
+from connection_manager import get_manager
+from descriptor import DescriptorExtractor
+from descriptor_cache import DescriptorCache
+from detectors import create_detector
+from feature_store import (FEATURE_DTYPE, STORAGE_DTYPES, decode_features, encode_features,
+                           migrate_to_blob)
+from gallery import QuantizedGallery
+from log_writer import LogWriter
+from metrics import FACES_DETECTED, RECOGNITIONS, stage
+from shared_gallery import MappedGallery
+from templates import aggregate
+
+# Préréglages de détection : taille max du côté analysé + paramètres du détecteur
+# (scale_factor / min_neighbors ne servent qu'aux cascades Haar et LBP)
+# (la boîte trouvée est ramenée en pleine résolution pour l'extraction)
+DETECTION_PRESETS = {
+    'fast': {'max_side': 640, 'scale_factor': 1.2, 'min_neighbors': 4, 'min_size': 24},
+    'balanced': {'max_side': 1024, 'scale_factor': 1.1, 'min_neighbors': 5, 'min_size': 30},
+    'accurate': {'max_side': None, 'scale_factor': 1.1, 'min_neighbors': 5, 'min_size': 30},
+}
+
+# Marge ajoutée autour d'une zone d'intérêt (fraction de sa taille)
+ROI_MARGIN = 0.5
+
+# Confiance minimale (en %) pour reconnaître une personne
+RECOGNITION_THRESHOLD = 65.0
+
+# Personnes à plusieurs empreintes : la galerie contient leur centroïde ;
+# à moins de TEMPLATE_MARGIN points du seuil, les médoïdes des
+# TEMPLATE_CANDIDATES meilleures personnes sont aussi comparés
+TEMPLATE_MARGIN = 10.0
+TEMPLATE_CANDIDATES = 3
+
+Box = Tuple[int, int, int, int]
+
+# Une image : chemin de fichier, octets encodés (JPEG/PNG...) ou tableau BGR décodé
+ImageSource = Union[str, bytes, bytearray, memoryview, np.ndarray]
+
+
+def load_image(image: ImageSource) -> Optional[np.ndarray]:
+    """Charge une image BGR depuis un chemin, un buffer mémoire ou un ndarray"""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(image, dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    return cv2.imread(str(image))
+
+
+def inside(path: str, root) -> bool:
+    """`path` est-il dans `root` une fois les liens symboliques et les `..` résolus"""
+    root = os.path.realpath(root)
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+class FaceAnalyzer:
+    """
+    Détection + extraction des descripteurs, sans base ni galerie
+    (ce qu'il faut aux processus de calcul : pools de l'API et de l'import)
+    """
+    
+    def __init__(self):
+        # Détecteur de visages : FACE_DETECTOR=haar (défaut), lbp, yunet ou hog
+        self.detector = create_detector(os.environ.get("FACE_DETECTOR", "haar"))
+        
+        # Extracteur de descripteurs (tampons réutilisés d'un appel à l'autre)
+        self.extractor = DescriptorExtractor()
+        
+        # Cache des détections par contenu des octets reçus (FACE_CACHE_SIZE=0 le désactive)
+        # FACE_CACHE_PATH active un niveau disque qui survit aux redémarrages
+        cache_size = int(os.environ.get("FACE_CACHE_SIZE", "1024"))
+        self.cache = DescriptorCache(
+            max_entries=cache_size,
+            ttl_seconds=float(os.environ.get("FACE_CACHE_TTL", "3600")),
+            disk_path=os.environ.get("FACE_CACHE_PATH") or None
+        ) if cache_size > 0 else None
+        
+        # Préréglage par défaut (fast / balanced / accurate)
+        self.detection_preset = os.environ.get("FACE_DETECTION_PRESET", "balanced")
+        if self.detection_preset not in DETECTION_PRESETS:
+            raise ValueError(f"Préréglage de détection inconnu: {self.detection_preset}")
+    
+    def detect_face(self, image: ImageSource, preset: Optional[str] = None,
+                    roi: Optional[Box] = None, with_images: bool = False,
+                    use_cache: bool = True) -> Optional[dict]:
+        """
+        Détecte un visage et retourne ses caractéristiques basiques
+        `image` peut être un chemin, des octets encodés ou un ndarray BGR
+        `with_images` ajoute le visage découpé ('face_image') et l'image complète ('original_image')
+        """
+        # Prendre le plus grand visage
+        img, faces = self._detect(image, 1, preset, roi, with_images, use_cache)
+        if not faces:
+            return None
+        
+        face_data = faces[0]
+        if with_images:
+            face_data['original_image'] = img
+        return face_data
+    
+    def detect_faces(self, image: ImageSource, max_faces: Optional[int] = None,
+                     preset: Optional[str] = None, roi: Optional[Box] = None,
+                     with_images: bool = False, use_cache: bool = True) -> List[dict]:
+        """
+        Détecte tous les visages d'une image (du plus grand au plus petit)
+        et retourne pour chacun {'features': float32, 'bbox'} (+ 'face_image' si demandé)
+        `roi` (x, y, w, h) restreint la recherche ; sans résultat, toute l'image est analysée
+        """
+        return self._detect(image, max_faces, preset, roi, with_images, use_cache)[1]
+    
+    def _detect(self, image: ImageSource, max_faces: Optional[int], preset: Optional[str],
+                roi: Optional[Box], with_images: bool,
+                use_cache: bool) -> Tuple[Optional[np.ndarray], List[dict]]:
+        """
+        (image décodée, visages) ; des octets déjà vus sont servis par le cache
+        (l'image n'est alors décodée que si `with_images` est demandé)
+        """
+        key = None
+        if self.cache is not None and use_cache and isinstance(image, (bytes, bytearray, memoryview)):
+            key = self.cache.make_key(
+                image, self.detector.name, self.extractor.size, self.extractor.bins,
+                preset or self.detection_preset, roi, max_faces
+            )
+            with stage("cache_lookup"):
+                faces = self.cache.get(key)
+            if faces is not None:
+                FACES_DETECTED.inc(len(faces))
+                img = load_image(image) if with_images else None
+                if img is not None:
+                    self._attach_crops(img, faces)
+                return img, faces
+        
+        try:
+            with stage("decode"):
+                img = load_image(image)
+            if img is None:
+                return None, []
+            
+            # Détecter les visages (zone d'intérêt d'abord si fournie)
+            with stage("detect"):
+                boxes = []
+                if roi is not None:
+                    boxes = self.detect_boxes(img, preset, roi)
+                if not boxes:
+                    boxes = self.detect_boxes(img, preset)
+            
+            boxes = sorted(boxes, key=lambda x: x[2]*x[3], reverse=True)
+            if max_faces is not None:
+                boxes = boxes[:max_faces]
+            
+            with stage("extract"):
+                features = self.extractor.extract_batch(img, boxes)
+            faces = [
+                {'features': row, 'bbox': tuple(int(v) for v in bbox)}
+                for bbox, row in zip(boxes, features)
+            ]
+        except Exception as e:
+            print(f"Erreur détection: {e}")
+            return None, []
+        
+        FACES_DETECTED.inc(len(faces))
+        if key is not None:
+            self.cache.put(key, faces)
+        if with_images:
+            self._attach_crops(img, faces)
+        return img, faces
+    
+    @staticmethod
+    def _attach_crops(img: np.ndarray, faces: List[dict]):
+        """Ajoute 'face_image' à chaque visage"""
+        for face_data in faces:
+            x, y, w, h = face_data['bbox']
+            # Copie : le visage ne garde pas l'image complète en mémoire
+            face_data['face_image'] = img[y:y+h, x:x+w].copy()
+    
+    def detect_boxes(self, image: np.ndarray, preset: Optional[str] = None,
+                     roi: Optional[Box] = None) -> List[Box]:
+        """
+        Boîtes de visages en coordonnées pleine résolution
+        `image` BGR ou niveaux de gris (la conversion est faite par le détecteur)
+        L'image (ou la zone d'intérêt) est réduite à `max_side` avant la détection.
+        """
+        params = DETECTION_PRESETS[preset or self.detection_preset]
+        height, width = image.shape[:2]
+        
+        # Zone d'intérêt élargie d'une marge, bornée à l'image
+        offset_x, offset_y = 0, 0
+        region = image
+        if roi is not None:
+            x, y, w, h = roi
+            mx, my = int(w * ROI_MARGIN), int(h * ROI_MARGIN)
+            x0, y0 = max(0, int(x) - mx), max(0, int(y) - my)
+            x1, y1 = min(width, int(x + w) + mx), min(height, int(y + h) + my)
+            if x1 <= x0 or y1 <= y0:
+                return []
+            region = image[y0:y1, x0:x1]
+            offset_x, offset_y = x0, y0
+        
+        # Réduction de résolution
+        scale = 1.0
+        region_h, region_w = region.shape[:2]
+        max_side = params['max_side']
+        if max_side and max(region_h, region_w) > max_side:
+            scale = max_side / max(region_h, region_w)
+            region = cv2.resize(
+                region,
+                (max(1, round(region_w * scale)), max(1, round(region_h * scale))),
+                interpolation=cv2.INTER_AREA
+            )
+        
+        faces = self.detector.detect(
+            region,
+            scale_factor=params['scale_factor'],
+            min_neighbors=params['min_neighbors'],
+            min_size=params['min_size']
+        )
+        
+        # Retour en coordonnées pleine résolution
+        boxes = []
+        for x, y, w, h in faces:
+            bx, by = int(round(x / scale)) + offset_x, int(round(y / scale)) + offset_y
+            bw, bh = int(round(w / scale)), int(round(h / scale))
+            boxes.append((bx, by, min(bw, width - bx), min(bh, height - by)))
+        return boxes
+    
+    def close(self):
+        """Ferme le cache des détections (niveau disque)"""
+        if self.cache is not None:
+            self.cache.close()
+
+
+class UltraSimpleFaceSystem(FaceAnalyzer):
     """
     Système de reconnaissance faciale ultra simple
     Utilise uniquement OpenCV et techniques basiques
     """
     
     def __init__(self):
-        # Obtenir le répertoire du script
-        self.base_dir = Path(__file__).parent.absolute()
+        # Répertoire des données (base, visages, galerie) : FACE_DATA_DIR ou celui du script
+        self.base_dir = Path(os.environ.get("FACE_DATA_DIR") or Path(__file__).parent).absolute()
+        self.base_dir.mkdir(parents=True, exist_ok=True)
         
-        # Détecteur de visages OpenCV (pré-inclus)
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
+        # Détection et extraction (détecteur, descripteurs, cache)
+        super().__init__()
         
         # Base de données SQLite (chemin absolu)
         self.db_path = str(self.base_dir / "face_system.db")
+        self.db = get_manager(self.db_path)
         
         # Dossier pour les visages enregistrés
         self.registered_faces_dir = self.base_dir / "registered_faces"
         self.registered_faces_dir.mkdir(exist_ok=True)
+        # Originaux des inscriptions par l'API (même dossier que api_final.UPLOADS_DIR)
+        self.uploads_dir = self.base_dir / "uploads"
+        
+        # Empreintes par personne : médoïdes gardés en mémoire et plafond par personne
+        self.template_medoids = int(os.environ.get("FACE_TEMPLATE_MEDOIDS", "3"))
+        self.max_templates = int(os.environ.get("FACE_MAX_TEMPLATES", "20"))
+        # Stockage des empreintes individuelles : FACE_TEMPLATE_DTYPE=f4 (défaut), f2 ou q8
+        # (les centroïdes de `persons` restent en float32 : référence du re-classement exact)
+        self.template_dtype = STORAGE_DTYPES[os.environ.get("FACE_TEMPLATE_DTYPE", "f4")]
+        self.templates: Dict[str, np.ndarray] = {}
+        # Galerie partagée attachée : médoïdes lus à la demande (première expansion de chaque nom)
+        self._templates_lazy = False
+        self._templates_checked: set = set()
+        self.template_expansions = 0
         
         self._init_db()
         
-        print("✅ Système de reconnaissance initialisé (version ultra simple)")
-    
-    def _init_db(self):
-        """Initialise la base de données"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Table pour les personnes
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS persons (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            features TEXT NOT NULL,
-            image_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
+        # Logs écrits en arrière-plan par lots
+        self.log_writer = LogWriter(self.db)
+        self.log_writer.start()
         
-        # Table pour les logs
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            action TEXT,
-            person_name TEXT,
-            confidence REAL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        # Galerie résidente en mémoire (chargée une seule fois)
+        # FACE_INDEX=exact (force brute), ivf (approximatif, sauvegardé à côté de la base)
+        # ou mmap (fichier partagé entre processus, attaché sans chargement)
+        # ou int8 / float16 (quantifiée, meilleurs candidats re-classés depuis la base,
+        # FACE_QUANT_CACHE descripteurs exacts gardés en mémoire pour éviter la requête)
+        self.gallery = create_gallery(
+            os.environ.get("FACE_INDEX", "exact"),
+            index_path=str(self.base_dir / "face_system.ivf.npz"),
+            mapped_path=str(self.base_dir / "face_system.gallery"),
+            exact=self._exact_features
         )
-        """)
+        version = self._load_gallery(use_snapshot=True)
         
-        conn.commit()
-        conn.close()
-    
-    def _log_action(self, action: str, person_name: str = None, confidence: float = 0):
-        """Journalise une action"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO logs (action, person_name, confidence) VALUES (?, ?, ?)",
-            (action, person_name, confidence)
+        # Modifications faites par d'autres processus (workers uvicorn, imports...)
+        # relues dans le journal toutes les FACE_GALLERY_POLL_MS millisecondes (0 = jamais)
+        self.sync = GallerySync(
+            self.db, apply=self._apply_changes, reload=self._load_gallery, version=version,
+            interval=int(os.environ.get("FACE_GALLERY_POLL_MS", "1000")) / 1000,
+            after_poll=self.gallery.refresh if isinstance(self.gallery, MappedGallery) else None
         )
-        conn.commit()
-        conn.close()
+        self.sync.start()
+        
+        print("✅ Système de reconnaissance initialisé (version ultra simple)")
     
-    def detect_face(self, image_path: str) -> Optional[dict]:
-        """
-        Détecte un visage et retourne ses caractéristiques basiques
-        """
-        try:
-            # Charger l'image
-            img = cv2.imread(image_path)
-            if img is None:
-                return None
-            
-            # Convertir en niveaux de gris
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def _init_db(self):
+        """Initialise la base de données"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
             
-            # Détecter les visages
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
+            # Table pour les personnes
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS persons (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                features BLOB NOT NULL,
+                features_dtype TEXT NOT NULL DEFAULT 'json',
+                image_path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
+            """)
             
-            if len(faces) == 0:
-                return None
-            
-            # Prendre le plus grand visage
-            faces = sorted(faces, key=lambda x: x[2]*x[3], reverse=True)
-            x, y, w, h = faces[0]
-            
-            # Extraire la région du visage
-            face_region = img[y:y+h, x:x+w]
+            # Table pour les logs
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                action TEXT,
+                person_name TEXT,
+                confidence REAL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
             
-            # Redimensionner à taille fixe
-            face_resized = cv2.resize(face_region, (100, 100))
+            # Migration des anciens descripteurs JSON vers le format binaire
+            converted = migrate_to_blob(conn, "persons", "features", "features_dtype")
+            if converted:
+                print(f"🔄 {converted} descripteurs convertis en BLOB float32")
             
-            # Convertir en vecteur de caractéristiques simples
-            # 1. Histogramme de couleur
-            hist_b = cv2.calcHist([face_resized], [0], None, [16], [0, 256])
-            hist_g = cv2.calcHist([face_resized], [1], None, [16], [0, 256])
-            hist_r = cv2.calcHist([face_resized], [2], None, [16], [0, 256])
+            # Seuil de confiance propre à une personne (en %, NULL : RECOGNITION_THRESHOLD)
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(persons)")}
+            if 'threshold' not in columns:
+                cursor.execute("ALTER TABLE persons ADD COLUMN threshold REAL")
+            # Seuils relus au démarrage sans parcourir la table (index partiel couvrant)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_persons_threshold ON persons(name, threshold) "
+                "WHERE threshold IS NOT NULL"
+            )
             
-            # 2. Texture (gradients)
-            gray_face = cv2.cvtColor(face_resized, cv2.COLOR_BGR2GRAY)
-            sobelx = cv2.Sobel(gray_face, cv2.CV_64F, 1, 0, ksize=3)
-            sobely = cv2.Sobel(gray_face, cv2.CV_64F, 0, 1, ksize=3)
+            # Empreintes individuelles (persons.features contient leur centroïde)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                person_id INTEGER NOT NULL REFERENCES persons(id),
+                features BLOB NOT NULL,
+                features_dtype TEXT NOT NULL DEFAULT '<f4',
+                is_medoid INTEGER NOT NULL DEFAULT 0,
+                image_path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_templates_person ON templates(person_id)")
+            # Personnes à plusieurs médoïdes sans lire les empreintes (index couvrant)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_templates_medoid ON templates(is_medoid, person_id)"
+            )
             
-            # 3. Combiner les caractéristiques
-            features = []
-            features.extend(hist_b.flatten().tolist())
-            features.extend(hist_g.flatten().tolist())
-            features.extend(hist_r.flatten().tolist())
-            features.extend([np.mean(sobelx), np.std(sobelx)])
-            features.extend([np.mean(sobely), np.std(sobely)])
+            # Journal des modifications de la galerie (synchronisation entre processus)
+            init_change_log(conn)
             
-            # Normaliser
-            features = np.array(features)
-            if np.linalg.norm(features) > 0:
-                features = features / np.linalg.norm(features)
+            self._init_counters(conn)
             
-            return {
-                'features': features.tolist(),
-                'bbox': (int(x), int(y), int(w), int(h)),
-                'face_image': face_region,
-                'original_image': img
-            }
+            # Personnes enregistrées avant : leur descripteur devient leur première empreinte
+            cursor.execute("""
+            INSERT INTO templates (person_id, features, features_dtype, is_medoid, image_path)
+            SELECT id, features, features_dtype, 1, image_path FROM persons
+            WHERE id NOT IN (SELECT person_id FROM templates)
+            """)
+    
+    def _init_counters(self, conn):
+        """
+        Compteurs tenus à jour par triggers (dans la transaction de chaque écriture) :
+        nombre de personnes, logs par action et reconnaissances par personne
+        list_persons et get_stats ne parcourent plus la table logs
+        """
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_person_action ON logs(person_name, action)")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(persons)")}
+        if 'recognition_count' not in columns:
+            conn.execute("ALTER TABLE persons ADD COLUMN recognition_count INTEGER NOT NULL DEFAULT 0")
+            conn.execute("""
+            UPDATE persons SET recognition_count = (
+                SELECT COUNT(*) FROM logs l
+                WHERE l.person_name = persons.name AND l.action = 'RECOGNIZE'
+            )
+            """)
+        
+        # Première mise en place : compteurs initialisés à partir des tables existantes
+        if conn.execute("SELECT 1 FROM counters WHERE name = 'persons'").fetchone() is None:
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) SELECT 'persons', COUNT(*) FROM persons")
+            conn.execute("""
+            INSERT OR IGNORE INTO counters (name, value)
+            SELECT 'logs:' || COALESCE(action, ''), COUNT(*) FROM logs GROUP BY action
+            """)
+        
+        triggers = {
+            'trg_persons_insert': """AFTER INSERT ON persons BEGIN
+                UPDATE counters SET value = value + 1 WHERE name = 'persons';
+            END""",
+            'trg_persons_delete': """AFTER DELETE ON persons BEGIN
+                UPDATE counters SET value = value - 1 WHERE name = 'persons';
+            END""",
+            'trg_logs_insert': """AFTER INSERT ON logs BEGIN
+                INSERT INTO counters (name, value) VALUES ('logs:' || COALESCE(NEW.action, ''), 1)
+                ON CONFLICT(name) DO UPDATE SET value = value + 1;
+                UPDATE persons SET recognition_count = recognition_count + 1
+                WHERE NEW.action = 'RECOGNIZE' AND name = NEW.person_name;
+            END""",
+            'trg_logs_delete': """AFTER DELETE ON logs BEGIN
+                UPDATE counters SET value = value - 1 WHERE name = 'logs:' || COALESCE(OLD.action, '');
+                UPDATE persons SET recognition_count = recognition_count - 1
+                WHERE OLD.action = 'RECOGNIZE' AND name = OLD.person_name;
+            END""",
+        }
+        for name, body in triggers.items():
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    
+    def _load_gallery(self, use_snapshot: bool = False) -> int:
+        """
+        Charge tous les descripteurs enregistrés dans la galerie
+        Retourne la version du journal lue avant le chargement
+        Galerie partagée (`use_snapshot`) : l'instantané sur disque est attaché tel quel
+        et sa version retournée (GallerySync rejoue seulement les modifications suivantes)
+        """
+        mapped = isinstance(self.gallery, MappedGallery)
+        with self.db.connection() as conn:
+            version = latest_version(conn)
+            attached = self.gallery.attach() if mapped and use_snapshot else None
+            if attached is not None and attached > version:
+                print("⚠️ Instantané de galerie plus récent que la base : reconstruction")
+                attached = None
+            # Instantané attaché : ni descripteurs ni médoïdes lus au démarrage
+            medoids = {} if attached is not None else self._fetch_medoids(conn)
+            thresholds = conn.execute(
+                "SELECT name, threshold FROM persons WHERE threshold IS NOT NULL"
+            ).fetchall()
+            rows = [] if attached is not None else conn.execute(
+                "SELECT name, features, features_dtype FROM persons"
+            ).fetchall()
+        
+        self.templates = {}
+        self._templates_lazy = attached is not None
+        self._templates_checked = set()
+        for name, vectors in medoids.items():
+            self._set_templates(name, vectors)
+        self.gallery.thresholds = {name: threshold / 100 for name, threshold in thresholds}
+        
+        if attached is not None:
+            print(f"📎 Galerie partagée attachée: {len(self.gallery)} personnes (version {attached})")
+            return attached
+        
+        entries = []
+        for name, features, dtype in rows:
+            try:
+                entries.append((name, decode_features(features, dtype)))
+            except (TypeError, ValueError):
+                print(f"⚠️ Descripteur illisible pour '{name}'")
+        
+        count = self.gallery.load(entries, version=version) if mapped else self.gallery.load(entries)
+        print(f"📊 {count} personnes chargées dans la galerie")
+        return version
+    
+    def _fetch_medoids(self, conn, names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Médoïdes par personne (toutes, ou seulement `names`)
+        Seules les personnes à plusieurs médoïdes sont lues : avec une seule empreinte,
+        le centroïde de la galerie suffit (voir _set_templates)
+        """
+        query = """
+            SELECT p.name, t.features, t.features_dtype
+            FROM templates t JOIN persons p ON p.id = t.person_id
+            WHERE t.is_medoid = 1 AND t.person_id IN (
+                SELECT person_id FROM templates WHERE is_medoid = 1
+                GROUP BY person_id HAVING COUNT(*) > 1
+            )
+        """
+        params: tuple = ()
+        if names is not None:
+            query += f" AND p.name IN ({','.join('?' * len(names))})"
+            params = tuple(names)
+        rows = conn.execute(query + " ORDER BY t.person_id, t.id", params).fetchall()
+        
+        grouped: Dict[str, list] = {}
+        for name, features, dtype in rows:
+            grouped.setdefault(name, []).append(decode_features(features, dtype))
+        return {name: np.stack(vectors) for name, vectors in grouped.items()}
+    
+    def _exact_features(self, names: List[str]) -> Dict[str, np.ndarray]:
+        """Centroïdes float32 de `names` lus dans la base (re-classement de la galerie quantifiée)"""
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                f"SELECT name, features, features_dtype FROM persons "
+                f"WHERE name IN ({','.join('?' * len(names))})",
+                names
+            ).fetchall()
+        return {name: decode_features(features, dtype) for name, features, dtype in rows}
+    
+    def _apply_changes(self, operations: Dict[str, str]):
+        """Applique à la galerie les modifications lues dans le journal (GallerySync)"""
+        names = list(operations)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            with self.db.connection() as conn:
+                rows = conn.execute(
+                    f"SELECT name, features, features_dtype, threshold FROM persons "
+                    f"WHERE name IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                medoids = self._fetch_medoids(conn, chunk)
             
-        except Exception as e:
-            print(f"Erreur détection: {e}")
-            return None
+            # État courant de la base : absente = supprimée, présente = à jour
+            present = {name: (decode_features(features, dtype), threshold)
+                       for name, features, dtype, threshold in rows}
+            for name in chunk:
+                if name in present:
+                    features, threshold = present[name]
+                    self.gallery.add(name, features)
+                    self.gallery.set_threshold(name, None if threshold is None else threshold / 100)
+                    self._set_templates(name, medoids.get(name, np.empty((0, 0))))
+                else:
+                    self.gallery.remove(name)
+                    self.gallery.set_threshold(name, None)
+                    self.templates.pop(name, None)
     
-    def register_person(self, name: str, image_path: str) -> Tuple[bool, str]:
-        """Enregistre une nouvelle personne"""
-        face_data = self.detect_face(image_path)
+    def _log_action(self, action: str, person_name: str = None, confidence: float = 0):
+        """Journalise une action (asynchrone, sans attendre le disque)"""
+        self.log_writer.submit(action, person_name, confidence)
+    
+    def register_person(self, name: str, image: ImageSource,
+                        image_path: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Enregistre une nouvelle personne
+        `image_path` est le chemin mémorisé de l'original (par défaut `image` si c'est un chemin)
+        """
+        if image_path is None and isinstance(image, str):
+            image_path = image
         
+        return self.enroll_face(name, self.detect_face(image, with_images=True), image_path)
+    
+    def enroll_face(self, name: str, face_data: Optional[dict],
+                    image_path: Optional[str] = None) -> Tuple[bool, str]:
+        """Enregistre une personne à partir d'un résultat de detect_face(with_images=True)"""
         if face_data is None:
             return False, "Aucun visage détecté dans l'image"
         
-        # Vérifier si la personne existe déjà
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM persons WHERE name = ?", (name,))
-        if cursor.fetchone():
-            conn.close()
-            return False, f"La personne '{name}' existe déjà"
-        
-        # Enregistrer
-        cursor.execute(
-            "INSERT INTO persons (name, features, image_path) VALUES (?, ?, ?)",
-            (name, json.dumps(face_data['features']), image_path)
-        )
+        with self.db.transaction() as conn:
+            # Vérifier si la personne existe déjà
+            if conn.execute("SELECT id FROM persons WHERE name = ?", (name,)).fetchone():
+                return False, f"La personne '{name}' existe déjà"
+            
+            # Enregistrer (première empreinte = centroïde)
+            cursor = conn.execute(
+                "INSERT INTO persons (name, features, features_dtype, image_path) VALUES (?, ?, ?, ?)",
+                (name, encode_features(face_data['features']), FEATURE_DTYPE, image_path)
+            )
+            conn.execute(
+                "INSERT INTO templates (person_id, features, features_dtype, is_medoid, image_path) "
+                "VALUES (?, ?, ?, 1, ?)",
+                (cursor.lastrowid, encode_features(face_data['features'], self.template_dtype),
+                 self.template_dtype, image_path)
+            )
+            record_change(conn, 'upsert', name)
         
-        conn.commit()
-        conn.close()
+        self.gallery.add(name, face_data['features'])
         
         # Sauvegarder l'image du visage
         face_path = str(self.registered_faces_dir / f"{name}.jpg")
@@ -176,84 +590,339 @@ class UltraSimpleFaceSystem:
         
         return True, f"Personne '{name}' enregistrée avec succès"
     
-    def recognize_person(self, image_path: str) -> Tuple[Optional[str], float]:
-        """Reconnaît une personne"""
-        face_data = self.detect_face(image_path)
+    def enroll_batch(self, persons: List[Tuple[str, List[Tuple[dict, Optional[str]]]]],
+                     on_commit: Optional[Callable] = None,
+                     extend: bool = False) -> List[Tuple[str, bool, str, int]]:
+        """
+        Inscrit plusieurs personnes en une seule transaction
+        `persons` : (nom, [(résultat de detect_face(with_images=True), chemin de l'original)...])
+        `extend` : les empreintes d'une personne déjà inscrite lui sont ajoutées (sinon échec)
+        `on_commit(conn, résultats)` est appelé dans la même transaction (suivi d'import)
+        Retourne (nom, succès, message, ignorées) par personne : les `ignorées` dernières
+        empreintes dépassaient `max_templates` et n'ont pas été enregistrées.
+        """
+        results = []
+        enrolled = []
+        crops = []
+        with self.db.transaction() as conn:
+            for name, faces in persons:
+                if not faces:
+                    results.append((name, False, "Aucun visage détecté dans l'image", 0))
+                    continue
+                row = conn.execute("SELECT id FROM persons WHERE name = ?", (name,)).fetchone()
+                if row and not extend:
+                    results.append((name, False, f"La personne '{name}' existe déjà", 0))
+                    continue
+                
+                count = conn.execute(
+                    "SELECT COUNT(*) FROM templates WHERE person_id = ?", (row[0],)
+                ).fetchone()[0] if row else 0
+                kept = faces[:max(0, self.max_templates - count)]
+                dropped = len(faces) - len(kept)
+                if not kept:
+                    results.append((name, False, f"Maximum {self.max_templates} images par personne", dropped))
+                    continue
+                
+                if row:
+                    # Personne existante : empreintes ajoutées puis agrégat recalculé
+                    person_id = row[0]
+                    medoid_set = set()
+                else:
+                    matrix = np.stack([face_data['features'] for face_data, _ in kept]).astype(np.float32)
+                    center, medoids = aggregate(matrix, self.template_medoids)
+                    person_id = conn.execute(
+                        "INSERT INTO persons (name, features, features_dtype, image_path) VALUES (?, ?, ?, ?)",
+                        (name, encode_features(center), FEATURE_DTYPE, kept[0][1])
+                    ).lastrowid
+                    medoid_set = set(int(i) for i in medoids)
+                
+                fresh = {}
+                for i, (face_data, image_path) in enumerate(kept):
+                    template_id = conn.execute(
+                        "INSERT INTO templates (person_id, features, features_dtype, is_medoid, image_path) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (person_id, encode_features(face_data['features'], self.template_dtype),
+                         self.template_dtype, int(i in medoid_set), image_path)
+                    ).lastrowid
+                    fresh[template_id] = np.asarray(face_data['features'], dtype=np.float32)
+                    # Même nommage que register_person / add_template
+                    filename = f"{name}.jpg" if i == 0 and not row else f"{name}_{template_id}.jpg"
+                    crops.append((str(self.registered_faces_dir / filename), face_data['face_image']))
+                
+                if row:
+                    center, medoid_features, total = self._reaggregate(conn, person_id, fresh)
+                    message = f"{len(kept)} images ajoutées pour '{name}' ({total} empreintes)"
+                else:
+                    medoid_features = matrix[medoids]
+                    message = f"Personne '{name}' enregistrée ({len(kept)} empreintes)"
+                record_change(conn, 'upsert', name)
+                enrolled.append((name, center, medoid_features, "ADD_TEMPLATE" if row else "REGISTER"))
+                results.append((name, True, message, dropped))
+            
+            if on_commit is not None:
+                on_commit(conn, results)
         
+        for name, center, medoids, action in enrolled:
+            self.gallery.add(name, center)
+            self._set_templates(name, medoids)
+            self._log_action(action, name, 100)
+        
+        # Visages découpés écrits en parallèle (cv2.imwrite relâche le GIL)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda item: cv2.imwrite(*item), crops))
+        
+        return results
+    
+    def add_person_image(self, name: str, image: ImageSource,
+                         image_path: Optional[str] = None) -> Tuple[bool, str]:
+        """Ajoute une image (une empreinte) à une personne existante"""
+        if image_path is None and isinstance(image, str):
+            image_path = image
+        
+        return self.add_template(name, self.detect_face(image, with_images=True), image_path)
+    
+    def add_template(self, name: str, face_data: Optional[dict],
+                     image_path: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Ajoute une empreinte à une personne à partir d'un résultat de detect_face(with_images=True)
+        puis recalcule son centroïde (galerie) et ses médoïdes
+        """
         if face_data is None:
-            return None, 0.0
+            return False, "Aucun visage détecté dans l'image"
         
-        # Récupérer toutes les personnes
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name, features FROM persons")
-        persons = cursor.fetchall()
-        conn.close()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT id FROM persons WHERE name = ?", (name,)).fetchone()
+            if not row:
+                return False, f"La personne '{name}' n'existe pas"
+            person_id = row[0]
+            
+            count = conn.execute(
+                "SELECT COUNT(*) FROM templates WHERE person_id = ?", (person_id,)
+            ).fetchone()[0]
+            if count >= self.max_templates:
+                return False, f"Maximum {self.max_templates} images par personne"
+            
+            template_id = conn.execute(
+                "INSERT INTO templates (person_id, features, features_dtype, image_path) VALUES (?, ?, ?, ?)",
+                (person_id, encode_features(face_data['features'], self.template_dtype),
+                 self.template_dtype, image_path)
+            ).lastrowid
+            
+            # Nouvel agrégat
+            center, medoids, total = self._reaggregate(
+                conn, person_id, {template_id: np.asarray(face_data['features'], dtype=np.float32)}
+            )
+            record_change(conn, 'upsert', name)
+        
+        self.gallery.add(name, center)
+        self._set_templates(name, medoids)
         
-        if not persons:
-            return None, 0.0
+        # Sauvegarder l'image du visage
+        face_path = str(self.registered_faces_dir / f"{name}_{template_id}.jpg")
+        cv2.imwrite(face_path, face_data['face_image'])
         
-        target_features = np.array(face_data['features'])
-        best_match = None
-        best_similarity = 0
+        self._log_action("ADD_TEMPLATE", name, 100)
         
-        for name, features_json in persons:
-            try:
-                known_features = np.array(json.loads(features_json))
-                
-                # Calculer la similarité cosinus
-                similarity = np.dot(target_features, known_features)
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = name
-            except:
+        return True, f"Image ajoutée pour '{name}' ({total} empreintes)"
+    
+    def _reaggregate(self, conn, person_id: int,
+                     fresh: Optional[Dict[int, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Recalcule le centroïde et les médoïdes d'une personne dans la transaction `conn`
+        `fresh` : {id d'empreinte: float32} des empreintes qui viennent d'être insérées,
+        utilisées telles quelles plutôt que relues (f2 / q8 perdent en précision)
+        Retourne (centroïde, médoïdes, nombre d'empreintes)
+        """
+        fresh = fresh or {}
+        rows = conn.execute(
+            "SELECT id, features, features_dtype FROM templates WHERE person_id = ? ORDER BY id",
+            (person_id,)
+        ).fetchall()
+        matrix = np.stack([
+            fresh[template_id] if template_id in fresh else decode_features(features, dtype)
+            for template_id, features, dtype in rows
+        ]).astype(np.float32, copy=False)
+        center, medoids = aggregate(matrix, self.template_medoids)
+        
+        conn.execute(
+            "UPDATE persons SET features = ?, features_dtype = ? WHERE id = ?",
+            (encode_features(center), FEATURE_DTYPE, person_id)
+        )
+        conn.execute("UPDATE templates SET is_medoid = 0 WHERE person_id = ?", (person_id,))
+        conn.executemany(
+            "UPDATE templates SET is_medoid = 1 WHERE id = ?",
+            [(rows[i][0],) for i in medoids]
+        )
+        return center, matrix[medoids], len(rows)
+    
+    def _load_templates(self, names: List[str]):
+        """Mode paresseux : lit les médoïdes des noms jamais consultés"""
+        missing = [name for name in names if name not in self._templates_checked]
+        if not missing:
+            return
+        with self.db.connection() as conn:
+            medoids = self._fetch_medoids(conn, missing)
+        for name in missing:
+            self._set_templates(name, medoids.get(name, np.empty((0, 0))))
+    
+    def _set_templates(self, name: str, medoids: np.ndarray):
+        """Médoïdes gardés pour l'expansion (inutile avec une seule empreinte)"""
+        if self._templates_lazy:
+            self._templates_checked.add(name)
+        if len(medoids) > 1:
+            self.templates[name] = np.ascontiguousarray(medoids, dtype=np.float32)
+        else:
+            self.templates.pop(name, None)
+    
+    def recognize_person(self, image: ImageSource, preset: Optional[str] = None,
+                         roi: Optional[Box] = None) -> Tuple[Optional[str], float]:
+        """Reconnaît une personne"""
+        return self.match_face(self.detect_face(image, preset, roi))
+    
+    def recognize_faces(self, image: ImageSource, max_faces: Optional[int] = None,
+                        preset: Optional[str] = None, roi: Optional[Box] = None) -> List[dict]:
+        """Reconnaît tous les visages d'une image en une seule passe vectorisée"""
+        return self.match_all(self.detect_faces(image, max_faces, preset, roi))
+    
+    def match_all(self, faces: List[dict]) -> List[dict]:
+        """Résultats par boîte (nom, confiance, bbox) pour une liste de detect_faces"""
+        return [
+            {'name': name, 'confidence': confidence, 'bbox': face_data['bbox']}
+            for face_data, (name, confidence) in zip(faces, self.match_faces(faces))
+        ]
+    
+    def match_face(self, face_data: Optional[dict]) -> Tuple[Optional[str], float]:
+        """Compare un résultat de detect_face à la galerie"""
+        return self.match_faces([face_data])[0]
+    
+    def match_faces(self, faces: List[Optional[dict]]) -> List[Tuple[Optional[str], float]]:
+        """
+        Compare plusieurs résultats de detect_face à la galerie
+        en un seul produit matrice-matrice ; résultats dans l'ordre d'entrée
+        """
+        results = [(None, 0.0)] * len(faces)
+        detected = [i for i, face_data in enumerate(faces) if face_data is not None]
+        if not detected:
+            return results
+        
+        queries = np.stack([faces[i]['features'] for i in detected]).astype(np.float32, copy=False)
+        with stage("match"):
+            matches = self.gallery.search_batch(queries, k=1)
+            if not matches:
+                return results
+            
+            for query, i, best in zip(queries, detected, matches):
+                # Un index approximatif peut ne renvoyer aucun candidat
+                if not best:
+                    results[i] = self._decide(None, 0.0)
+                    continue
+                name, similarity = best[0]
+                if ((self.templates or self._templates_lazy)
+                        and abs(similarity * 100 - self._threshold(name)) <= TEMPLATE_MARGIN):
+                    name, similarity = self._expand(query, name, similarity)
+                results[i] = self._decide(name, similarity)
+        return results
+    
+    def _expand(self, query: np.ndarray, name: str, similarity: float) -> Tuple[str, float]:
+        """Près du seuil : compare aux médoïdes des meilleures personnes (centroïde en premier)"""
+        self.template_expansions += 1
+        candidates = self.gallery.search(query, k=TEMPLATE_CANDIDATES)
+        if self._templates_lazy:
+            self._load_templates([candidate for candidate, _ in candidates])
+        for candidate, _ in candidates:
+            medoids = self.templates.get(candidate)
+            if medoids is None:
                 continue
+            score = float(np.max(medoids @ query))
+            if score > similarity:
+                name, similarity = candidate, score
+        return name, similarity
+    
+    def set_threshold(self, name: str, threshold: Optional[float]) -> Tuple[bool, str]:
+        """
+        Seuil de confiance (en %) propre à une personne, enregistré en base
+        et propagé aux autres processus par le journal (None : seuil commun)
+        """
+        with self.db.transaction() as conn:
+            updated = conn.execute(
+                "UPDATE persons SET threshold = ? WHERE name = ?", (threshold, name)
+            ).rowcount
+            if not updated:
+                return False, f"La personne '{name}' n'existe pas"
+            record_change(conn, 'upsert', name)
+        
+        self.gallery.set_threshold(name, None if threshold is None else threshold / 100)
+        if threshold is None:
+            return True, f"Seuil commun ({RECOGNITION_THRESHOLD:.0f}%) pour '{name}'"
+        return True, f"Seuil de '{name}' fixé à {threshold:g}%"
+    
+    def _threshold(self, name: Optional[str]) -> float:
+        """Seuil de reconnaissance (en %) : celui de la personne s'il est défini"""
+        if name in self.gallery.thresholds:
+            return self.gallery.thresholds[name] * 100
+        return RECOGNITION_THRESHOLD
+    
+    def _decide(self, best_match: str, best_similarity: float) -> Tuple[Optional[str], float]:
+        """Applique le seuil à la meilleure correspondance et journalise"""
+        if best_similarity <= 0:
+            best_match, best_similarity = None, 0.0
         
         # Convertir en pourcentage
         confidence = best_similarity * 100
         
-        # Seuil minimum
-        if confidence > 65:  # Seuil augmenté pour plus de sécurité
+        # Seuil minimum (propre à la personne si défini dans la galerie)
+        if confidence > self._threshold(best_match):
+            RECOGNITIONS.inc(1, "match")
             self._log_action("RECOGNIZE", best_match, confidence)
             return best_match, confidence
         else:
+            RECOGNITIONS.inc(1, "unknown")
             self._log_action("UNKNOWN", None, confidence)
             return None, confidence
 
     def delete_person(self, name: str) -> Tuple[bool, str]:
         """Supprime une personne de la base et du système de fichiers"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            # Écrire les logs en attente avant de purger ceux de la personne
+            self.log_writer.flush()
             
-            # Récupérer le chemin de l'image avant suppression
-            cursor.execute("SELECT image_path FROM persons WHERE name = ?", (name,))
-            row = cursor.fetchone()
-            
-            if not row:
-                conn.close()
-                return False, f"La personne '{name}' n'existe pas"
-            
-            # Supprimer de la base
-            cursor.execute("DELETE FROM persons WHERE name = ?", (name,))
-            cursor.execute("DELETE FROM logs WHERE person_name = ?", (name,))
-            
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                # Récupérer le chemin de l'image avant suppression
+                row = conn.execute(
+                    "SELECT image_path FROM persons WHERE name = ?", (name,)
+                ).fetchone()
+                
+                if not row:
+                    return False, f"La personne '{name}' n'existe pas"
+                
+                template_rows = conn.execute("""
+                    SELECT t.id, t.image_path FROM templates t
+                    JOIN persons p ON p.id = t.person_id WHERE p.name = ?
+                """, (name,)).fetchall()
+                
+                # Supprimer de la base
+                conn.execute(
+                    "DELETE FROM templates WHERE person_id IN (SELECT id FROM persons WHERE name = ?)",
+                    (name,)
+                )
+                conn.execute("DELETE FROM persons WHERE name = ?", (name,))
+                record_change(conn, 'delete', name)
+                conn.execute("DELETE FROM logs WHERE person_name = ?", (name,))
             
-            # Supprimer les fichiers images
-            image_path = row[0]
-            if image_path and os.path.exists(image_path):
-                try:
-                    os.remove(image_path)
-                except: pass
+            self.gallery.remove(name)
+            self.gallery.set_threshold(name, None)
+            self.templates.pop(name, None)
             
-            face_path = str(self.registered_faces_dir / f"{name}.jpg")
-            if os.path.exists(face_path):
-                try:
-                    os.remove(face_path)
-                except: pass
+            # Supprimer les fichiers images (originaux et visages découpés)
+            # Seulement dans les dossiers du système : les photos d'un import restent à leur place
+            paths = {row[0]} | {path for _, path in template_rows}
+            paths.add(str(self.registered_faces_dir / f"{name}.jpg"))
+            paths.update(str(self.registered_faces_dir / f"{name}_{tid}.jpg") for tid, _ in template_rows)
+            for path in paths:
+                if path and self._owns(path) and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except: pass
             
             self._log_action("DELETE", name, 100)
             return True, f"Personne '{name}' supprimée avec succès"
@@ -261,20 +930,32 @@ class UltraSimpleFaceSystem:
         except Exception as e:
             return False, f"Erreur lors de la suppression: {str(e)}"
 
-    def list_persons(self) -> List[dict]:
-        """Liste toutes les personnes"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT p.id, p.name, p.image_path, p.created_at, 
-                   COUNT(l.id) as recognition_count
+    def _owns(self, path: str) -> bool:
+        """Fichier écrit par le système (visages découpés ou originaux reçus par l'API)"""
+        return inside(path, self.registered_faces_dir) or inside(path, self.uploads_dir)
+
+    def list_persons(self, limit: Optional[int] = None, after: Optional[str] = None) -> List[dict]:
+        """
+        Liste les personnes par nom croissant
+        Pagination par curseur : `after` = dernier nom de la page précédente
+        """
+        query = """
+            SELECT p.id, p.name, p.image_path, p.created_at, p.recognition_count,
+                   (SELECT COUNT(*) FROM templates t WHERE t.person_id = p.id) as template_count,
+                   p.threshold
             FROM persons p
-            LEFT JOIN logs l ON p.name = l.person_name AND l.action = 'RECOGNIZE'
-            GROUP BY p.id
-            ORDER BY p.name
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        """
+        params: list = []
+        if after is not None:
+            query += " WHERE p.name > ?"
+            params.append(after)
+        query += " ORDER BY p.name"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
         
         return [
             {
@@ -282,33 +963,51 @@ class UltraSimpleFaceSystem:
                 'name': row[1],
                 'image_path': row[2],
                 'created_at': row[3],
-                'recognition_count': row[4]
+                'recognition_count': row[4],
+                'template_count': row[5],
+                'threshold': row[6]
             }
             for row in rows
         ]
     
+    def _counters(self) -> Dict[str, int]:
+        with self.db.connection() as conn:
+            return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+    
+    def count_persons(self) -> int:
+        return self._counters().get('persons', 0)
+    
     def get_stats(self) -> dict:
-        """Retourne des statistiques"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM persons")
-        person_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM logs WHERE action = 'RECOGNIZE'")
-        recognition_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM logs WHERE action = 'UNKNOWN'")
-        unknown_count = cursor.fetchone()[0]
-        
-        conn.close()
+        """Retourne des statistiques (compteurs maintenus, sans parcours des tables)"""
+        counters = self._counters()
+        person_count = counters.get('persons', 0)
+        recognition_count = counters.get('logs:RECOGNIZE', 0)
+        unknown_count = counters.get('logs:UNKNOWN', 0)
         
         return {
             'persons': person_count,
             'recognitions': recognition_count,
             'unknown_faces': unknown_count,
-            'success_rate': recognition_count / (recognition_count + unknown_count + 1e-6) * 100
+            'success_rate': recognition_count / (recognition_count + unknown_count + 1e-6) * 100,
+            'log_queue': self.log_writer.stats(),
+            'detector': self.detector.name,
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'templates': {
+                'multi_template_persons': len(self.templates),
+                'expansions': self.template_expansions
+            },
+            'gallery_sync': self.sync.stats(),
+            'shared_gallery': self.gallery.stats() if isinstance(self.gallery, MappedGallery) else None,
+            'quantized_gallery': self.gallery.stats() if isinstance(self.gallery, QuantizedGallery) else None
         }
+    
+    def close(self):
+        """Vide la file de logs, sauvegarde l'index et ferme les connexions"""
+        self.sync.stop()
+        self.log_writer.close()
+        self.gallery.save()
+        super().close()
+        self.db.close_all()
 
 # Test simple
 if __name__ == "__main__":
@@ -338,8 +1037,10 @@ if __name__ == "__main__":
         name, conf = system.recognize_person(test_path)
         print(f"Reconnaissance: {name} ({conf:.1f}%)")
     
+    system.log_writer.flush()
     stats = system.get_stats()
     print(f"Statistiques: {stats}")
+    system.close()
     
     # Nettoyer
     import shutil
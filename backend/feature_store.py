@@ -0,0 +1,100 @@
+# feature_store.py - Stockage binaire des descripteurs (BLOB float32)
+import json
+import sqlite3
+import numpy as np
+from typing import Optional
+
+# Format courant : float32 little-endian brut (dtype numpy)
+FEATURE_DTYPE = '<f4'
+# Ancien format : liste JSON en texte
+LEGACY_DTYPE = 'json'
+# Formats compacts : float16 (2 octets) ou int8 avec échelle par vecteur (float32 en tête)
+FLOAT16_DTYPE = '<f2'
+INT8_DTYPE = 'q8'
+STORAGE_DTYPES = {'f4': FEATURE_DTYPE, 'f2': FLOAT16_DTYPE, 'q8': INT8_DTYPE}
+
+
+def quantize(matrix, precision: str = "int8"):
+    """
+    Quantifie des descripteurs ligne par ligne
+    - "int8"    : (codes int8, échelles float32) avec ligne ≈ échelle * codes
+    - "float16" : (codes float16, None)
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    if precision == "float16":
+        return matrix.astype(np.float16), None
+    if precision != "int8":
+        raise ValueError(f"Précision inconnue: {precision}")
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    matrix = np.asarray(codes, dtype=np.float32)
+    if scales is not None:
+        matrix = matrix * scales[:, None]
+    return matrix
+
+
+def encode_features(features, dtype: str = FEATURE_DTYPE) -> bytes:
+    """Sérialise un descripteur en octets bruts"""
+    if dtype == INT8_DTYPE:
+        codes, scales = quantize(features)
+        return scales.astype('<f4').tobytes() + codes.tobytes()
+    return np.asarray(features, dtype=dtype).tobytes()
+
+
+def decode_features(data, dtype: str = FEATURE_DTYPE) -> np.ndarray:
+    """
+    Désérialise un descripteur
+    Les BLOB float32 sont lus sans copie via np.frombuffer (vue en lecture seule) ;
+    les formats compacts sont restitués en float32
+    """
+    if dtype == LEGACY_DTYPE or isinstance(data, str):
+        return np.asarray(json.loads(data), dtype=np.float32)
+    if dtype == INT8_DTYPE:
+        scale = np.frombuffer(data, dtype='<f4', count=1)
+        return dequantize(np.frombuffer(data, dtype=np.int8, offset=4)[None, :], scale)[0]
+    if dtype == FLOAT16_DTYPE:
+        return np.frombuffer(data, dtype=dtype).astype(np.float32)
+    return np.frombuffer(data, dtype=dtype)
+
+
+def migrate_to_blob(conn: sqlite3.Connection, table: str, column: str, dtype_column: str) -> int:
+    """
+    Convertit en place les descripteurs JSON d'une table en BLOB float32
+    Idempotent : seules les lignes encore marquées 'json' sont converties.
+    Ne valide pas : la conversion fait partie de la transaction de l'appelant.
+    Retourne le nombre de lignes converties.
+    """
+    cursor = conn.cursor()
+    # sqlite3 n'ouvre pas de transaction avant un ALTER TABLE : l'ouvrir ici pour
+    # que colonne et conversion soient validées (ou annulées) ensemble par l'appelant
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [row[1] for row in cursor.fetchall()]
+    if dtype_column not in columns:
+        cursor.execute(
+            f"ALTER TABLE {table} ADD COLUMN {dtype_column} "
+            f"TEXT NOT NULL DEFAULT '{LEGACY_DTYPE}'"
+        )
+
+    cursor.execute(
+        f"SELECT id, {column} FROM {table} WHERE {dtype_column} = ?",
+        (LEGACY_DTYPE,)
+    )
+    updates = []
+    for row_id, value in cursor.fetchall():
+        try:
+            updates.append((encode_features(json.loads(value)), FEATURE_DTYPE, row_id))
+        except (TypeError, ValueError):
+            print(f"⚠️ {table}.{column} illisible (id={row_id}), ligne ignorée")
+
+    cursor.executemany(
+        f"UPDATE {table} SET {column} = ?, {dtype_column} = ? WHERE id = ?",
+        updates
+    )
+    return len(updates)
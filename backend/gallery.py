@@ -0,0 +1,491 @@
+# gallery.py - Galerie de descripteurs résidente en mémoire
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from feature_store import dequantize, quantize
+
+# Premier passage quantifié : lignes converties en float32 à la fois (bloc de
+# quelques centaines de Ko, réutilisé) et scores gardés avant chaque sélection (16 Mo)
+_SCAN_CHUNK = 4096
+_SCAN_WINDOW = 1 << 22
+
+# "cosine" : similarité (produit scalaire), décroissante ; "l2" : distance euclidienne, croissante
+METRICS = ("cosine", "l2")
+
+
+class FaceGallery:
+    """
+    Galerie en mémoire : matrice float32 contiguë des descripteurs
+    enregistrés + tableau de noms parallèle.
+    La recherche se fait en un seul produit matrice-vecteur ; en "l2",
+    les normes au carré des lignes sont gardées en cache.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 64, metric: str = "cosine"):
+        if metric not in METRICS:
+            raise ValueError(f"Métrique inconnue: {metric}")
+        self.dim = dim
+        self.metric = metric
+        self._capacity = max(1, capacity)
+        self._matrix: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # Seuils propres à certaines personnes (même unité que les scores)
+        self.thresholds: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    @property
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._names)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Vue (sans copie) sur les lignes occupées"""
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            return self._matrix[:len(self._names)]
+
+    def _ensure_capacity(self, size: int):
+        """Agrandit la matrice par doublement (coût amorti constant)"""
+        if self._matrix is None:
+            self._capacity = max(self._capacity, size)
+            self._matrix = np.zeros((self._capacity, self.dim), dtype=np.float32)
+            if self.metric == "l2":
+                self._norms = np.zeros(self._capacity, dtype=np.float32)
+            return
+        if size <= self._matrix.shape[0]:
+            return
+        capacity = self._matrix.shape[0]
+        while capacity < size:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:len(self._names)] = self._matrix[:len(self._names)]
+        self._matrix = grown
+        if self._norms is not None:
+            norms = np.zeros(capacity, dtype=np.float32)
+            norms[:len(self._names)] = self._norms[:len(self._names)]
+            self._norms = norms
+        self._capacity = capacity
+
+    def _as_vector(self, features) -> np.ndarray:
+        vector = np.asarray(features, dtype=np.float32).reshape(-1)
+        if self.dim is None:
+            self.dim = vector.shape[0]
+        if vector.shape[0] != self.dim:
+            raise ValueError(
+                f"Dimension invalide: {vector.shape[0]} (attendu {self.dim})"
+            )
+        return vector
+
+    def load(self, rows: Iterable[Tuple[str, object]]) -> int:
+        """
+        Charge (remplace) toute la galerie à partir de couples (nom, descripteur)
+        Les lignes de dimension incohérente sont ignorées.
+        """
+        with self._lock:
+            self._matrix = None
+            self._norms = None
+            self._names = []
+            self._rows = {}
+            vectors = []
+            names = []
+            for name, features in rows:
+                try:
+                    vectors.append(self._as_vector(features))
+                    names.append(name)
+                except (ValueError, TypeError) as e:
+                    print(f"⚠️ Descripteur ignoré pour '{name}': {e}")
+            if not vectors:
+                return 0
+            self._ensure_capacity(len(vectors))
+            self._matrix[:len(vectors)] = np.stack(vectors)
+            if self._norms is not None:
+                matrix = self._matrix[:len(vectors)]
+                self._norms[:len(vectors)] = np.einsum("ij,ij->i", matrix, matrix)
+            self._names = names
+            self._rows = {name: i for i, name in enumerate(names)}
+            return len(names)
+
+    def add(self, name: str, features) -> None:
+        """Ajoute (ou remplace) le descripteur d'une personne"""
+        with self._lock:
+            vector = self._as_vector(features)
+            row = self._rows.get(name)
+            if row is None:
+                row = len(self._names)
+                self._ensure_capacity(row + 1)
+                self._names.append(name)
+                self._rows[name] = row
+            self._matrix[row] = vector
+            if self._norms is not None:
+                self._norms[row] = vector @ vector
+
+    def remove(self, name: str) -> bool:
+        """Retire une personne (la dernière ligne prend sa place)"""
+        with self._lock:
+            row = self._rows.pop(name, None)
+            if row is None:
+                return False
+            last = len(self._names) - 1
+            if row != last:
+                moved = self._names[last]
+                self._matrix[row] = self._matrix[last]
+                if self._norms is not None:
+                    self._norms[row] = self._norms[last]
+                self._names[row] = moved
+                self._rows[moved] = row
+            self._names.pop()
+            return True
+
+    def save(self):
+        """Rien à persister : la galerie exacte est reconstruite depuis la base"""
+
+    def set_threshold(self, name: str, threshold: Optional[float]):
+        """Seuil propre à une personne (None : revenir au seuil commun)"""
+        with self._lock:
+            if threshold is None:
+                self.thresholds.pop(name, None)
+            else:
+                self.thresholds[name] = float(threshold)
+
+    def threshold(self, name: Optional[str], default: float) -> float:
+        return self.thresholds.get(name, default)
+
+    def accepts(self, names: List[List[str]], scores: np.ndarray, default: float) -> np.ndarray:
+        """
+        Décision en ensemble ouvert pour chaque résultat de search_topk :
+        au-dessus du seuil (cosine) ou en dessous (l2), celui de la personne sinon `default`
+        """
+        with self._lock:
+            thresholds = np.array(
+                [[self.thresholds.get(name, default) for name in row] for row in names],
+                dtype=np.float32
+            ).reshape(np.shape(scores))
+        return scores < thresholds if self.metric == "l2" else scores > thresholds
+
+    def search(self, features, k: int = 1) -> List[Tuple[str, float]]:
+        """
+        Retourne les k meilleures correspondances (nom, score)
+        triées de la plus proche à la plus éloignée
+        """
+        results = self.search_batch(self._as_vector(features)[None, :], k)
+        return results[0] if results else []
+
+    def search_topk(self, queries, k: int = 1) -> Tuple[List[List[str]], np.ndarray]:
+        """
+        k meilleures correspondances sous forme de tableaux (pour accepts)
+        Retourne (noms, scores) de forme (requêtes, k) : similarités décroissantes
+        (cosine) ou distances euclidiennes croissantes (l2)
+        Enveloppe de search_batch (seule méthode redéfinie par les sous-classes) ;
+        si certaines requêtes ont moins de k résultats (IVF), coupé au plus court
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        results = self.search_batch(queries, k)
+        if not results:
+            return [[] for _ in queries], np.empty((len(queries), 0), dtype=np.float32)
+        width = min(len(row) for row in results)
+        names = [[name for name, _ in row[:width]] for row in results]
+        scores = np.array([[score for _, score in row[:width]] for row in results],
+                          dtype=np.float32).reshape(len(results), width)
+        return names, scores
+
+    def _topk(self, queries: np.ndarray, k: int) -> Tuple[List[List[str]], np.ndarray]:
+        """Cœur de la recherche exacte : k meilleures lignes pour chaque requête (verrou tenu)"""
+        size = len(self._names)
+        scores = queries @ self._matrix[:size].T
+        if self.metric == "l2":
+            # ||q - x||² = ||q||² + ||x||² - 2 q.x (normes des lignes en cache) ;
+            # opposé pour garder « plus grand = plus proche »
+            scores *= 2
+            scores -= self._norms[:size]
+            scores -= np.einsum("ij,ij->i", queries, queries)[:, None]
+
+        k = min(k, size)
+        if k == 1:
+            best = np.argmax(scores, axis=1)[:, None]
+        else:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+            best = np.take_along_axis(top, order, axis=1)
+        values = np.take_along_axis(scores, best, axis=1)
+        if self.metric == "l2":
+            values = np.sqrt(np.maximum(-values, 0))
+        return [[self._names[j] for j in row] for row in best], values
+
+    def search_batch(self, queries, k: int = 1) -> List[List[Tuple[str, float]]]:
+        """
+        Recherche de plusieurs descripteurs en un seul produit matrice-matrice
+        Retourne une liste de résultats (comme search) dans l'ordre des requêtes
+        """
+        with self._lock:
+            if len(self._names) == 0:
+                return []
+            queries = np.asarray(queries, dtype=np.float32)
+            if queries.ndim != 2 or queries.shape[1] != self.dim:
+                raise ValueError(f"Requêtes de forme invalide: {queries.shape}")
+            names, scores = self._topk(queries, k)
+            return [
+                [(name, float(score)) for name, score in zip(row_names, row_scores)]
+                for row_names, row_scores in zip(names, scores)
+            ]
+
+
+class QuantizedGallery(FaceGallery):
+    """
+    Galerie compacte : descripteurs quantifiés en mémoire
+    ("int8" avec une échelle par ligne : 4x moins de mémoire ; "float16" : 2x)
+    Un premier passage approximatif sur toute la matrice retient les
+    `rerank * k` meilleurs candidats, re-classés ensuite en float32 exact
+    à partir de `exact(noms) -> {nom: descripteur}` (la base, par exemple).
+    Sans `exact`, les similarités retournées sont approximatives.
+    Les descripteurs float32 re-classés restent dans un LRU de `cache_size` personnes
+    (tenu à jour par add / remove) : seuls les candidats absents coûtent une lecture
+    de `exact`, une seule requête SQLite pour toutes les requêtes d'un search_batch
+    (cache_size=0 : à chaque recherche). Le LRU coûte cache_size x dim x 4 octets
+    (4096 x 52 : moins de 1 Mo) ; le porter au nombre de personnes supprime toute
+    lecture mais redonne l'empreinte mémoire d'une galerie float32.
+    """
+
+    def __init__(self, precision: str = "int8",
+                 exact: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None,
+                 rerank: int = 8, dim: Optional[int] = None, capacity: int = 64,
+                 cache_size: int = 4096):
+        if precision not in ("int8", "float16"):
+            raise ValueError(f"Précision inconnue: {precision}")
+        super().__init__(dim, capacity)
+        self.precision = precision
+        self.exact = exact
+        self.rerank = max(1, rerank)
+        self._dtype = np.int8 if precision == "int8" else np.float16
+        self._scales: Optional[np.ndarray] = None
+        # Descripteurs exacts récemment re-classés ; `_generation` change à chaque
+        # modification, pour ne pas remettre en cache un descripteur lu avant
+        self.cache_size = max(0, cache_size)
+        self._exact_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._generation = 0
+
+        # Compteurs
+        self.reranked = 0
+        self.missing = 0
+        self.cache_hits = 0
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Copie float32 (déquantifiée) des lignes occupées"""
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            size = len(self._names)
+            scales = self._scales[:size] if self._scales is not None else None
+            return dequantize(self._matrix[:size], scales)
+
+    def _ensure_capacity(self, size: int):
+        if self._matrix is not None and size <= self._matrix.shape[0]:
+            return
+        capacity = self._capacity if self._matrix is None else self._matrix.shape[0]
+        capacity = max(capacity, 1)
+        while capacity < size:
+            capacity *= 2
+        used = len(self._names) if self._matrix is not None else 0
+        grown = np.zeros((capacity, self.dim), dtype=self._dtype)
+        scales = np.ones(capacity, dtype=np.float32) if self.precision == "int8" else None
+        if used:
+            grown[:used] = self._matrix[:used]
+            if scales is not None:
+                scales[:used] = self._scales[:used]
+        self._matrix = grown
+        self._scales = scales
+        self._capacity = capacity
+
+    def _write(self, start: int, vectors: np.ndarray):
+        codes, scales = quantize(vectors, self.precision)
+        self._matrix[start:start + len(codes)] = codes
+        if scales is not None:
+            self._scales[start:start + len(codes)] = scales
+
+    def load(self, rows: Iterable[Tuple[str, object]]) -> int:
+        with self._lock:
+            self._matrix = None
+            self._scales = None
+            self._names = []
+            self._rows = {}
+            self._exact_cache.clear()
+            self._generation += 1
+            vectors = []
+            names = []
+            for name, features in rows:
+                try:
+                    vectors.append(self._as_vector(features))
+                    names.append(name)
+                except (ValueError, TypeError) as e:
+                    print(f"⚠️ Descripteur ignoré pour '{name}': {e}")
+            if not vectors:
+                return 0
+            self._ensure_capacity(len(vectors))
+            # Quantification par blocs : pas de copie float32 complète en plus de `vectors`
+            for start in range(0, len(vectors), _SCAN_CHUNK):
+                self._write(start, np.stack(vectors[start:start + _SCAN_CHUNK]))
+            self._names = names
+            self._rows = {name: i for i, name in enumerate(names)}
+            return len(names)
+
+    def add(self, name: str, features) -> None:
+        with self._lock:
+            vector = self._as_vector(features)
+            row = self._rows.get(name)
+            if row is None:
+                row = len(self._names)
+                self._ensure_capacity(row + 1)
+                self._names.append(name)
+                self._rows[name] = row
+            self._write(row, vector[None, :])
+            # Le descripteur reçu est la valeur exacte : gardée si déjà en cache
+            self._generation += 1
+            if name in self._exact_cache:
+                self._exact_cache[name] = vector.copy()
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            row = self._rows.get(name)
+            if row is None:
+                return False
+            self._exact_cache.pop(name, None)
+            self._generation += 1
+            last = len(self._names) - 1
+            if row != last and self._scales is not None:
+                self._scales[row] = self._scales[last]
+            return super().remove(name)
+
+    def _scan(self, queries: np.ndarray, count: int) -> np.ndarray:
+        """
+        Premier passage : lignes des `count` meilleures similarités approchées, triées
+        Les codes sont convertis par blocs de _SCAN_CHUNK lignes dans un tampon float32
+        réutilisé (qui reste dans le cache du processeur) ; les scores d'une fenêtre de
+        _SCAN_WINDOW valeurs sont gardés puis réduits en une seule sélection
+        """
+        size = len(self._names)
+        window = max(_SCAN_CHUNK, _SCAN_WINDOW // len(queries) // _SCAN_CHUNK * _SCAN_CHUNK)
+        block = np.empty((min(_SCAN_CHUNK, size), self.dim), dtype=np.float32)
+        scores = np.empty((len(queries), min(window, size)), dtype=np.float32)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, size, window):
+            end = min(start + window, size)
+            view = scores[:, :end - start]
+            for chunk in range(start, end, _SCAN_CHUNK):
+                stop = min(chunk + _SCAN_CHUNK, end)
+                rows = block[:stop - chunk]
+                np.copyto(rows, self._matrix[chunk:stop], casting="unsafe")
+                np.matmul(queries, rows.T, out=view[:, chunk - start:stop - start])
+            if self._scales is not None:
+                view *= self._scales[start:end]
+            kept = min(count, end - start)
+            top = np.argpartition(view, view.shape[1] - kept, axis=1)[:, view.shape[1] - kept:]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(view, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > count:
+                top = np.argpartition(-best_scores, count - 1, axis=1)[:, :count]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1)
+
+    def search_batch(self, queries, k: int = 1) -> List[List[Tuple[str, float]]]:
+        with self._lock:
+            size = len(self._names)
+            if size == 0:
+                return []
+            queries = np.asarray(queries, dtype=np.float32)
+            if queries.ndim != 2 or queries.shape[1] != self.dim:
+                raise ValueError(f"Requêtes de forme invalide: {queries.shape}")
+            k = min(k, size)
+            rows = self._scan(queries, min(size, k * self.rerank))
+            candidates = [[self._names[j] for j in row] for row in rows]
+            if self.exact is None:
+                results = []
+                for query, row in zip(queries, rows[:, :k]):
+                    scales = self._scales[row] if self._scales is not None else None
+                    scores = dequantize(self._matrix[row], scales) @ query
+                    results.append([(self._names[j], float(score)) for j, score in zip(row, scores)])
+                return results
+
+            wanted = {name for names in candidates for name in names}
+            vectors = self._cached(wanted)
+            generation = self._generation
+
+        # Re-classement exact : les absents du cache sont lus hors du verrou (la source peut être la base)
+        absent = sorted(wanted - vectors.keys())
+        if absent:
+            fetched = self.exact(absent)
+            vectors.update(fetched)
+            self._remember(fetched, generation)
+        results = []
+        missing = 0
+        for query, names in zip(queries, candidates):
+            found = [name for name in names if name in vectors]
+            missing += len(names) - len(found)
+            if not found:
+                results.append([])
+                continue
+            exact = np.stack([vectors[name] for name in found]).astype(np.float32, copy=False)
+            scores = exact @ query
+            results.append([(found[i], float(scores[i])) for i in np.argsort(-scores, kind="stable")[:k]])
+        with self._lock:
+            self.reranked += sum(len(names) for names in candidates)
+            self.missing += missing
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._names)
+            used = size * (self.dim or 0) * self._matrix.itemsize if self._matrix is not None else 0
+            if self._scales is not None:
+                used += size * self._scales.itemsize
+            return {
+                'precision': self.precision,
+                'persons': size,
+                'bytes': used,
+                'float32_bytes': size * (self.dim or 0) * 4,
+                'rerank': self.rerank,
+                'reranked': self.reranked,
+                'missing': self.missing,
+                'cache_size': self.cache_size,
+                'cached': len(self._exact_cache),
+                'cache_hits': self.cache_hits,
+            }
+
+    def _cached(self, names: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Descripteurs exacts déjà en cache (à appeler sous le verrou)"""
+        found = {}
+        for name in names:
+            vector = self._exact_cache.get(name)
+            if vector is not None:
+                self._exact_cache.move_to_end(name)
+                found[name] = vector
+        self.cache_hits += len(found)
+        return found
+
+    def _remember(self, vectors: Dict[str, np.ndarray], generation: int):
+        """Met en cache des descripteurs lus par `exact`, sauf si la galerie a changé depuis"""
+        if not self.cache_size:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            for name, vector in vectors.items():
+                if name in self._rows:
+                    self._exact_cache[name] = np.asarray(vector, dtype=np.float32)
+                    self._exact_cache.move_to_end(name)
+            while len(self._exact_cache) > self.cache_size:
+                self._exact_cache.popitem(last=False)
@@ -0,0 +1,60 @@
+# lazy.py - Instances créées au premier accès (une seule fois, même entre threads)
+import asyncio
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Singleton paresseux : `factory` n'est appelée qu'au premier get()
+    Les appels concurrents attendent la même création ; en cas d'erreur,
+    le prochain get() réessaie. `seconds` = durée de la création.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str):
+        self.factory = factory
+        self.name = name
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def peek(self) -> Optional[T]:
+        """Instance si déjà créée, sans la créer"""
+        return self._instance
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                try:
+                    self._instance = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.error = None
+                self.seconds = time.perf_counter() - start
+            return self._instance
+
+    async def aget(self) -> T:
+        """get() sans bloquer la boucle d'événements pendant la création"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get)
+
+    def reset(self) -> Optional[T]:
+        """Oublie l'instance (arrêt) et la retourne pour fermeture"""
+        with self._lock:
+            instance, self._instance = self._instance, None
+            return instance
@@ -0,0 +1,130 @@
+# live_session.py - Session de reconnaissance continue sur WebSocket
+import asyncio
+import time
+from typing import Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from executor import ExecutorSaturated, RecognitionExecutor
+from video_stream import FaceTracker
+
+
+class LiveSession:
+    """
+    Une connexion WebSocket : images JPEG en entrée, résultats JSON en sortie
+    - au plus `max_in_flight` images en cours de traitement
+    - au-delà, seule la plus récente est gardée en attente (les autres sont jetées)
+    - un résultat plus ancien que le dernier appliqué est jeté (image périmée)
+    - pistes et dernière correspondance conservées pour toute la connexion
+    """
+
+    def __init__(self, websocket: WebSocket, executor: RecognitionExecutor,
+                 max_in_flight: int = 1, reid_below: float = 65.0,
+                 preset: Optional[str] = None, track_roi: bool = False,
+                 full_scan_every: int = 10):
+        self.websocket = websocket
+        self.executor = executor
+        self.max_in_flight = max(1, max_in_flight)
+        self.tracker = FaceTracker(executor.face_system, reid_below=reid_below)
+        # Détection : préréglage et zone d'intérêt autour des pistes précédentes
+        # (image entière toutes les `full_scan_every` images)
+        self.preset = preset
+        self.track_roi = track_roi
+        self.full_scan_every = max(1, full_scan_every)
+        # Zone d'intérêt calculée à la fin de chaque mise à jour des pistes (dans le
+        # thread du suivi) : la boucle ne lit jamais `tracker.tracks` pendant update
+        self._roi = None
+
+        self._tasks: Set[asyncio.Task] = set()
+        self._waiting: Optional[Tuple[int, bytes, float]] = None
+        self._applied = -1
+        self._tracker_lock = asyncio.Lock()
+        self.last_match: Optional[dict] = None
+
+        # Compteurs
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.stale = 0
+
+    async def run(self):
+        await self.websocket.accept()
+        try:
+            while True:
+                data = await self.websocket.receive_bytes()
+                self._submit((self.received, data, time.perf_counter()))
+                self.received += 1
+        except (WebSocketDisconnect, KeyError):
+            # KeyError : message texte au lieu d'une image binaire
+            pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _submit(self, frame: Tuple[int, bytes, float]):
+        if len(self._tasks) < self.max_in_flight:
+            task = asyncio.create_task(self._process(*frame))
+            self._tasks.add(task)
+            task.add_done_callback(self._on_done)
+        else:
+            # Le client envoie plus vite que le traitement : garder la plus récente
+            if self._waiting is not None:
+                self.dropped += 1
+            self._waiting = frame
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._waiting is not None and not task.cancelled():
+            frame, self._waiting = self._waiting, None
+            self._submit(frame)
+
+    async def _process(self, seq: int, data: bytes, received_at: float):
+        try:
+            roi = None
+            if self.track_roi and seq % self.full_scan_every != 0:
+                roi = self._roi
+            # Images d'un flux : presque jamais identiques, inutile de remplir le cache
+            faces = await self.executor.detect_all(data, preset=self.preset, roi=roi, use_cache=False)
+            
+            # Suivi et comparaison à la galerie hors de la boucle, une image à la fois
+            async with self._tracker_lock:
+                if seq < self._applied:
+                    self.stale += 1
+                    return
+                self._applied = seq
+                tracks = await asyncio.to_thread(self._update, faces, seq)
+        except ExecutorSaturated:
+            await self._send({"frame": seq, "error": "busy"})
+            return
+        except Exception as e:
+            # Une image en erreur ne ferme pas la connexion : le client est prévenu
+            print(f"❌ Erreur image {seq}: {e}")
+            await self._send({"frame": seq, "error": str(e)})
+            return
+
+        known = [t for t in tracks if t['name'] is not None]
+        if known:
+            self.last_match = max(known, key=lambda t: t['confidence'])
+        self.processed += 1
+
+        await self._send({
+            "frame": seq,
+            "faces": tracks,
+            "last_match": self.last_match,
+            "latency_ms": round((time.perf_counter() - received_at) * 1000, 1),
+            "dropped": self.dropped + self.stale,
+        })
+
+    def _update(self, faces, seq: int):
+        """Dans un thread, sous _tracker_lock : mise à jour des pistes puis de la zone d'intérêt"""
+        tracks = self.tracker.update(faces, seq)
+        if self.track_roi:
+            self._roi = self.tracker.roi_hint()
+        return tracks
+
+    async def _send(self, message: dict):
+        try:
+            await self.websocket.send_json(message)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
@@ -0,0 +1,125 @@
+# log_writer.py - Écriture asynchrone et groupée des logs
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from connection_manager import ConnectionManager
+from metrics import stage
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    File bornée vidée par un thread d'écriture
+    Les lignes sont groupées en une seule transaction toutes les
+    `flush_interval_ms` millisecondes ou tous les `batch_size` éléments.
+    Si la file est pleine, l'entrée est abandonnée (compteur `dropped`).
+    """
+
+    def __init__(self, db: ConnectionManager, max_queue: int = 10000,
+                 batch_size: int = 200, flush_interval_ms: int = 50):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Compteurs
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Démarre le thread d'écriture (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, action: str, person_name: str = None, confidence: float = 0) -> bool:
+        """Met une entrée en file sans attendre le disque"""
+        # Horodatage pris à la soumission (même format que CURRENT_TIMESTAMP)
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        try:
+            self._queue.put_nowait((action, person_name, confidence, timestamp))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.queued += 1
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        try:
+            with stage("log_commit"), self.db.transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO logs (action, person_name, confidence, timestamp) "
+                    "VALUES (?, ?, ?, ?)",
+                    batch
+                )
+            with self._lock:
+                self.written += len(batch)
+        except sqlite3.Error as e:
+            with self._lock:
+                self.failed += len(batch)
+            print(f"❌ Erreur écriture logs: {e}")
+
+    def flush(self):
+        """Attend que toutes les entrées en file soient écrites"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Vide la file puis arrête le thread d'écriture"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'pending': self._queue.qsize(),
+            }
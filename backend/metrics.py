@@ -0,0 +1,260 @@
+# metrics.py - Mesures par étape (histogrammes, compteurs) au format texte Prometheus
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Bornes des histogrammes de durée (secondes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Compteur croissant, éventuellement par étiquettes"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                    for labels, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Histogramme cumulatif (bornes fixes), éventuellement par étiquettes"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par étiquettes : [effectifs par borne (+ dépassement), somme, nombre]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2])
+                        for labels, series in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """Valeur(s) lue(s) à la demande : {étiquettes: valeur} ou un nombre"""
+
+    def __init__(self, name: str, help: str, kind: str, func: Callable,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.func = func
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.func()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in values.items() if value is not None]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Enregistre (ou remplace, pour les valeurs lues à la demande) une mesure"""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_func(self, name: str, help: str, func: Callable, labelnames: Sequence[str] = ()):
+        return self.register(CallbackMetric(name, help, "gauge", func, labelnames))
+
+    def counter_func(self, name: str, help: str, func: Callable, labelnames: Sequence[str] = ()):
+        return self.register(CallbackMetric(name, help, "counter", func, labelnames))
+
+    def render(self) -> str:
+        """Format texte d'exposition Prometheus (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "face_stage_seconds", "Durée de chaque étape du traitement", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "face_http_request_seconds", "Durée des requêtes HTTP", ("method", "route", "status"))
+FACES_DETECTED = REGISTRY.counter(
+    "face_faces_detected_total", "Visages détectés (cache compris)")
+RECOGNITIONS = REGISTRY.counter(
+    "face_recognitions_total", "Comparaisons à la galerie par résultat", ("result",))
+
+
+# --- Détail par requête -------------------------------------------------------
+
+class Trace:
+    """Durées cumulées par étape pour une requête (en-tête Server-Timing)"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def header(self, total: Optional[float] = None) -> str:
+        items = list(self.stages.items())
+        if total is not None:
+            items.append(("total", total))
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in items)
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("face_trace", default=None)
+
+
+def start_trace() -> Trace:
+    """Active le détail des étapes pour le contexte courant (requête)"""
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+def record(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Mesure la durée d'un bloc : histogramme + détail de la requête si activé"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed_call(func: Callable, *args) -> Tuple[object, Dict[str, float]]:
+    """
+    (résultat, durées par étape) : pour les processus du pool, dont les mesures
+    sont renvoyées au processus principal puis rejouées avec record_all
+    """
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        return func(*args), trace.stages
+    finally:
+        _trace.reset(token)
+
+
+def record_all(stages: Dict[str, float]):
+    for name, seconds in stages.items():
+        record(name, seconds)
+
+
+class TimingMiddleware:
+    """
+    Middleware ASGI : durée de chaque requête par route (histogramme)
+    et, si `headers` est vrai, détail des étapes dans l'en-tête Server-Timing
+    """
+
+    def __init__(self, app, headers: bool = False):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        trace = start_trace() if self.headers else None
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if trace is not None:
+                    header = trace.header(time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"],
+                                    getattr(route, "path", "unmatched"), str(status[0]))
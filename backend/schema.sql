@@ -5,6 +5,7 @@ CREATE TABLE IF NOT EXISTS [users] (
     username TEXT UNIQUE NOT NULL,
     email TEXT UNIQUE,
     password_hash TEXT NOT NULL,
+    threshold REAL,                  -- distance maximale propre (NULL : seuil commun)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -12,7 +13,8 @@ CREATE TABLE IF NOT EXISTS [users] (
 CREATE TABLE IF NOT EXISTS [face_encodings] (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
-    encoding TEXT NOT NULL,
+    encoding BLOB NOT NULL,          -- float32 little-endian brut
+    encoding_dtype TEXT NOT NULL DEFAULT 'json',
     image_path TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
@@ -26,5 +28,5 @@ CREATE TABLE IF NOT EXISTS [recognition_logs] (
     confidence REAL,
     image_path TEXT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY user_id REFERENCES users(id)
+    FOREIGN KEY (user_id) REFERENCES users(id)
 );
\ No newline at end of file
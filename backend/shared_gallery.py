@@ -0,0 +1,341 @@
+# shared_gallery.py - Galerie en fichier mappé en mémoire, partagée entre processus
+import os
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from gallery import FaceGallery
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+MAGIC = b"FGAL"
+FORMAT_VERSION = 1
+# magic, format, dim, (réservé), nombre de lignes, version du journal,
+# positions des offsets de noms, de l'ordre trié et des noms UTF-8
+HEADER = struct.Struct("<4sIIIQQQQQ")
+HEADER_SIZE = 64
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_snapshot(path: str, dim: int, chunks: Iterable[np.ndarray],
+                   names: List[str], version: int):
+    """
+    Écrit un instantané : en-tête, matrice float32, offsets, ordre trié des noms, noms UTF-8
+    Écriture dans un fichier temporaire puis os.replace (atomique : les lecteurs
+    gardent l'ancien fichier mappé tant qu'ils ne se rattachent pas)
+    """
+    count = len(names)
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    if count:
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    order = np.array(sorted(range(count), key=names.__getitem__), dtype=np.uint64)
+
+    offsets_off = _aligned(HEADER_SIZE + count * dim * 4)
+    order_off = _aligned(offsets_off + offsets.nbytes)
+    blob_off = _aligned(order_off + order.nbytes)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, dim, 0, count, version,
+                            offsets_off, order_off, blob_off).ljust(HEADER_SIZE, b"\0"))
+        written = 0
+        for chunk in chunks:
+            chunk = np.ascontiguousarray(chunk, dtype=np.float32)
+            f.write(chunk.tobytes())
+            written += len(chunk)
+        if written != count:
+            raise ValueError(f"Instantané incohérent: {written} lignes pour {count} noms")
+        for offset, data in ((offsets_off, offsets.tobytes()), (order_off, order.tobytes()),
+                             (blob_off, b"".join(encoded))):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_version(path: str) -> Optional[int]:
+    """Version du journal d'un instantané (lecture de l'en-tête seul)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, fmt, _, _, _, version, _, _, _ = HEADER.unpack(header)
+    return version if magic == MAGIC and fmt == FORMAT_VERSION else None
+
+
+class MappedGallery(FaceGallery):
+    """
+    Galerie dont les descripteurs vivent dans un fichier mappé en lecture seule :
+    tous les processus partagent les mêmes pages et s'y rattachent sans rien charger.
+    Les modifications depuis l'instantané restent dans une petite surcouche
+    privée (FaceGallery) + un masque de lignes supprimées (tombstones).
+    Au-delà de `compact_threshold` modifications, un nouvel instantané est écrit
+    (un seul processus à la fois) et les autres s'y rattachent.
+    """
+
+    def __init__(self, path: str, compact_threshold: int = 10000):
+        super().__init__()
+        self.path = path
+        self.compact_threshold = compact_threshold
+        # Version du journal (change_feed) reflétée par cette galerie
+        self.version = 0
+        self.attached_version: Optional[int] = None
+        # Pendant l'écriture d'une compaction (hors du verrou) : modifications
+        # notées (nom, descripteur ou None si supprimé) puis rejouées sur le nouvel instantané
+        self._recording: Optional[List[Tuple[str, Optional[np.ndarray]]]] = None
+        self._detach()
+
+    def _detach(self):
+        self._mm = None
+        self._base = np.empty((0, self.dim or 0), dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.uint64)
+        self._order = np.empty(0, dtype=np.uint64)
+        self._blob = np.empty(0, dtype=np.uint8)
+        self._tomb = np.zeros(0, dtype=bool)
+        self._tomb_count = 0
+        self._overlay = FaceGallery(dim=self.dim)
+
+    # --- Instantané -----------------------------------------------------------
+
+    def attach(self) -> Optional[int]:
+        """Mappe l'instantané sur disque ; retourne sa version (None si absent ou invalide)"""
+        try:
+            mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(mm) < HEADER_SIZE:
+            return None
+        magic, fmt, dim, _, count, version, offsets_off, order_off, blob_off = \
+            HEADER.unpack(bytes(mm[:HEADER.size]))
+        if magic != MAGIC or fmt != FORMAT_VERSION or (self.dim and count and dim != self.dim):
+            print(f"⚠️ Instantané de galerie invalide: {self.path}")
+            return None
+
+        with self._lock:
+            if count:
+                self.dim = dim
+            self._detach()
+            self._mm = mm
+            self._base = np.frombuffer(mm, dtype=np.float32, count=count * dim,
+                                       offset=HEADER_SIZE).reshape(count, dim)
+            self._offsets = np.frombuffer(mm, dtype=np.uint64, count=count + 1, offset=offsets_off)
+            self._order = np.frombuffer(mm, dtype=np.uint64, count=count, offset=order_off)
+            self._blob = np.frombuffer(mm, dtype=np.uint8, offset=blob_off)
+            self._tomb = np.zeros(count, dtype=bool)
+            self.version = self.attached_version = version
+            return version
+
+    def _base_name(self, row: int) -> str:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def _find(self, name: str) -> Optional[int]:
+        """Ligne d'un nom dans l'instantané (recherche dichotomique sur l'ordre trié)"""
+        lo, hi = 0, len(self._order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._base_name(int(self._order[mid])) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._order):
+            row = int(self._order[lo])
+            if self._base_name(row) == name:
+                return row
+        return None
+
+    def _live_base_row(self, name: str) -> Optional[int]:
+        row = self._find(name)
+        return row if row is not None and not self._tomb[row] else None
+
+    # --- Interface FaceGallery ------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._base) - self._tomb_count + len(self._overlay)
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._overlay or self._live_base_row(name) is not None
+
+    @property
+    def names(self) -> List[str]:
+        with self._lock:
+            live = np.flatnonzero(~self._tomb)
+            return [self._base_name(int(i)) for i in live] + self._overlay.names
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Copie des lignes vivantes (instantané + surcouche) : coûteux, pour diagnostic"""
+        with self._lock:
+            parts = [part for part in (self._base[~self._tomb], self._overlay.matrix) if len(part)]
+            return np.concatenate(parts) if parts else np.empty((0, self.dim or 0), dtype=np.float32)
+
+    def load(self, rows: Iterable[Tuple[str, object]], version: int = 0) -> int:
+        """Écrit un instantané complet à partir de couples (nom, descripteur) et s'y rattache"""
+        staging = FaceGallery(dim=self.dim)
+        count = staging.load(rows)
+        dim = staging.dim or self.dim or 0
+        with self._lock:
+            self.dim = dim or None
+            write_snapshot(self.path, dim, [staging.matrix], staging.names, version)
+            self.attach()
+        return count
+
+    def add(self, name: str, features) -> None:
+        with self._lock:
+            self._overlay.add(name, features)
+            self.dim = self._overlay.dim
+            if self._recording is not None:
+                self._recording.append((name, self._overlay.matrix[self._overlay._rows[name]].copy()))
+            row = self._live_base_row(name)
+            if row is not None:
+                self._tomb[row] = True
+                self._tomb_count += 1
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            if self._recording is not None:
+                self._recording.append((name, None))
+            removed = self._overlay.remove(name)
+            row = self._live_base_row(name)
+            if row is not None:
+                self._tomb[row] = True
+                self._tomb_count += 1
+                removed = True
+            return removed
+
+    def search_batch(self, queries, k: int = 1) -> List[List[Tuple[str, float]]]:
+        with self._lock:
+            if len(self) == 0:
+                return []
+            queries = np.asarray(queries, dtype=np.float32)
+            if queries.ndim != 2 or queries.shape[1] != self.dim:
+                raise ValueError(f"Requêtes de forme invalide: {queries.shape}")
+
+            results: List[List[Tuple[str, float]]] = [[] for _ in range(len(queries))]
+            live = len(self._base) - self._tomb_count
+            if live:
+                scores = queries @ self._base.T
+                if self._tomb_count:
+                    scores[:, self._tomb] = -np.inf
+                kk = min(k, live)
+                if kk == 1:
+                    best = np.argmax(scores, axis=1)[:, None]
+                else:
+                    top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+                    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+                    best = np.take_along_axis(top, order, axis=1)
+                for i, row in enumerate(best):
+                    results[i] = [(self._base_name(int(j)), float(scores[i, j])) for j in row]
+
+            if len(self._overlay):
+                for i, extra in enumerate(self._overlay.search_batch(queries, k)):
+                    results[i] = sorted(results[i] + extra, key=lambda item: -item[1])[:k]
+            return results
+
+    # --- Maintenance ----------------------------------------------------------
+
+    @property
+    def pending_changes(self) -> int:
+        return len(self._overlay) + self._tomb_count
+
+    def refresh(self, version: int) -> Optional[int]:
+        """
+        Appelé après chaque relecture du journal (`version` = version appliquée)
+        - un instantané plus récent écrit par un autre processus : rattachement
+          (retourne sa version, les deltas suivants seront rejoués)
+        - sinon, trop de modifications en surcouche : compaction
+        """
+        self.version = max(self.version, version)
+        disk_version = read_version(self.path)
+        if disk_version is not None and disk_version >= version and disk_version != self.attached_version:
+            if self.attach() is not None:
+                return disk_version
+        if self.pending_changes >= self.compact_threshold:
+            self.compact()
+        return None
+
+    def compact(self) -> bool:
+        """
+        Réécrit l'instantané (instantané vivant + surcouche) à la version courante
+        Sous le verrou : copie des tombstones et de la surcouche, puis rattachement au
+        nouveau fichier. L'écriture (et le fsync) se fait hors du verrou : les recherches
+        continuent sur l'ancien instantané, les modifications faites entre-temps sont rejouées.
+        """
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(self.path + ".lock", "w")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False  # un autre processus compacte déjà
+            with self._lock:
+                if self._recording is not None:
+                    return False  # compaction déjà en cours dans ce processus
+                disk_version = read_version(self.path)
+                if disk_version is not None and disk_version > self.version:
+                    return False  # plus récent sur disque : rattachement au prochain refresh
+                # L'instantané mappé est en lecture seule : une référence suffit
+                base = self._base
+                live = np.flatnonzero(~self._tomb)
+                names = [self._base_name(int(i)) for i in live] + self._overlay.names
+                overlay = self._overlay.matrix.copy()
+                dim = self.dim or 0
+                version = self.version
+                self._recording = []
+
+            def chunks():
+                for start in range(0, len(live), 65536):
+                    yield base[live[start:start + 65536]]
+                yield overlay
+
+            try:
+                write_snapshot(self.path, dim, chunks(), names, version)
+            except BaseException:
+                with self._lock:
+                    self._recording = None
+                raise
+
+            with self._lock:
+                replay, self._recording = self._recording, None
+                current = self.version
+                self.attach()
+                self.version = max(current, self.version)
+                for name, features in replay:
+                    if features is None:
+                        self.remove(name)
+                    else:
+                        self.add(name, features)
+            return True
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+    def save(self):
+        """Compaction à l'arrêt s'il reste des modifications en surcouche"""
+        if self.pending_changes:
+            self.compact()
+
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'snapshot_rows': len(self._base),
+            'snapshot_version': self.attached_version,
+            'overlay_rows': len(self._overlay),
+            'tombstones': self._tomb_count,
+            'version': self.version,
+        }
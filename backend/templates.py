@@ -0,0 +1,55 @@
+# templates.py - Agrégation de plusieurs empreintes par personne (centroïde + médoïdes)
+import numpy as np
+from typing import Tuple
+
+
+def similarity_matrix(templates: np.ndarray, metric: str = "cosine") -> np.ndarray:
+    """Similarités deux à deux (cosinus, ou opposé de la distance euclidienne)"""
+    if metric == "cosine":
+        return templates @ templates.T
+    if metric == "l2":
+        squared = np.einsum('ij,ij->i', templates, templates)
+        distances = squared[:, None] + squared[None, :] - 2 * templates @ templates.T
+        return -np.sqrt(np.maximum(distances, 0))
+    raise ValueError(f"Métrique inconnue: {metric}")
+
+
+def centroid(templates: np.ndarray, metric: str = "cosine") -> np.ndarray:
+    """Moyenne des empreintes (renormalisée pour le cosinus)"""
+    center = templates.mean(axis=0).astype(np.float32)
+    if metric == "cosine":
+        norm = np.linalg.norm(center)
+        if norm > 0:
+            center /= norm
+    return center
+
+
+def select_medoids(templates: np.ndarray, count: int, metric: str = "cosine") -> np.ndarray:
+    """
+    Indices de `count` empreintes représentatives (sélection gloutonne) :
+    le médoïde d'abord, puis celle qui améliore le plus la couverture des autres
+    """
+    size = len(templates)
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    if size <= count:
+        return np.arange(size)
+
+    similarities = similarity_matrix(templates, metric)
+    chosen = [int(np.argmax(similarities.sum(axis=1)))]
+    coverage = similarities[chosen[0]].copy()
+    while len(chosen) < count:
+        gains = np.maximum(similarities, coverage).sum(axis=1)
+        gains[chosen] = -np.inf
+        best = int(np.argmax(gains))
+        chosen.append(best)
+        np.maximum(coverage, similarities[best], out=coverage)
+    return np.sort(np.array(chosen))
+
+
+def aggregate(templates, medoids: int = 3, metric: str = "cosine") -> Tuple[np.ndarray, np.ndarray]:
+    """(centroïde, indices des médoïdes) d'un ensemble d'empreintes d'une même personne"""
+    templates = np.asarray(templates, dtype=np.float32)
+    if templates.ndim != 2 or len(templates) == 0:
+        raise ValueError(f"Empreintes de forme invalide: {templates.shape}")
+    return centroid(templates, metric), select_medoids(templates, medoids, metric)
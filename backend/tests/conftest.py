@@ -0,0 +1,27 @@
+# conftest.py - Les modules du backend sont importés à plat (comme avec uvicorn lancé depuis backend/)
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """FACE_DATA_DIR temporaire, sans relecture périodique du journal ni cache disque"""
+    directory = tmp_path / "data"
+    monkeypatch.setenv("FACE_DATA_DIR", str(directory))
+    monkeypatch.setenv("FACE_GALLERY_POLL_MS", "0")
+    monkeypatch.setenv("FACE_INDEX", "exact")
+    monkeypatch.delenv("FACE_CACHE_PATH", raising=False)
+    return directory
+
+
+@pytest.fixture
+def system(data_dir):
+    from face_system import UltraSimpleFaceSystem
+
+    face_system = UltraSimpleFaceSystem()
+    yield face_system
+    face_system.close()
@@ -0,0 +1,52 @@
+# test_batch_zip.py - Limites des archives zip de /recognize/batch (vérifiées avant décompression)
+import io
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+import api_final
+
+
+def make_zip(entries) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def no_reads(monkeypatch):
+    """Échoue si un membre de l'archive est décompressé"""
+    def read(self, *args, **kwargs):
+        raise AssertionError("membre lu avant la vérification des limites")
+    monkeypatch.setattr(zipfile.ZipFile, "read", read)
+
+
+def test_reads_images_in_archive_order_and_skips_other_files():
+    data = make_zip([("b.jpg", b"1"), ("notes.txt", b"x"), ("dir/a.PNG", b"22")])
+    assert api_final._read_zip(data, 10) == [("b.jpg", b"1"), ("dir/a.PNG", b"22")]
+
+
+def test_too_many_images_rejected_before_reading(no_reads):
+    data = make_zip([(f"{i}.jpg", b"x") for i in range(5)])
+    with pytest.raises(HTTPException) as error:
+        api_final._read_zip(data, 4)
+    assert error.value.status_code == 413
+
+
+def test_decompressed_size_limit_rejected_before_reading(monkeypatch, no_reads):
+    monkeypatch.setattr(api_final, "MAX_ZIP_BYTES", 1000)
+    # Très compressible : quelques octets dans l'archive, 1 Mo une fois décompressé
+    data = make_zip([("bomb.jpg", b"\0" * 2**20)])
+    assert len(data) < 5000
+    with pytest.raises(HTTPException) as error:
+        api_final._read_zip(data, 10)
+    assert error.value.status_code == 413
+
+
+def test_invalid_archive():
+    with pytest.raises(HTTPException) as error:
+        api_final._read_zip(b"not a zip", 10)
+    assert error.value.status_code == 400
@@ -0,0 +1,37 @@
+# test_bulk_enroll.py - Import en masse : les photos sources ne sont jamais modifiées ni supprimées
+import cv2
+import numpy as np
+
+from bulk_enroll import BulkImporter, read_manifest
+
+
+def fake_detect(system):
+    """Un « visage » par image : descripteur dérivé des pixels, sans détecteur"""
+    def detect_face(image, preset=None, roi=None, with_images=False, use_cache=True):
+        features = cv2.resize(image, (4, 4)).astype(np.float32).ravel()[:system.extractor.dim]
+        features = np.resize(features + 1, system.extractor.dim)
+        return {'features': features / np.linalg.norm(features), 'bbox': (0, 0, 8, 8),
+                'face_image': image[:8, :8].copy()}
+    return detect_face
+
+
+def test_import_then_delete_leaves_source_tree_untouched(system, tmp_path, monkeypatch):
+    source = tmp_path / "imp"
+    rng = np.random.default_rng(0)
+    for person in ("Alice", "Bob"):
+        (source / person).mkdir(parents=True)
+        for i in (1, 2):
+            cv2.imwrite(str(source / person / f"{i}.jpg"), rng.integers(0, 255, (32, 32, 3), np.uint8))
+    before = sorted(p.relative_to(source) for p in source.rglob("*"))
+    monkeypatch.setattr(system, "detect_face", fake_detect(system))
+
+    report = BulkImporter(system, "job", workers=0).run(read_manifest(str(source)))
+    assert report['enrolled'] == 2 and report['templates'] == 4
+    assert len(list(system.registered_faces_dir.glob("Alice*.jpg"))) == 2
+
+    success, _ = system.delete_person("Alice")
+    assert success
+    assert sorted(p.relative_to(source) for p in source.rglob("*")) == before
+    # Les visages découpés (fichiers du système) sont bien supprimés
+    assert not list(system.registered_faces_dir.glob("Alice*.jpg"))
+    assert len(list(system.registered_faces_dir.glob("Bob*.jpg"))) == 2
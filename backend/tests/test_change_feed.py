@@ -0,0 +1,87 @@
+# test_change_feed.py - Journal encoding_changes (database.py) relu par un autre processus (GallerySync)
+import numpy as np
+import pytest
+
+import change_feed
+import database
+from change_feed import GallerySync
+from connection_manager import ConnectionManager
+from face_service import FaceRecognitionService
+
+DIM = 128
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Base face_service temporaire, schéma appliqué au premier accès"""
+    path = str(tmp_path / "service.db")
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    monkeypatch.setattr(database, "_initialized", False)
+    monkeypatch.setenv("FACE_GALLERY_POLL_MS", "0")
+    database.init_database()
+    return path
+
+
+@pytest.fixture
+def reader(db_path):
+    """Service d'un autre processus : sa propre connexion à la même base"""
+    service = FaceRecognitionService(detector="haar")
+    sync = GallerySync(
+        ConnectionManager(db_path), apply=service._apply_changes,
+        reload=service.load_known_faces, version=service.sync.version,
+        table=database.CHANGES_TABLE, interval=0
+    )
+    return service, sync
+
+
+def encoding(seed: int) -> list:
+    return list(np.random.default_rng(seed).normal(0, 0.1, DIM))
+
+
+def enroll(username: str, *seeds: int) -> int:
+    user_id = database.add_user(username, f"{username}@example.com", "x")
+    for seed in seeds:
+        database.add_face_encoding(user_id, encoding(seed))
+    return user_id
+
+
+def test_catch_up_applies_pending_changes(reader):
+    service, sync = reader
+    enroll("alice", 1, 2)
+    enroll("bob", 3)
+    assert len(service.gallery) == 0
+
+    assert sync.poll() == 3
+    assert sorted(service.known_names) == ["alice", "bob"]
+    assert "alice" in service.known_templates
+    assert sync.stats()['behind'] == 0 and sync.full_reloads == 0
+    assert sync.poll() == 0
+
+
+def test_threshold_and_delete_propagate(reader):
+    service, sync = reader
+    alice = enroll("alice", 1)
+    enroll("bob", 2)
+    sync.poll()
+
+    assert database.set_user_threshold("alice", 0.3)
+    sync.poll()
+    assert service.gallery.threshold("alice", 0.6) == pytest.approx(0.3)
+
+    assert database.delete_user(alice)
+    sync.poll()
+    assert service.known_names == ["bob"]
+    assert service.gallery.threshold("alice", 0.6) == 0.6
+
+
+def test_pruned_log_falls_back_to_reload(reader, monkeypatch):
+    service, sync = reader
+    monkeypatch.setattr(change_feed, "RETENTION", 2)
+    enroll("alice", 1)
+    enroll("bob", 2)
+    enroll("carol", 3)
+    # Version 1 purgée : les deltas restants ne suffisent plus
+    assert sync.poll() == 2
+    assert sync.full_reloads == 1
+    assert sorted(service.known_names) == ["alice", "bob", "carol"]
+    assert sync.version == database.get_encodings_version()
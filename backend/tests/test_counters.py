@@ -0,0 +1,68 @@
+# test_counters.py - Compteurs tenus par triggers et pagination par curseur de list_persons
+import numpy as np
+
+
+def face(system, seed: int) -> dict:
+    """Résultat de detect_face(with_images=True) synthétique"""
+    features = np.random.default_rng(seed).normal(size=system.extractor.dim).astype(np.float32)
+    return {'features': features / np.linalg.norm(features), 'bbox': (0, 0, 8, 8),
+            'face_image': np.zeros((8, 8, 3), dtype=np.uint8)}
+
+
+def scanned(system) -> tuple:
+    """Mêmes valeurs recalculées en parcourant les tables"""
+    with system.db.connection() as conn:
+        counts = {'persons': conn.execute("SELECT COUNT(*) FROM persons").fetchone()[0]}
+        for action, count in conn.execute("SELECT action, COUNT(*) FROM logs GROUP BY action"):
+            counts[f"logs:{action}"] = count
+        recognitions = dict(conn.execute("""
+            SELECT p.name, COUNT(l.id) FROM persons p
+            LEFT JOIN logs l ON l.person_name = p.name AND l.action = 'RECOGNIZE'
+            GROUP BY p.name
+        """).fetchall())
+    return counts, recognitions
+
+
+def maintained(system) -> tuple:
+    counters = {name: value for name, value in system._counters().items() if value}
+    return counters, {p['name']: p['recognition_count'] for p in system.list_persons()}
+
+
+def test_counters_follow_register_add_template_and_delete(system):
+    for seed, name in enumerate(["alice", "bob", "carol"]):
+        assert system.enroll_face(name, face(system, seed))[0]
+    assert system.add_template("alice", face(system, 10))[0]
+    assert not system.enroll_face("bob", face(system, 11))[0]  # déjà inscrit : rien de compté
+    for name in ("alice", "alice", "bob", None):
+        system._log_action("RECOGNIZE" if name else "UNKNOWN", name, 80)
+    system.log_writer.flush()
+    assert maintained(system) == scanned(system)
+    assert system.get_stats()['persons'] == 3 and system.get_stats()['recognitions'] == 3
+
+    assert system.delete_person("alice")[0]
+    system.log_writer.flush()
+    assert maintained(system) == scanned(system)
+    stats = system.get_stats()
+    assert stats['persons'] == system.count_persons() == 2
+    assert stats['recognitions'] == 1 and stats['unknown_faces'] == 1
+
+
+def test_pagination_without_duplicates_or_gaps_when_rows_are_deleted(system):
+    names = [f"p{i:02d}" for i in range(10)]
+    for seed, name in enumerate(names):
+        system.enroll_face(name, face(system, seed))
+
+    seen, after = [], None
+    while True:
+        page = system.list_persons(limit=3, after=after)
+        if not page:
+            break
+        seen.extend(p['name'] for p in page)
+        after = page[-1]['name']
+        if after == "p02":
+            # Suppressions entre deux pages : le curseur lui-même et une ligne plus loin
+            system.delete_person("p02")
+            system.delete_person("p05")
+
+    assert seen == sorted(set(seen))
+    assert seen == [name for name in names if name != "p05"]
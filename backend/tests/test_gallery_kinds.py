@@ -0,0 +1,58 @@
+# test_gallery_kinds.py - search_topk / accepts identiques à search_batch pour chaque type de galerie
+import numpy as np
+import pytest
+
+from ann_index import IVFGallery, create_gallery
+
+DIM = 16
+KINDS = ["exact", "int8", "float16", "ivf", "mmap"]
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(300, DIM)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return {f"p{i}": row for i, row in enumerate(data)}
+
+
+@pytest.fixture(params=KINDS)
+def gallery(request, vectors, tmp_path):
+    def exact(names):
+        return {name: vectors[name] for name in names if name in vectors}
+    gallery = create_gallery(request.param, mapped_path=str(tmp_path / "gallery.snap"), exact=exact)
+    if isinstance(gallery, IVFGallery):
+        gallery.min_train_size = 100
+    gallery.load(vectors.items())
+    if isinstance(gallery, IVFGallery):
+        assert gallery.trained
+    return gallery
+
+
+def test_search_topk_matches_search_batch(gallery, vectors):
+    queries = np.stack([vectors["p3"], vectors["p42"], vectors["p250"]])
+    names, scores = gallery.search_topk(queries, k=3)
+    expected = gallery.search_batch(queries, k=3)
+
+    assert scores.shape == (3, 3)
+    assert [row[0] for row in names] == ["p3", "p42", "p250"]
+    assert scores[:, 0] == pytest.approx(1.0, abs=1e-2)
+    for row_names, row_scores, row in zip(names, scores, expected):
+        assert row_names == [name for name, _ in row]
+        assert row_scores == pytest.approx([score for _, score in row])
+
+
+def test_accepts_uses_search_topk_scores(gallery, vectors):
+    gallery.set_threshold("p3", 1.5)
+    names, scores = gallery.search_topk(vectors["p3"], k=1)
+    assert names == [["p3"]]
+    assert not gallery.accepts(names, scores, 0.5)[0, 0]
+    gallery.set_threshold("p3", None)
+    assert gallery.accepts(names, scores, 0.5)[0, 0]
+
+
+def test_empty_gallery(tmp_path):
+    for kind in KINDS:
+        gallery = create_gallery(kind, mapped_path=str(tmp_path / f"{kind}.snap"))
+        names, scores = gallery.search_topk(np.ones((2, DIM), dtype=np.float32), k=3)
+        assert names == [[], []] and scores.shape == (2, 0)
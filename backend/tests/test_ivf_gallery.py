@@ -0,0 +1,99 @@
+# test_ivf_gallery.py - IVFGallery : entraînement en arrière-plan et sauvegardes périodiques
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import ann_index
+from ann_index import IVFGallery
+
+DIM = 16
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(400, DIM)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def slow_kmeans(monkeypatch):
+    """k-means bloqué jusqu'à `release.set()`"""
+    release = threading.Event()
+    kmeans = ann_index.spherical_kmeans
+
+    def blocked(*args, **kwargs):
+        release.wait(5)
+        return kmeans(*args, **kwargs)
+    monkeypatch.setattr(ann_index, "spherical_kmeans", blocked)
+    return release
+
+
+def test_add_trains_in_background_and_keeps_exact_search(vectors, slow_kmeans, tmp_path):
+    path = str(tmp_path / "index.npz")
+    gallery = IVFGallery(nlist=8, nprobe=8, min_train_size=100, index_path=path)
+    for i, row in enumerate(vectors[:150]):
+        gallery.add(f"p{i}", row)
+    # Entraînement en cours : les ajouts et la recherche (exacte) ne l'attendent pas
+    assert not gallery.trained
+    assert gallery.search(vectors[120], k=1)[0][0] == "p120"
+
+    slow_kmeans.set()
+    assert gallery.wait_trained(5)
+    # Lignes ajoutées pendant l'entraînement affectées à une liste
+    assert sum(len(members) for members in gallery._members) == 150
+    assert gallery.search(vectors[149], k=1)[0][0] == "p149"
+    assert os.path.exists(path)
+
+
+def test_reload_during_training_discards_stale_centroids(vectors, slow_kmeans):
+    gallery = IVFGallery(nlist=8, min_train_size=100)
+    for i, row in enumerate(vectors[:100]):
+        gallery.add(f"p{i}", row)
+    trainer = gallery._trainer
+    gallery.load((f"q{i}", row) for i, row in enumerate(vectors[:10]))
+    slow_kmeans.set()
+    trainer.join(5)
+    assert not gallery.trained and len(gallery) == 10
+
+
+def test_index_saved_every_n_changes(vectors, tmp_path):
+    path = str(tmp_path / "index.npz")
+    gallery = IVFGallery(nlist=8, min_train_size=100, index_path=path, save_every=50)
+    gallery.load((f"p{i}", row) for i, row in enumerate(vectors[:100]))
+    assert gallery.trained
+    first = os.path.getmtime(path)
+    os.utime(path, (first - 10, first - 10))
+
+    for i, row in enumerate(vectors[100:149], start=100):
+        gallery.add(f"p{i}", row)
+    assert os.path.getmtime(path) == first - 10
+    gallery.add("p149", vectors[149])
+    for thread in threading.enumerate():
+        if thread.name == "ivf-save":
+            thread.join(5)
+    with np.load(path) as saved:
+        assert len(saved["names"]) == 150
+
+
+def test_periodic_saves_never_pile_up(vectors, tmp_path, monkeypatch):
+    gallery = IVFGallery(nlist=8, min_train_size=100, index_path=str(tmp_path / "index.npz"), save_every=10)
+    gallery.load((f"p{i}", row) for i, row in enumerate(vectors[:100]))
+    release, calls = threading.Event(), []
+
+    def slow_save():
+        calls.append(1)
+        release.wait(5)
+    monkeypatch.setattr(gallery, "save", slow_save)
+
+    # 20 sauvegardes déclenchées pendant que la première écrit encore
+    for i, row in enumerate(vectors[100:300], start=100):
+        gallery.add(f"p{i}", row)
+    assert [t.name for t in threading.enumerate()].count("ivf-save") == 1
+    saver = gallery._saver
+    release.set()
+    saver.join(5)
+    # La sauvegarde en cours, puis une seule pour toutes celles demandées entre-temps
+    assert len(calls) == 2 and gallery._saver is None
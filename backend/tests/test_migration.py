@@ -0,0 +1,108 @@
+# test_migration.py - Ouverture d'une base au schéma d'origine (descripteurs JSON, sans compteurs)
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from face_system import UltraSimpleFaceSystem
+from feature_store import FEATURE_DTYPE, decode_features, migrate_to_blob
+
+DIM = 16
+
+
+def baseline_db(path, persons, logs):
+    """Schéma de la première version : features en JSON, pas de templates ni de compteurs"""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE persons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        features TEXT NOT NULL,
+        image_path TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT,
+        person_name TEXT,
+        confidence REAL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.executemany("INSERT INTO persons (name, features, image_path) VALUES (?, ?, ?)",
+                     [(name, json.dumps(vector.tolist()), f"{name}.jpg") for name, vector in persons.items()])
+    conn.executemany("INSERT INTO logs (action, person_name, confidence) VALUES (?, ?, ?)", logs)
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def persons():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(3, DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return dict(zip(["alice", "bob", "carol"], vectors))
+
+
+def test_baseline_database_is_migrated(data_dir, persons):
+    data_dir.mkdir()
+    logs = [("REGISTER", "alice", 100), ("RECOGNIZE", "alice", 90), ("RECOGNIZE", "alice", 80),
+            ("RECOGNIZE", "bob", 70), ("UNKNOWN", None, 0)]
+    baseline_db(str(data_dir / "face_system.db"), persons, logs)
+
+    system = UltraSimpleFaceSystem()
+    try:
+        with system.db.connection() as conn:
+            rows = conn.execute("SELECT name, features, features_dtype FROM persons").fetchall()
+            templates = conn.execute(
+                "SELECT p.name, t.features, t.features_dtype, t.is_medoid, t.image_path "
+                "FROM templates t JOIN persons p ON p.id = t.person_id"
+            ).fetchall()
+
+        # Descripteurs convertis en BLOB float32, valeurs conservées
+        assert {dtype for _, _, dtype in rows} == {FEATURE_DTYPE}
+        for name, features, dtype in rows:
+            np.testing.assert_allclose(decode_features(features, dtype), persons[name], rtol=1e-6)
+        assert sorted(system.gallery.names) == sorted(persons)
+        assert system.gallery.search(persons["bob"], k=1)[0][0] == "bob"
+
+        # Compteurs initialisés à partir des tables existantes
+        stats = system.get_stats()
+        assert stats['persons'] == 3 and stats['recognitions'] == 3 and stats['unknown_faces'] == 1
+        counts = {p['name']: p['recognition_count'] for p in system.list_persons()}
+        assert counts == {"alice": 2, "bob": 1, "carol": 0}
+
+        # Descripteur d'origine repris comme première empreinte (médoïde) de chaque personne
+        assert len(templates) == 3
+        for name, features, dtype, is_medoid, image_path in templates:
+            np.testing.assert_allclose(decode_features(features, dtype), persons[name], atol=1e-2)
+            assert is_medoid == 1 and image_path == f"{name}.jpg"
+    finally:
+        system.close()
+
+    # Réouverture : rien n'est converti ni compté deux fois
+    system = UltraSimpleFaceSystem()
+    try:
+        assert system.get_stats()['persons'] == 3
+        with system.db.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0] == 3
+    finally:
+        system.close()
+
+
+def test_migrate_to_blob_skips_unreadable_rows():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (v) VALUES (?)", [("[1.0, 2.0]",), ("pas du json",)])
+    conn.commit()
+
+    assert migrate_to_blob(conn, "t", "v", "v_dtype") == 1
+    conn.commit()
+    rows = conn.execute("SELECT v, v_dtype FROM t ORDER BY id").fetchall()
+    np.testing.assert_array_equal(decode_features(*rows[0]), [1.0, 2.0])
+    assert rows[1] == ("pas du json", "json")
+    # Idempotent : la ligne illisible reste en JSON, rien d'autre à convertir
+    assert migrate_to_blob(conn, "t", "v", "v_dtype") == 0
@@ -0,0 +1,90 @@
+# test_quantized_gallery.py - Re-classement exact de QuantizedGallery : LRU des descripteurs float32
+import numpy as np
+import pytest
+
+from gallery import QuantizedGallery
+
+DIM = 16
+
+
+class Source:
+    """Descripteurs exacts (la base) ; compte les noms lus"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    def __call__(self, names):
+        self.calls.append(list(names))
+        return {name: self.vectors[name] for name in names if name in self.vectors}
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return {f"p{i}": row for i, row in enumerate(vectors)}
+
+
+def gallery_for(data, cache_size=4096, rerank=2):
+    source = Source(dict(data))
+    gallery = QuantizedGallery("int8", exact=source, rerank=rerank, cache_size=cache_size)
+    gallery.load(data.items())
+    return gallery, source
+
+
+def test_repeated_search_is_served_from_cache(data):
+    gallery, source = gallery_for(data)
+    first = gallery.search_batch(data["p3"][None, :], k=3)
+    second = gallery.search_batch(data["p3"][None, :], k=3)
+    assert first == second and first[0][0][0] == "p3"
+    assert len(source.calls) == 1
+    assert gallery.stats()['cache_hits'] == 6
+
+
+def test_add_updates_cached_vector_and_remove_drops_it(data):
+    gallery, source = gallery_for(data)
+    gallery.search_batch(data["p3"][None, :], k=1)
+    moved = -data["p3"]
+    source.vectors["p3"] = moved
+    gallery.add("p3", moved)
+    # Valeur exacte reprise de add, sans relire la source
+    assert gallery.search_batch(moved[None, :], k=1)[0][0] == ("p3", pytest.approx(1.0))
+    calls = len(source.calls)
+    gallery.remove("p3")
+    assert "p3" not in gallery._exact_cache
+    assert all(name != "p3" for name, _ in gallery.search_batch(moved[None, :], k=3)[0])
+    assert len(source.calls) == calls + 1
+
+
+def test_cache_is_bounded(data):
+    gallery, source = gallery_for(data, cache_size=5)
+    for name in list(data)[:10]:
+        gallery.search_batch(data[name][None, :], k=2)
+    assert gallery.stats()['cached'] == 5
+
+
+def test_cache_disabled(data):
+    gallery, source = gallery_for(data, cache_size=0)
+    gallery.search_batch(data["p1"][None, :], k=1)
+    gallery.search_batch(data["p1"][None, :], k=1)
+    assert len(source.calls) == 2 and gallery.stats()['cached'] == 0
+
+
+def test_batch_reads_all_missing_candidates_at_once(data):
+    gallery, source = gallery_for(data, cache_size=0)
+    queries = np.stack([data[name] for name in ("p1", "p7", "p20", "p33")])
+    results = gallery.search_batch(queries, k=2)
+    assert [row[0][0] for row in results] == ["p1", "p7", "p20", "p33"]
+    assert len(source.calls) == 1
+
+
+def test_scan_over_several_windows_matches_exact(data, monkeypatch):
+    import gallery as gallery_module
+    monkeypatch.setattr(gallery_module, "_SCAN_CHUNK", 4)
+    monkeypatch.setattr(gallery_module, "_SCAN_WINDOW", 24)
+    gallery, _ = gallery_for(data, rerank=1)
+    queries = np.stack([data["p0"], data["p49"], -data["p10"]])
+    expected = [sorted(data, key=lambda name: -float(data[name] @ query))[:3] for query in queries]
+    assert [[name for name, _ in row] for row in gallery.search_batch(queries, k=3)] == expected
@@ -0,0 +1,112 @@
+# test_shared_gallery.py - MappedGallery : instantané mappé, surcouche, compaction, rattachement
+import threading
+
+import numpy as np
+import pytest
+
+import shared_gallery
+from shared_gallery import MappedGallery, read_version, write_snapshot
+
+DIM = 8
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(20, DIM)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return {f"p{i}": row for i, row in enumerate(data)}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "gallery.snap")
+
+
+def best(gallery, vector):
+    return gallery.search_batch(vector[None, :], k=1)[0][0][0]
+
+
+def test_snapshot_write_and_attach(vectors, path):
+    names = list(vectors)
+    write_snapshot(path, DIM, [np.stack([vectors[n] for n in names])], names, version=7)
+    assert read_version(path) == 7
+
+    gallery = MappedGallery(path)
+    assert gallery.attach() == 7
+    assert len(gallery) == 20 and gallery.names == names
+    assert "p5" in gallery and "absent" not in gallery
+    assert best(gallery, vectors["p5"]) == "p5"
+
+
+def test_overlay_and_tombstones(vectors, path):
+    gallery = MappedGallery(path)
+    gallery.load(vectors.items(), version=1)
+    moved = -vectors["p3"]
+    gallery.add("p3", moved)
+    gallery.add("new", vectors["p4"] * -1)
+    assert gallery.remove("p0") and not gallery.remove("absent")
+
+    assert len(gallery) == 20 and gallery.pending_changes == 4
+    assert "p0" not in gallery and "new" in gallery
+    # Ligne remplacée : seule la valeur de la surcouche est retournée
+    assert gallery.search_batch(moved[None, :], k=1)[0][0] == ("p3", pytest.approx(1.0))
+    assert all(name != "p0" for name, _ in gallery.search_batch(vectors["p0"][None, :], k=20)[0])
+
+
+def test_compaction_folds_overlay_into_snapshot(vectors, path):
+    gallery = MappedGallery(path)
+    gallery.load(vectors.items(), version=1)
+    gallery.remove("p0")
+    gallery.add("new", -vectors["p1"])
+    gallery.version = 5
+
+    assert gallery.compact()
+    assert read_version(path) == 5 and gallery.attached_version == 5
+    assert gallery.pending_changes == 0 and len(gallery) == 20
+    assert "p0" not in gallery and best(gallery, -vectors["p1"]) == "new"
+
+
+def test_compaction_writes_outside_lock_and_replays_changes(vectors, path, monkeypatch):
+    gallery = MappedGallery(path)
+    gallery.load(vectors.items(), version=1)
+    gallery.remove("p0")
+    write = shared_gallery.write_snapshot
+
+    def concurrent_write(*args, **kwargs):
+        # Un autre thread modifie et interroge la galerie pendant l'écriture
+        def other():
+            gallery.add("late", -vectors["p2"])
+            gallery.remove("p1")
+            assert best(gallery, vectors["p3"]) == "p3"
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive(), "verrou de la galerie tenu pendant l'écriture"
+        write(*args, **kwargs)
+    monkeypatch.setattr(shared_gallery, "write_snapshot", concurrent_write)
+
+    assert gallery.compact()
+    # Instantané sans les modifications concurrentes, rejouées en surcouche
+    assert len(gallery._base) == 19 and gallery.pending_changes == 2
+    assert "late" in gallery and "p1" not in gallery and "p0" not in gallery
+    assert best(gallery, -vectors["p2"]) == "late"
+
+
+def test_second_instance_reattaches_after_refresh(vectors, path):
+    writer = MappedGallery(path)
+    writer.load(vectors.items(), version=1)
+    reader = MappedGallery(path)
+    reader.attach()
+
+    writer.add("new", -vectors["p1"])
+    writer.remove("p0")
+    writer.version = 2
+    assert writer.compact()
+
+    # Le lecteur a appliqué le journal jusqu'à 2 : il se rattache au nouvel instantané
+    assert reader.refresh(2) == 2
+    assert reader.attached_version == 2 and reader.pending_changes == 0
+    assert "p0" not in reader and best(reader, -vectors["p1"]) == "new"
+    # Déjà rattaché : rien à faire
+    assert reader.refresh(2) is None
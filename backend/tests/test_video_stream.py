@@ -0,0 +1,144 @@
+# test_video_stream.py - IoU, pistes (création, suivi, expiration, stabilité des noms), détection toutes les K images
+import cv2
+import numpy as np
+import pytest
+
+from video_stream import FaceTracker, VideoRecognizer, iou
+
+SIZE = (160, 120)
+SQUARE = 30
+
+
+class StubSystem:
+    """
+    Remplace UltraSimpleFaceSystem : les « visages » sont les carrés blancs de l'image,
+    les noms viennent d'une liste scriptée (un par visage comparé)
+    """
+
+    def __init__(self, matches=None):
+        self.matches = list(matches or [])
+        self.detect_calls = 0
+        self.matched = 0
+
+    def detect_faces(self, frame, preset=None, roi=None):
+        self.detect_calls += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = sorted(cv2.boundingRect(c) for c in contours)
+        return [{'bbox': box, 'features': np.zeros(4, np.float32)} for box in boxes]
+
+    def match_faces(self, faces):
+        results = []
+        for _ in faces:
+            results.append(self.matches.pop(0) if self.matches else ("inconnu", 0.0))
+            self.matched += 1
+        return results
+
+
+def face(x, y, w=SQUARE, h=SQUARE):
+    return {'bbox': (x, y, w, h), 'features': np.zeros(4, np.float32)}
+
+
+@pytest.fixture
+def clip(tmp_path):
+    """20 images : un carré blanc qui avance de 2 px par image"""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, SIZE)
+    if not writer.isOpened():
+        pytest.skip("Encodeur MJPG indisponible")
+    for i in range(20):
+        frame = np.zeros((SIZE[1], SIZE[0], 3), np.uint8)
+        cv2.rectangle(frame, (10 + 2 * i, 40), (10 + 2 * i + SQUARE - 1, 40 + SQUARE - 1), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+# --- iou ------------------------------------------------------------------------
+
+def test_iou_identical_disjoint_and_partial():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    # Moitié décalée : intersection 50, union 150
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(1 / 3)
+
+
+def test_iou_touching_and_empty_boxes():
+    assert iou((0, 0, 10, 10), (10, 0, 10, 10)) == 0.0
+    assert iou((0, 0, 0, 0), (0, 0, 0, 0)) == 0.0
+
+
+# --- FaceTracker ------------------------------------------------------------------
+
+def test_tracker_creates_one_track_per_face():
+    system = StubSystem([("alice", 90.0), ("bob", 80.0)])
+    tracker = FaceTracker(system)
+    tracks = tracker.update([face(0, 0), face(100, 0)], 0)
+    assert [t['track_id'] for t in tracks] == [1, 2]
+    assert [t['name'] for t in tracks] == ["alice", "bob"]
+
+
+def test_tracker_update_keeps_track_and_predicts_motion():
+    tracker = FaceTracker(StubSystem([("alice", 90.0)]))
+    tracker.update([face(10, 10)], 0)
+    tracks = tracker.update([face(14, 10)], 2)
+    assert len(tracks) == 1 and tracks[0]['track_id'] == 1
+    assert tracker.tracks[1].velocity == (2.0, 0.0)
+    # Image intermédiaire : la boîte avance à vitesse constante
+    assert tracker.predict()[0]['bbox'] == (16, 10, SQUARE, SQUARE)
+
+
+def test_tracker_expires_tracks_not_seen_for_max_age():
+    tracker = FaceTracker(StubSystem(), max_age=3)
+    tracker.update([face(0, 0)], 0)
+    tracker.update([face(100, 80)], 3)
+    assert set(tracker.tracks) == {1, 2}
+    tracker.update([face(100, 80)], 4)
+    assert set(tracker.tracks) == {2}
+
+
+def test_confident_label_is_not_reidentified():
+    system = StubSystem([("alice", 90.0), ("bob", 95.0)])
+    tracker = FaceTracker(system, reid_below=65.0)
+    tracker.update([face(10, 10)], 0)
+    for frame_index in (5, 10, 15):
+        tracks = tracker.update([face(10 + frame_index // 5, 10)], frame_index)
+        assert tracks[0]['name'] == "alice"
+    assert system.matched == 1 and tracker.reidentifications == 1
+
+
+def test_uncertain_label_is_reidentified_until_confident():
+    system = StubSystem([(None, 40.0), ("alice", 50.0), ("alice", 85.0), ("bob", 99.0)])
+    tracker = FaceTracker(system, reid_below=65.0)
+    names = [tracker.update([face(10, 10)], i)[0]['name'] for i in range(5)]
+    assert names == [None, "alice", "alice", "alice", "alice"]
+    assert system.matched == 3
+
+
+# --- VideoRecognizer ----------------------------------------------------------------
+
+@pytest.mark.parametrize("every", [1, 5, 7])
+def test_detects_every_k_frames_on_a_video_file(clip, every):
+    system = StubSystem([("alice", 90.0)])
+    recognizer = VideoRecognizer(system, clip, detect_every=every, drop_frames=False)
+    seen = []
+    report = recognizer.run(on_result=lambda index, tracks: seen.append((index, tracks)))
+
+    expected = len(range(0, 20, every))
+    assert report['frames_processed'] == 20 and report['frames_dropped'] == 0
+    assert report['detections'] == expected and system.detect_calls == expected
+    # Une seule piste, identifiée une seule fois et suivie sur tout le clip
+    assert system.matched == 1
+    assert all([t['track_id'] for t in tracks] == [1] for _, tracks in seen)
+    assert all(tracks[0]['name'] == "alice" for _, tracks in seen)
+    # Entre deux détections, la prédiction suit le carré (2 px par image)
+    last_index, last_tracks = seen[-1]
+    assert abs(last_tracks[0]['bbox'][0] - (10 + 2 * last_index)) <= 3
+
+
+def test_max_frames_stops_the_pipeline(clip):
+    system = StubSystem()
+    report = VideoRecognizer(system, clip, detect_every=2, drop_frames=False).run(max_frames=6)
+    assert report['frames_read'] == 6 and report['frames_processed'] == 6
+    assert system.detect_calls == 3
@@ -0,0 +1,344 @@
+# video_stream.py - Reconnaissance en continu sur fichier vidéo, webcam ou flux RTSP
+import argparse
+import queue
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from face_system import Box, UltraSimpleFaceSystem
+
+_END = object()
+
+
+def iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Intersection sur union de deux boîtes (x, y, w, h)"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class StageTimer:
+    """Latences par étape du pipeline (fenêtre glissante des dernières mesures)"""
+
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float):
+        if stage not in self.samples:
+            self.samples[stage] = deque(maxlen=self.window)
+            self.counts[stage] = 0
+        self.samples[stage].append(seconds)
+        self.counts[stage] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            stage: {
+                'count': self.counts[stage],
+                'mean_ms': float(np.mean(values) * 1000),
+                'p95_ms': float(np.percentile(values, 95) * 1000),
+            }
+            for stage, values in self.samples.items() if values
+        }
+
+
+class Track:
+    """Visage suivi entre deux détections (prédiction à vitesse constante)"""
+
+    def __init__(self, track_id: int, bbox, frame_index: int):
+        self.id = track_id
+        self.bbox = tuple(float(v) for v in bbox)
+        # Dernière boîte détectée (la vitesse se calcule entre détections, pas depuis la prédiction)
+        self.observed = self.bbox
+        self.velocity = (0.0, 0.0)
+        self.name: Optional[str] = None
+        self.confidence = 0.0
+        self.last_seen = frame_index
+        self.identified = False
+
+    def predict(self):
+        x, y, w, h = self.bbox
+        dx, dy = self.velocity
+        self.bbox = (x + dx, y + dy, w, h)
+
+    def update(self, bbox, frame_index: int):
+        elapsed = max(1, frame_index - self.last_seen)
+        old_x, old_y = self.observed[:2]
+        self.velocity = ((bbox[0] - old_x) / elapsed, (bbox[1] - old_y) / elapsed)
+        self.bbox = self.observed = tuple(float(v) for v in bbox)
+        self.last_seen = frame_index
+
+    def as_dict(self) -> dict:
+        return {
+            'track_id': self.id,
+            'name': self.name,
+            'confidence': round(self.confidence, 2),
+            'bbox': tuple(int(round(v)) for v in self.bbox),
+        }
+
+
+class FaceTracker:
+    """
+    Pistes de visages et ré-identification
+    Les détections sont associées aux pistes par IoU ; seules les pistes
+    nouvelles ou sous `reid_below` % de confiance sont ré-identifiées.
+    """
+
+    def __init__(self, face_system: UltraSimpleFaceSystem, reid_below: float = 65.0,
+                 iou_threshold: float = 0.3, max_age: int = 10,
+                 timer: Optional[StageTimer] = None):
+        self.face_system = face_system
+        self.reid_below = reid_below
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.timer = timer or StageTimer()
+        self.tracks: Dict[int, Track] = {}
+        self._next_track = 1
+        self.reidentifications = 0
+
+    def predict(self) -> List[dict]:
+        """Avance les pistes sans détection (image intermédiaire)"""
+        start = time.perf_counter()
+        for track in self.tracks.values():
+            track.predict()
+        self.timer.record('track', time.perf_counter() - start)
+        return self.snapshot()
+
+    def roi_hint(self) -> Optional[Box]:
+        """Boîte englobant les pistes actuelles (zone d'intérêt pour la détection suivante)"""
+        if not self.tracks:
+            return None
+        boxes = [track.bbox for track in self.tracks.values()]
+        x0 = min(b[0] for b in boxes)
+        y0 = min(b[1] for b in boxes)
+        x1 = max(b[0] + b[2] for b in boxes)
+        y1 = max(b[1] + b[3] for b in boxes)
+        return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+    def snapshot(self) -> List[dict]:
+        return [track.as_dict() for track in self.tracks.values()]
+
+    def _associate(self, faces: List[dict], frame_index: int) -> List[Tuple[Track, dict]]:
+        """Associe les détections aux pistes existantes (IoU glouton)"""
+        pairs = []
+        free = set(self.tracks)
+        for face_data in faces:
+            best_id, best_iou = None, self.iou_threshold
+            for track_id in free:
+                score = iou(self.tracks[track_id].bbox, face_data['bbox'])
+                if score > best_iou:
+                    best_id, best_iou = track_id, score
+            if best_id is None:
+                track = Track(self._next_track, face_data['bbox'], frame_index)
+                self.tracks[track.id] = track
+                self._next_track += 1
+            else:
+                free.discard(best_id)
+                track = self.tracks[best_id]
+                track.update(face_data['bbox'], frame_index)
+            pairs.append((track, face_data))
+
+        # Oublier les pistes non revues depuis trop longtemps
+        for track_id in list(free):
+            if frame_index - self.tracks[track_id].last_seen > self.max_age:
+                del self.tracks[track_id]
+        return pairs
+
+    def update(self, faces: List[dict], frame_index: int) -> List[dict]:
+        """Intègre les détections d'une image et retourne l'état des pistes"""
+        start = time.perf_counter()
+        pairs = self._associate(faces, frame_index)
+        self.timer.record('track', time.perf_counter() - start)
+
+        # Ré-identification groupée des pistes nouvelles ou incertaines
+        pending = [(t, f) for t, f in pairs if not t.identified or t.confidence < self.reid_below]
+        if pending:
+            start = time.perf_counter()
+            matches = self.face_system.match_faces([f for _, f in pending])
+            for (track, _), (name, confidence) in zip(pending, matches):
+                track.name, track.confidence, track.identified = name, confidence, True
+            self.reidentifications += len(pending)
+            self.timer.record('match', time.perf_counter() - start)
+
+        return self.snapshot()
+
+
+class VideoRecognizer:
+    """
+    Pipeline producteur/consommateur sur un flux vidéo
+    - lecture des images dans un thread, file bornée
+    - détection toutes les `detect_every` images, suivi des boîtes entre deux
+    - ré-identification seulement pour les pistes nouvelles ou peu sûres
+    """
+
+    def __init__(self, face_system: UltraSimpleFaceSystem, source: Union[int, str],
+                 detect_every: int = 5, queue_size: int = 8,
+                 reid_below: float = 65.0, iou_threshold: float = 0.3,
+                 max_missed: int = 2, drop_frames: Optional[bool] = None,
+                 preset: Optional[str] = None, track_roi: bool = False,
+                 full_scan_every: int = 10):
+        self.face_system = face_system
+        self.source = source
+        self.detect_every = max(1, detect_every)
+        self.preset = preset
+        # Zone d'intérêt autour des pistes, image entière toutes les `full_scan_every` détections
+        self.track_roi = track_roi
+        self.full_scan_every = max(1, full_scan_every)
+        # Sources en direct : on jette les images en retard plutôt que de prendre du retard
+        if drop_frames is None:
+            drop_frames = isinstance(source, int) or str(source).startswith(("rtsp://", "http://", "https://"))
+        self.drop_frames = drop_frames
+
+        self._frames: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self.timer = StageTimer()
+        self.tracker = FaceTracker(
+            face_system, reid_below=reid_below, iou_threshold=iou_threshold,
+            max_age=max_missed * self.detect_every, timer=self.timer
+        )
+
+        # Compteurs
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.detections = 0
+        self.elapsed = 0.0
+
+    def _produce(self, max_frames: Optional[int]):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            while not self._stop.is_set():
+                if max_frames is not None and self.frames_read >= max_frames:
+                    break
+                start = time.perf_counter()
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                self.timer.record('read', time.perf_counter() - start)
+                item = (self.frames_read, frame)
+                self.frames_read += 1
+                if self.drop_frames:
+                    try:
+                        self._frames.put_nowait(item)
+                    except queue.Full:
+                        self.frames_dropped += 1
+                else:
+                    self._frames.put(item)
+        finally:
+            capture.release()
+            self._frames.put(_END)
+
+    def process_frame(self, frame_index: int, frame: np.ndarray) -> List[dict]:
+        """Traite une image et retourne l'état des pistes"""
+        if frame_index % self.detect_every != 0:
+            return self.tracker.predict()
+
+        roi = None
+        if self.track_roi and self.detections % self.full_scan_every != 0:
+            roi = self.tracker.roi_hint()
+        
+        start = time.perf_counter()
+        faces = self.face_system.detect_faces(frame, preset=self.preset, roi=roi)
+        self.timer.record('detect', time.perf_counter() - start)
+        self.detections += 1
+        return self.tracker.update(faces, frame_index)
+
+    def run(self, max_frames: Optional[int] = None, on_result=None) -> dict:
+        """Lance le pipeline jusqu'à la fin du flux (ou stop())"""
+        producer = threading.Thread(target=self._produce, args=(max_frames,), daemon=True)
+        start = time.perf_counter()
+        producer.start()
+        try:
+            while True:
+                item = self._frames.get()
+                if item is _END:
+                    break
+                frame_index, frame = item
+                frame_start = time.perf_counter()
+                results = self.process_frame(frame_index, frame)
+                self.timer.record('frame', time.perf_counter() - frame_start)
+                self.frames_processed += 1
+                if on_result is not None:
+                    on_result(frame_index, results)
+        finally:
+            self._stop.set()
+            # Débloquer le producteur s'il attend de la place dans la file
+            while producer.is_alive():
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    pass
+                producer.join(timeout=0.05)
+            self.elapsed = time.perf_counter() - start
+        return self.report()
+
+    def stop(self):
+        self._stop.set()
+
+    def report(self) -> dict:
+        return {
+            'frames_read': self.frames_read,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'detections': self.detections,
+            'reidentifications': self.tracker.reidentifications,
+            'fps': self.frames_processed / self.elapsed if self.elapsed else 0.0,
+            'stages': self.timer.summary(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconnaissance faciale sur flux vidéo")
+    parser.add_argument("source", help="Fichier vidéo, URL RTSP/HTTP ou index de caméra (0, 1...)")
+    parser.add_argument("--every", type=int, default=5, help="Détecter toutes les K images")
+    parser.add_argument("--queue", type=int, default=8, help="Taille de la file d'images")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--reid-below", type=float, default=65.0,
+                        help="Ré-identifier les pistes sous cette confiance")
+    parser.add_argument("--preset", choices=["fast", "balanced", "accurate"], default=None)
+    parser.add_argument("--track-roi", action="store_true",
+                        help="Détecter d'abord autour des pistes de l'image précédente")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    system = UltraSimpleFaceSystem()
+    recognizer = VideoRecognizer(system, source, detect_every=args.every,
+                                 queue_size=args.queue, reid_below=args.reid_below,
+                                 preset=args.preset, track_roi=args.track_roi)
+
+    seen = {}
+
+    def on_result(frame_index, tracks):
+        for track in tracks:
+            if seen.get(track['track_id']) != track['name']:
+                seen[track['track_id']] = track['name']
+                label = track['name'] or "inconnu"
+                print(f"🎥 image {frame_index}: piste {track['track_id']} → {label} "
+                      f"({track['confidence']:.1f}%)")
+
+    try:
+        report = recognizer.run(max_frames=args.max_frames, on_result=on_result)
+    except KeyboardInterrupt:
+        recognizer.stop()
+        report = recognizer.report()
+    finally:
+        system.close()
+
+    print("=" * 60)
+    print(f"📊 {report['frames_processed']} images traitées, {report['frames_dropped']} ignorées, "
+          f"{report['fps']:.1f} FPS soutenus")
+    for stage, values in report['stages'].items():
+        print(f"   {stage:>6} : {values['mean_ms']:7.2f} ms en moyenne, "
+              f"p95 {values['p95_ms']:7.2f} ms ({values['count']} mesures)")
+
+
+if __name__ == "__main__":
+    main()